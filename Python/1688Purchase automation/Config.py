@@ -17,6 +17,10 @@ DXM_BASE_FOLDER = BASE_DIR
 PICKLIST_FOLDER = os.path.join(BASE_DIR, "Batch_added_to_cart")
 SCRAPE_FOLDER   = os.path.join(BASE_DIR, "ID_Scrape")
 MAPPING_PATH    = os.path.join(BASE_DIR, "Mapping_Data", "Mapping_Data.xlsx")
+MAPPING_DB_PATH = os.path.join(BASE_DIR, "Mapping_Data", "mapping_store.sqlite")
+PICKLIST_STORE_DIR = os.path.join(BASE_DIR, "Picklist_Store")
+SKU_CACHE_PATH  = os.path.join(SCRAPE_FOLDER, "sku_scrape_cache.sqlite")
+SCRAPE_QUEUE_PATH = os.path.join(SCRAPE_FOLDER, "scrape_jobs.sqlite")
 
 # ------------------------------------------------------------
 # Cookie Paths
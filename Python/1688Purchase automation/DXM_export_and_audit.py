@@ -1,11 +1,19 @@
+import hashlib
+import json
 import os
+import shutil
 import time
 import urllib.parse
-from typing import List, Tuple
+from typing import List, NamedTuple, Tuple
 
 import pandas as pd
 import requests
 
+try:
+    import orjson  # 可选：更快的 JSON 解码
+except ImportError:
+    orjson = None
+
 from config import (
     DXM_COOKIE_PATH,
     PICKLIST_FOLDER,
@@ -13,6 +21,7 @@ from config import (
     ENABLE_AUDIT,
     USER_AGENT,
 )
+from picklist_store import append_picklist
 
 # ================== CONFIG ==================
 
@@ -31,6 +40,17 @@ WORK_DIR = os.path.dirname(os.path.abspath(__file__))
 
 UA = USER_AGENT
 
+# DXM 接口根地址：默认线上；设置环境变量 DXM_BASE_URL 可指向本地 fake_dxm_server.py 做离线压测
+DXM_BASE_URL = os.environ.get("DXM_BASE_URL", "https://www.dianxiaomi.com").rstrip("/")
+
+# checkProcess.json 轮询间隔（秒）
+POLL_INTERVAL = 2
+
+# 导出结果缓存：同一组包裹在 TTL 内重跑时直接复用已下载（并已汇总）的拣货单
+# 例如加购步骤因 Cookie 过期失败后重跑整条流水线。设为 0 关闭缓存。
+EXPORT_CACHE_DIR = os.path.join(WORK_DIR, "DXM_Export_Cache")
+EXPORT_CACHE_TTL_SEC = 60 * 60
+
 
 # ================== COOKIE LOADER ==================
 
@@ -68,8 +88,8 @@ def make_session() -> Tuple[requests.Session, dict]:
     headers = {
         "User-Agent": UA,
         "Cookie": cookie,
-        "Origin": "https://www.dianxiaomi.com",
-        "Referer": "https://www.dianxiaomi.com/web/order/paid?go=m100",
+        "Origin": DXM_BASE_URL,
+        "Referer": f"{DXM_BASE_URL}/web/order/paid?go=m100",
         "Accept": "application/json, text/javascript, */*; q=0.01",
         "X-Requested-With": "XMLHttpRequest",
     }
@@ -79,82 +99,37 @@ def make_session() -> Tuple[requests.Session, dict]:
 # ================== list.json helpers ==================
 
 
-def query_package_id_from_order_id(
-    session: requests.Session,
-    headers: dict,
-    order_id: str,
-) -> str | None:
-    """Mode 2：用 list.json 在【待审核】中查询一个 orderId -> packageId"""
-    url = "https://www.dianxiaomi.com/api/package/list.json"
-    data = {
-        "pageNo": 1,
-        "pageSize": 50,
-        "shopId": -1,
-        "state": "paid",  # 待审核
-        "platform": "",
-        "isSearch": 1,
-        "searchType": "orderId",
-        "authId": -1,
-        "startTime": "",
-        "endTime": "",
-        "country": "",
-        "orderField": "order_pay_time",
-        "isVoided": 0,
-        "isRemoved": 0,
-        "printJh": -1,
-        "printMd": -1,
-        "commitPlatform": "",
-        "productStatus": "",
-        "jhComment": -1,
-        "storageId": 0,
-        "isOversea": -1,
-        "isFree": 0,
-        "isBatch": 0,
-        "custom": -1,
-        "timeOut": 0,
-        "refundStatus": 0,
-        "buyerAccount": "",
-        "forbiddenStatus": -1,
-        "forbiddenReason": 0,
-        "behindTrack": -1,
-        "orderId": order_id,
-    }
+class PendingPackage(NamedTuple):
+    """list.json 一行的精简投影：调用方只需要 packageId / orderId。"""
 
-    print(f"[INFO] list.json 查询 orderId = {order_id}")
-    resp = session.post(url, data=data, headers=headers)
-    print(f"[HTTP] list.json status = {resp.status_code}")
-    if resp.status_code != 200:
-        print("[ERROR] list.json HTTP 请求失败")
-        return None
+    package_id: str
+    order_id: str
 
-    try:
-        j = resp.json()
-    except Exception as e:
-        print("[ERROR] list.json 返回不是 JSON:", e)
-        return None
 
-    page = j.get("data", {}).get("page", {})
-    rows = page.get("list", []) or []
-
-    if not rows:
-        print(f"[INFO] 在待审核中找不到该订单 (orderId={order_id})，视为不在【待审核】。")
-        return None
-
-    for row in rows:
-        if row.get("orderId") == order_id:
-            pkg = row.get("idStr") or str(row.get("id"))
-            print(f"[INFO] 在待审核中找到: orderId {order_id} -> packageId {pkg}")
-            return pkg
+def parse_list_json_page(raw: bytes | str) -> tuple[list[PendingPackage], int]:
+    """\
+    解码 list.json 响应，并把每一行直接投影为 PendingPackage。
+    完整的包裹 dict（商品 / 地址 / 买家信息）解析后立即丢弃，不再常驻内存。
 
-    print(f"[WARN] list.json 返回数据中没有匹配的 orderId={order_id}")
-    return None
+    返回:
+      (packages, raw_row_count)  raw_row_count 用于判断是否最后一页
+    """
+    j = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    rows = ((j.get("data") or {}).get("page") or {}).get("list") or []
+    packages = [
+        PendingPackage(r.get("idStr") or str(r.get("id")), r.get("orderId") or "")
+        for r in rows
+    ]
+    return packages, len(rows)
 
 
-def get_all_pending_packages(session: requests.Session, headers: dict) -> List[dict]:
-    """Mode 1：用 list.json 分页获取所有【待审核】包裹。"""
-    url = "https://www.dianxiaomi.com/api/package/list.json"
+def get_all_pending_packages(
+    session: requests.Session, headers: dict
+) -> List[PendingPackage]:
+    """Mode 1：用 list.json 分页获取所有【待审核】包裹（仅保留 packageId / orderId）。"""
+    url = f"{DXM_BASE_URL}/api/package/list.json"
     page_no = 1
-    all_rows: List[dict] = []
+    all_rows: List[PendingPackage] = []
 
     print("=== 获取所有【待审核】订单 (list.json 分页) ===")
 
@@ -201,21 +176,19 @@ def get_all_pending_packages(session: requests.Session, headers: dict) -> List[d
             break
 
         try:
-            j = resp.json()
+            rows, row_count = parse_list_json_page(resp.content)
         except Exception as e:
             print("[WARN] list.json JSON 解析失败:", e)
             break
 
-        page = j.get("data", {}).get("page", {})
-        rows = page.get("list", []) or []
-        if not rows:
+        if not row_count:
             print("[INFO] 本页无数据，结束分页。")
             break
 
-        print(f"[INFO] 本页得到 {len(rows)} 条。")
+        print(f"[INFO] 本页得到 {row_count} 条。")
         all_rows.extend(rows)
 
-        if len(rows) < MAX_ORDERS:
+        if row_count < MAX_ORDERS:
             print("[INFO] 最后一页 (< pageSize)。")
             break
 
@@ -228,8 +201,8 @@ def get_all_pending_packages(session: requests.Session, headers: dict) -> List[d
 # ================== Excel helpers (Mode 2) ==================
 
 
-def find_latest_order_ids_workbook() -> str:
-    """在 ORDER_IDS_DIR 中寻找最新的 .xlsx 文件。
+def find_order_ids_workbooks() -> list[str]:
+    """在 ORDER_IDS_DIR 中寻找所有 .xlsx 文件（按修改时间从旧到新）。
     - 如果目录不存在：自动创建，并友好提示后退出（不会继续执行，也不会切换到 Mode 1）
     - 如果目录存在但没有 .xlsx：友好提示后退出
     """
@@ -244,7 +217,7 @@ def find_latest_order_ids_workbook() -> str:
     candidates = [
         os.path.join(ORDER_IDS_DIR, f)
         for f in os.listdir(ORDER_IDS_DIR)
-        if f.lower().endswith(".xlsx")
+        if f.lower().endswith(".xlsx") and not f.startswith("~$")
     ]
     if not candidates:
         print(
@@ -252,9 +225,11 @@ def find_latest_order_ids_workbook() -> str:
         )
         raise SystemExit(0)
 
-    latest = max(candidates, key=os.path.getmtime)
-    print(f"[INFO] 使用最新订单工作簿: {latest}")
-    return latest
+    candidates.sort(key=os.path.getmtime)
+    print(f"[INFO] 检测到 {len(candidates)} 个订单工作簿:")
+    for path in candidates:
+        print(f"       - {os.path.basename(path)}")
+    return candidates
 
 
 def extract_order_ids_from_workbook(xlsx_path: str) -> list[str]:
@@ -302,28 +277,82 @@ def extract_order_ids_from_workbook(xlsx_path: str) -> list[str]:
     return cleaned
 
 
+def collect_order_ids_from_workbooks(
+    workbook_paths: list[str],
+) -> tuple[list[str], dict[str, list[str]]]:
+    """\
+    读取多个订单工作簿，合并并去重 orderId。
+
+    返回:
+      (order_ids, ids_by_workbook)
+      ids_by_workbook 只包含成功读取的工作簿；读取失败的工作簿不会出现在其中，
+      因此也不会在后续清理中被删除。
+    """
+    order_ids: list[str] = []
+    seen = set()
+    ids_by_workbook: dict[str, list[str]] = {}
+
+    for path in workbook_paths:
+        print(f"[INFO] 读取订单工作簿: {path}")
+        try:
+            ids = extract_order_ids_from_workbook(path)
+        except Exception as e:
+            print(f"[WARN] 跳过无法读取的工作簿（不会删除）: {path}")
+            print(f"       原因: {e}")
+            continue
+
+        ids_by_workbook[path] = ids
+        for oid in ids:
+            if oid not in seen:
+                seen.add(oid)
+                order_ids.append(oid)
+
+    if len(ids_by_workbook) > 1:
+        print(
+            f"[INFO] {len(ids_by_workbook)} 个工作簿合并去重后共 {len(order_ids)} 个 orderId。"
+        )
+    return order_ids, ids_by_workbook
+
+
 def resolve_package_ids_from_order_ids(
     session: requests.Session,
     headers: dict,
     order_ids: list[str],
 ) -> list[str]:
+    """\
+    用一次【待审核】快照（list.json 分页）把 orderId 转换为 packageId，
+    不再对每个 orderId 单独查询 list.json。
+    """
+    wanted = [oid.strip() for oid in order_ids if oid and oid.strip()]
+    if not wanted:
+        return []
+
+    snapshot = get_all_pending_packages(session, headers)
+    pkg_by_order: dict[str, str] = {}
+    for row in snapshot:
+        if row.order_id and row.order_id not in pkg_by_order:
+            pkg_by_order[row.order_id] = row.package_id
+
     package_ids: list[str] = []
     seen = set()
-    for oid in order_ids:
-        oid = oid.strip()
-        if not oid:
+    missing = 0
+    for oid in wanted:
+        pkg = pkg_by_order.get(oid)
+        if not pkg:
+            missing += 1
             continue
-        pkg = query_package_id_from_order_id(session, headers, oid)
-        if pkg and pkg not in seen:
+        if pkg not in seen:
             seen.add(pkg)
             package_ids.append(pkg)
+
+    if missing:
+        print(f"[INFO] 有 {missing} 个 orderId 不在【待审核】中，已忽略。")
     print(
         f"[INFO] 在待审核中找到 {len(package_ids)} 个包裹 (由工作簿转换而来)。"
     )
     return package_ids
 
 
-
 # ================== Cleanup helpers (Mode 2) ==================
 
 
@@ -369,7 +398,7 @@ def call_export_pick_data(
     is_all: int = 0,
 ) -> str:
     """创建导出任务，返回 uuid。"""
-    url = "https://www.dianxiaomi.com/order/exportPickData.json"
+    url = f"{DXM_BASE_URL}/order/exportPickData.json"
     joined_ids = ",".join(package_ids)
 
     print(f"[INFO] 调用 exportPickData.json, 包裹数={len(package_ids)}")
@@ -399,10 +428,10 @@ def poll_check_process(
     headers: dict,
     uuid: str,
     max_tries: int = 20,
-    interval: int = 2,
+    interval: float = 2,
 ) -> str:
     """轮询 checkProcess.json，直到拿到下载链接。"""
-    url = "https://www.dianxiaomi.com/checkProcess.json"
+    url = f"{DXM_BASE_URL}/checkProcess.json"
     payload = {"uuid": uuid}
 
     for i in range(1, max_tries + 1):
@@ -484,10 +513,10 @@ def summarise_picklist_by_sku(xlsx_path: str) -> None:
     print(f"[INFO] 已按 SKU 汇总并覆盖原拣货单: {xlsx_path}")
 
 
-def download_excel(session: requests.Session, url: str) -> str:
+def download_excel(session: requests.Session, url: str) -> tuple[str, bool]:
     """\
-    下载 Excel 文件到 DOWNLOAD_DIR，返回本地路径。
-    下载完成后，自动按 SKU 做汇总，并覆盖原文件。
+    下载 Excel 文件到 DOWNLOAD_DIR，返回 (本地路径, 是否已汇总)。
+    下载完成后，自动按 SKU 做汇总，并覆盖原文件；汇总失败时保留原文件，返回 False。
     """
     if not os.path.exists(DOWNLOAD_DIR):
         os.makedirs(DOWNLOAD_DIR, exist_ok=True)
@@ -501,7 +530,7 @@ def download_excel(session: requests.Session, url: str) -> str:
 
     dl_headers = {
         "User-Agent": UA,
-        "Referer": "https://www.dianxiaomi.com/",
+        "Referer": f"{DXM_BASE_URL}/",
     }
 
     with session.get(url, headers=dl_headers, stream=True) as r:
@@ -516,11 +545,103 @@ def download_excel(session: requests.Session, url: str) -> str:
     try:
         summarise_picklist_by_sku(local_path)
     except Exception as e:
-        print(f"[WARN] 汇总拣货单时出错（保留原文件）: {e}")
+        print(f"[WARN] 汇总拣货单时出错（保留原文件，不写入导出缓存）: {e}")
+        return local_path, False
+
+    try:
+        append_picklist(local_path)
+    except Exception as e:
+        print(f"[WARN] 写入历史拣货单存储失败（不影响本次导出）: {e}")
+
+    return local_path, True
 
+
+# ================== Export cache ==================
+
+
+def package_set_fingerprint(package_ids: list[str]) -> str:
+    """包裹集合指纹：与顺序无关（排序后取 sha1）。"""
+    joined = ",".join(sorted(set(package_ids)))
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
+
+
+def _export_cache_paths(fingerprint: str) -> tuple[str, str]:
+    base = os.path.join(EXPORT_CACHE_DIR, fingerprint)
+    return base + ".xlsx", base + ".json"
+
+
+def prune_export_cache() -> None:
+    """删除过期的缓存条目。"""
+    if not os.path.isdir(EXPORT_CACHE_DIR):
+        return
+    now = time.time()
+    for name in os.listdir(EXPORT_CACHE_DIR):
+        path = os.path.join(EXPORT_CACHE_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > EXPORT_CACHE_TTL_SEC:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def load_cached_export(package_ids: list[str]) -> str | None:
+    """\
+    命中缓存时，把缓存的拣货单复制回 DOWNLOAD_DIR（新的 mtime，下游流水线可识别为本次导出），
+    返回本地路径；未命中返回 None。
+    """
+    if EXPORT_CACHE_TTL_SEC <= 0:
+        return None
+
+    fingerprint = package_set_fingerprint(package_ids)
+    xlsx_path, meta_path = _export_cache_paths(fingerprint)
+    if not (os.path.exists(xlsx_path) and os.path.exists(meta_path)):
+        return None
+
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except Exception as e:
+        print(f"[WARN] 导出缓存元数据损坏，忽略: {e}")
+        return None
+
+    age = time.time() - float(meta.get("created", 0))
+    if age > EXPORT_CACHE_TTL_SEC:
+        return None
+
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    local_path = os.path.join(DOWNLOAD_DIR, meta.get("filename") or "export.xlsx")
+    shutil.copyfile(xlsx_path, local_path)
+    print(
+        f"[CACHE] 命中导出缓存 ({fingerprint[:12]}, {age / 60:.1f} 分钟前)，"
+        f"跳过导出/轮询/下载: {local_path}"
+    )
     return local_path
 
 
+def store_export_cache(package_ids: list[str], local_path: str) -> None:
+    """把已下载并汇总的拣货单存入缓存。失败只提示，不影响主流程。"""
+    if EXPORT_CACHE_TTL_SEC <= 0:
+        return
+    try:
+        os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+        prune_export_cache()
+        fingerprint = package_set_fingerprint(package_ids)
+        xlsx_path, meta_path = _export_cache_paths(fingerprint)
+        shutil.copyfile(local_path, xlsx_path)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "filename": os.path.basename(local_path),
+                    "created": time.time(),
+                    "package_count": len(set(package_ids)),
+                },
+                f,
+                ensure_ascii=False,
+            )
+    except Exception as e:
+        print(f"[WARN] 写入导出缓存失败: {e}")
+
+
 # ================== 审核 batchAudit ==================
 
 
@@ -529,7 +650,7 @@ def call_batch_audit(
     headers: dict,
     package_ids: List[str],
 ):
-    url = "https://www.dianxiaomi.com/api/package/batchAudit.json"
+    url = f"{DXM_BASE_URL}/api/package/batchAudit.json"
     joined_ids = ",".join(package_ids)
 
     print("=== 调用 batchAudit.json 批量审核 ===")
@@ -560,71 +681,120 @@ def call_batch_audit(
 # ================== PUBLIC API (for pipeline) ==================
 
 
-def export_from_dxm(
-    mode: int = 1,
-    workbook_path: str | None = None,
-) -> tuple[list[str], list[str]]:
+def export_package_ids(
+    session: requests.Session,
+    headers: dict,
+    package_ids: list[str],
+) -> list[str]:
+    """按 MAX_ORDERS 分批导出并下载拣货单，返回下载的文件列表。"""
+    print(f"[INFO] 此次需要处理 {len(package_ids)} 个包裹。")
+
+    downloaded_files: list[str] = []
+    if DO_EXPORT:
+        for idx, chunk in enumerate(
+            chunk_list(package_ids, MAX_ORDERS), start=1
+        ):
+            print(f"\n--- 导出批次 {idx}, 数量 {len(chunk)} ---")
+            path = load_cached_export(chunk)
+            if path is None:
+                uuid = call_export_pick_data(session, headers, chunk, is_all=0)
+                url = poll_check_process(session, headers, uuid, interval=POLL_INTERVAL)
+                path, summarised = download_excel(session, url)
+                # 只缓存已汇总的拣货单，否则一小时内重跑会拿到未汇总的文件
+                if summarised:
+                    store_export_cache(chunk, path)
+            downloaded_files.append(path)
+    else:
+        print("[INFO] DO_EXPORT = False，跳过导出。")
+
+    return downloaded_files
+
+
+def export_from_order_workbooks(
+    workbook_paths: list[str] | None = None,
+) -> tuple[list[str], list[str], list[str]]:
     """\
-    供外部调用的主函数:
-      mode=1: 导出所有【待审核】订单
-      mode=2: 从订单工作簿读取 orderId，再导出对应【待审核】订单
+    Mode 2 批量版：
+      - 读取所有订单工作簿（默认 ORDER_IDS_DIR 下全部 .xlsx），合并去重 orderId
+      - 用一次【待审核】快照解析 packageId
+      - 一次导出覆盖全部工作簿
 
     返回:
-      (downloaded_files, package_ids)
+      (downloaded_files, package_ids, handled_workbooks)
+      handled_workbooks: 成功读取、其 orderId 已参与本次处理的工作簿
     """
+    if workbook_paths is None:
+        workbook_paths = find_order_ids_workbooks()
+
+    order_ids, ids_by_workbook = collect_order_ids_from_workbooks(workbook_paths)
+    handled_workbooks = list(ids_by_workbook)
+    if not order_ids:
+        print("[INFO] 工作簿中没有有效 orderId。")
+        return [], [], handled_workbooks
+
     session, headers = make_session()
+    package_ids = resolve_package_ids_from_order_ids(session, headers, order_ids)
+    if not package_ids:
+        print("[INFO] 这些订单中，没有任何一单当前在【待审核】。")
+        return [], [], handled_workbooks
 
-    if mode == 1:
-        print("=== MODE 1: 导出所有【待审核】订单 ===")
-        rows = get_all_pending_packages(session, headers)
+    downloaded_files = export_package_ids(session, headers, package_ids)
+    return downloaded_files, package_ids, handled_workbooks
 
-        package_ids: list[str] = []
-        seen = set()
-        for r in rows:
-            pkg = r.get("idStr") or str(r.get("id"))
-            if pkg and pkg not in seen:
-                seen.add(pkg)
-                package_ids.append(pkg)
 
-        if not package_ids:
-            print("[INFO] 当前没有任何订单在【待审核】，无需导出。")
-            return [], []
+def export_for_mode(
+    mode: int,
+    workbook_path: str | None = None,
+) -> tuple[list[str], list[str], list[str]]:
+    """\
+    导出流程的唯一实现（export_from_dxm 与 CLI 共用）:
+      mode=1: 导出所有【待审核】订单
+      mode=2: 从订单工作簿读取 orderId，再导出对应【待审核】订单
+              （未指定 workbook_path 时处理 ORDER_IDS_DIR 下全部工作簿）
 
-    elif mode == 2:
+    返回:
+      (downloaded_files, package_ids, handled_workbooks)
+      handled_workbooks: Mode 2 中已参与本次处理的工作簿（Mode 1 为空）
+    """
+    if mode == 2:
         print("=== MODE 2: 从订单工作簿导出【待审核】订单 ===")
-        if workbook_path is None:
-            workbook_path = find_latest_order_ids_workbook()
-        print(f"[INFO] 使用订单工作簿: {workbook_path}")
+        paths = [workbook_path] if workbook_path is not None else None
+        return export_from_order_workbooks(paths)
+    if mode != 1:
+        raise ValueError("mode 只能是 1 或 2")
 
-        order_ids = extract_order_ids_from_workbook(workbook_path)
-        if not order_ids:
-            print("[INFO] 工作簿中没有有效 orderId。")
-            return [], []
+    session, headers = make_session()
 
-        package_ids = resolve_package_ids_from_order_ids(
-            session, headers, order_ids
-        )
-        if not package_ids:
-            print("[INFO] 这些订单中，没有任何一单当前在【待审核】。")
-            return [], []
-    else:
-        raise ValueError("mode 只能是 1 或 2")
+    print("=== MODE 1: 导出所有【待审核】订单 ===")
+    rows = get_all_pending_packages(session, headers)
 
-    print(f"[INFO] 此次需要处理 {len(package_ids)} 个包裹。")
+    package_ids: list[str] = []
+    seen = set()
+    for r in rows:
+        pkg = r.package_id
+        if pkg and pkg not in seen:
+            seen.add(pkg)
+            package_ids.append(pkg)
 
-    downloaded_files: list[str] = []
-    if DO_EXPORT:
-        for idx, chunk in enumerate(
-            chunk_list(package_ids, MAX_ORDERS), start=1
-        ):
-            print(f"\n--- 导出批次 {idx}, 数量 {len(chunk)} ---")
-            uuid = call_export_pick_data(session, headers, chunk, is_all=0)
-            url = poll_check_process(session, headers, uuid)
-            path = download_excel(session, url)
-            downloaded_files.append(path)
-    else:
-        print("[INFO] DO_EXPORT = False，跳过导出。")
+    if not package_ids:
+        print("[INFO] 当前没有任何订单在【待审核】，无需导出。")
+        return [], [], []
+
+    downloaded_files = export_package_ids(session, headers, package_ids)
+    return downloaded_files, package_ids, []
+
+
+def export_from_dxm(
+    mode: int = 1,
+    workbook_path: str | None = None,
+) -> tuple[list[str], list[str]]:
+    """\
+    供外部调用的主函数（参数见 export_for_mode）。
 
+    返回:
+      (downloaded_files, package_ids)
+    """
+    downloaded_files, package_ids, _ = export_for_mode(mode, workbook_path)
     return downloaded_files, package_ids
 
 
@@ -651,18 +821,16 @@ def audit_packages(package_ids: list[str]) -> None:
 def export_and_maybe_audit(mode: int, workbook_path: str | None = None):
     """    CLI 主流程：
       - mode=1: 导出所有【待审核】订单，然后按配置决定是否审核
-      - mode=2: 使用 ORDER_IDS_DIR 中最新工作簿（或指定 workbook_path）导出，然后按配置决定是否审核
-              当 Mode 2 成功处理完该工作簿后，会自动删除该工作簿，避免重复处理。
+      - mode=2: 合并 ORDER_IDS_DIR 中全部工作簿（或仅指定的 workbook_path）的 orderId，
+              一次导出，然后按配置决定是否审核
+              处理成功后，会自动删除本次读取过的工作簿，避免重复处理；
+              读取失败的工作簿保留在原处。
     """
-    wb_to_delete: str | None = None
-    if mode == 2:
-        if workbook_path is None:
-            workbook_path = find_latest_order_ids_workbook()
-        wb_to_delete = workbook_path
+    handled_workbooks: list[str] = []
 
     success = False
     try:
-        downloaded_files, package_ids = export_from_dxm(mode, workbook_path=workbook_path)
+        downloaded_files, package_ids, handled_workbooks = export_for_mode(mode, workbook_path)
 
         if not package_ids:
             print("[INFO] 没有需要审核的包裹。")
@@ -680,8 +848,9 @@ def export_and_maybe_audit(mode: int, workbook_path: str | None = None):
 
         success = True
     finally:
-        if mode == 2 and wb_to_delete and success:
-            delete_processed_order_ids_workbook(wb_to_delete)
+        if mode == 2 and success:
+            for path in handled_workbooks:
+                delete_processed_order_ids_workbook(path)
 
 
 def run_mode1_all_pending():
@@ -707,7 +876,7 @@ def main():
     print(f"DO_AUDIT  = {DO_AUDIT}")
     print()
     print("1. 导出 + (可选)审核 所有【待审核】订单  (Mode 1)")
-    print("2. 从订单工作簿导出 + (可选)审核          (Mode 2)")
+    print("2. 从全部订单工作簿导出 + (可选)审核      (Mode 2)")
     print("3. 取消")
     choice = input("请选择 (1/2/3): ").strip()
 
@@ -1,14 +1,20 @@
+import argparse
+import json
 import os
 import sys
 import pandas as pd
 import math
+from datetime import datetime
+from copy import copy
 from openpyxl import load_workbook
 from openpyxl.worksheet.views import Selection
 
 from config import (
     SCRAPE_FOLDER as CFG_SCRAPE_FOLDER,
     MAPPING_PATH as CFG_MAPPING_PATH,
+    MAPPING_DB_PATH as CFG_MAPPING_DB_PATH,
 )
+from mapping_store import HEADER_OF, SECONDARY_SLOT, MappingStore, excel_value, import_from_xlsx
 
 
 
@@ -17,6 +23,10 @@ from config import (
 # 从 config.py 读取统一配置
 SCRAPE_FOLDER = CFG_SCRAPE_FOLDER
 MAPPING_PATH = CFG_MAPPING_PATH
+# 存储文件存在时（python mapping_store.py import 建库后）以存储为准，xlsx 作为视图同步
+MAPPING_DB_PATH = CFG_MAPPING_DB_PATH
+# 已导入 Mapping 的 (done) 工作簿记录（--all 只处理不在记录中 / 导入后又被改过的文件）
+LEDGER_PATH = os.path.join(SCRAPE_FOLDER, "mapping_ingest_ledger.json")
 
 CODE_COL = "商品選項貨號"
 URL_COL = "商品链接"
@@ -25,6 +35,7 @@ ATTR_COL = "属性SKU"
 SKU_ID_COL = "SKU ID"
 SPEC_ID_COL = "Spec ID"
 SHOP_COL = "店铺名称"
+SOURCE_COL = "来源文件"  # 批量模式下标记每行来自哪个 (done) 工作簿
 
 # 如果有警告或错误，则在退出前停一下
 NEED_PAUSE = False
@@ -32,8 +43,8 @@ NEED_PAUSE = False
 
 # ======================== Helpers ========================
 
-def find_latest_done_workbook(folder: str) -> str:
-    """在 folder 中查找最近修改的、文件名以 (done).xlsx 结尾的工作簿（忽略临时文件）。"""
+def list_done_workbooks(folder: str) -> list[tuple[float, str]]:
+    """列出 folder 中文件名以 (done).xlsx 结尾的工作簿（忽略临时文件），按修改时间从旧到新。"""
     candidates = []
     for fname in os.listdir(folder):
         if fname.startswith("~$"):
@@ -46,12 +57,62 @@ def find_latest_done_workbook(folder: str) -> str:
         full = os.path.join(folder, fname)
         mtime = os.path.getmtime(full)
         candidates.append((mtime, full))
+    candidates.sort(key=lambda x: x[0])
+    return candidates
 
+
+def find_latest_done_workbook(folder: str) -> str:
+    """在 folder 中查找最近修改的、文件名以 (done).xlsx 结尾的工作簿（忽略临时文件）。"""
+    candidates = list_done_workbooks(folder)
     if not candidates:
         raise FileNotFoundError(f"在 {folder} 下未找到任何以 (done).xlsx 结尾的文件。")
+    return candidates[-1][1]
+
+
+def _file_signature(path: str) -> list:
+    st = os.stat(path)
+    return [round(st.st_mtime, 3), st.st_size]
+
 
-    candidates.sort(key=lambda x: x[0], reverse=True)
-    return candidates[0][1]
+def load_ingest_ledger(path: str = LEDGER_PATH) -> dict:
+    """{文件名: {"signature": [mtime, size], "rows": 行数, "ingested_at": 时间}}"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] 读取导入记录失败，按空记录处理: {e}")
+        return {}
+
+
+def save_ingest_ledger(ledger: dict, path: str = LEDGER_PATH) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ledger, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def record_ingested(ledger: dict, paths: list[str], rows_of: dict[str, int]) -> None:
+    """在 Mapping 成功写入后调用；签名取写回 B(done) 之后的文件状态。"""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for path in paths:
+        ledger[os.path.basename(path)] = {
+            "signature": _file_signature(path),
+            "rows": rows_of.get(path, 0),
+            "ingested_at": now,
+        }
+
+
+def find_pending_done_workbooks(folder: str, ledger: dict) -> list[str]:
+    """未导入过、或导入后内容又有变化（重新抓取覆盖 / 手工修改）的 (done) 工作簿，从旧到新。"""
+    pending = []
+    for _, full in list_done_workbooks(folder):
+        entry = ledger.get(os.path.basename(full))
+        if entry and entry.get("signature") == _file_signature(full):
+            continue
+        pending.append(full)
+    return pending
 
 
 def is_empty(value) -> bool:
@@ -64,11 +125,7 @@ def is_empty(value) -> bool:
 
 # ======================== Main Logic ========================
 
-def fill_code_column(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    根据 商品ID + 样例行(商品選項貨號+属性SKU) 自动填充 商品選項貨號。
-    无样例 或 属性SKU 为空 的行保持为空。
-    """
+def _prepare_code_frame(df: pd.DataFrame) -> pd.DataFrame:
     # 如果列名还是 Unnamed: 0，则重命名为 商品選項貨號
     if CODE_COL not in df.columns and "Unnamed: 0" in df.columns:
         df = df.rename(columns={"Unnamed: 0": CODE_COL})
@@ -79,19 +136,61 @@ def fill_code_column(df: pd.DataFrame) -> pd.DataFrame:
             raise KeyError(f"工作簿缺少必要列: {col}")
 
     df[CODE_COL] = df[CODE_COL].astype(object)
+    return df
+
+
+def _empty_mask(s: pd.Series) -> pd.Series:
+    """与 is_empty 相同的判断，按列一次完成。"""
+    return s.isna() | s.astype(str).str.strip().eq("")
+
+
+def fill_code_column(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    根据 商品ID + 样例行(商品選項貨號+属性SKU) 自动填充 商品選項貨號。
+    无样例 或 属性SKU 为空 的行保持为空。
+
+    每个 商品ID 只取第一条样例行推出前缀一次，再对所有待填行做一次向量化拼接。
+    """
+    df = _prepare_code_frame(df)
+
+    code_str = df[CODE_COL].astype(str).str.strip()
+    attr_str = df[ATTR_COL].astype(str).str.strip()
+    code_empty = _empty_mask(df[CODE_COL])
+    attr_empty = _empty_mask(df[ATTR_COL])
+
+    # 商品ID 分组编号（空 商品ID 也单独成组，与 groupby(dropna=False) 一致）
+    group_key = pd.Series(
+        pd.factorize(df[PID_COL], use_na_sentinel=False)[0], index=df.index
+    )
+
+    # 样例行：商品選項貨號 非空 且 属性SKU 非空；每组取第一条
+    sample_key = group_key[~code_empty & ~attr_empty].drop_duplicates()
+    if sample_key.empty:
+        return df
+
+    prefixes = [
+        name[:-len(attr)] if name.endswith(attr) else name  # 兜底：不截取
+        for name, attr in zip(code_str[sample_key.index], attr_str[sample_key.index])
+    ]
+    prefix = group_key.map(pd.Series(prefixes, index=sample_key.to_numpy()))
+
+    # 已经有人为填写的不覆盖；没有属性SKU 或 没有样例的保持为空
+    fill = code_empty & ~attr_empty & prefix.notna()
+    df.loc[fill, CODE_COL] = prefix[fill] + attr_str[fill]
+
+    return df
 
-    # 按 商品ID 分组
-    for pid, group in df.groupby(PID_COL, dropna=False):
-        idxs = group.index
 
-        # 找样例行：商品選項貨號 非空 且 属性SKU 非空
+def _fill_code_column_loop(df: pd.DataFrame) -> pd.DataFrame:
+    """逐组 / 逐行的旧实现，只保留给 bench_fill_code_column 对比结果和耗时。"""
+    df = _prepare_code_frame(df)
+
+    for pid, group in df.groupby(PID_COL, dropna=False):
         mask_sample = (
             group[CODE_COL].apply(lambda v: not is_empty(v)) &
             group[ATTR_COL].apply(lambda v: not is_empty(v))
         )
-
         if not mask_sample.any():
-            # 没有样例，这一组全部保持原样
             continue
 
         sample_row = group[mask_sample].iloc[0]
@@ -101,39 +200,87 @@ def fill_code_column(df: pd.DataFrame) -> pd.DataFrame:
         if sample_attr and sample_name.endswith(sample_attr):
             prefix = sample_name[:-len(sample_attr)]
         else:
-            prefix = sample_name  # 兜底：不截取
-
-        # 为该商品ID的其它行填充
-        for idx in idxs:
-            current_code = df.at[idx, CODE_COL]
-            attr_val = df.at[idx, ATTR_COL]
+            prefix = sample_name
 
-            if not is_empty(current_code):
-                # 已经有人为填写的，不覆盖
-                continue
-            if is_empty(attr_val):
-                # 没有属性SKU，保持为空
-                continue
-
-            attr_str = str(attr_val).strip()
-            df.at[idx, CODE_COL] = prefix + attr_str
+        for idx in group.index:
+            if is_empty(df.at[idx, CODE_COL]) and not is_empty(df.at[idx, ATTR_COL]):
+                df.at[idx, CODE_COL] = prefix + str(df.at[idx, ATTR_COL]).strip()
 
     return df
 
 
-def append_to_mapping(b_df: pd.DataFrame, mapping_path: str) -> pd.DataFrame:
+def bench_fill_code_column(rows: int = 100_000, rounds: int = 3) -> None:
+    """\
+    用模拟的抓取结果对比 fill_code_column 新旧实现：
+    每个 商品ID 10 个 SKU，首行带样例；约 5% 的商品没有样例，2% 的行属性SKU 为空。
     """
-    从已经填好的 B(done).xlsx 中，筛选有用的行，追加到 Mapping_Data.xlsx。
-    - 只追加 商品選項貨號 和 属性SKU 均非空的行
-    - 不覆盖旧数据，只在末尾追加
-    - 避免重复商品選項貨號
+    import random
+    import time
+
+    rng = random.Random(1688)
+    pids, codes, attrs = [], [], []
+    for i in range(rows):
+        pid = 600000000000 + i // 10
+        attr = f"颜色{rng.randint(1, 40)}-尺码{i % 10}" if rng.random() > 0.02 else None
+        has_sample = (pid % 20) != 0
+        code = f"SKU{pid % 100000:05d}-{attr}" if (i % 10 == 0 and has_sample and attr) else None
+        pids.append(pid)
+        codes.append(code)
+        attrs.append(attr)
+    base = pd.DataFrame({CODE_COL: codes, PID_COL: pids, ATTR_COL: attrs})
+    print(f"=== fill_code_column 压测: {rows} 行, {base[PID_COL].nunique()} 个商品ID ===")
+
+    results = {}
+    for label, fn in (("逐行循环", _fill_code_column_loop), ("向量化", fill_code_column)):
+        best = float("inf")
+        for _ in range(rounds):
+            df = base.copy()
+            t0 = time.perf_counter()
+            out = fn(df)
+            best = min(best, time.perf_counter() - t0)
+        results[label] = out
+        print(f"  {label:<8} {best * 1000:9.1f} ms")
+
+    old, new = results.values()
+    if old[CODE_COL].fillna("").astype(str).equals(new[CODE_COL].fillna("").astype(str)):
+        print("[OK] 两种实现结果完全一致")
+    else:
+        print("[FAIL] 结果不一致")
+
+
+def mapping_headers(ws) -> list[str]:
+    """\
+    读取 Mapping_Data 表头，重复列名按 pandas 的规则改为 商品链接.1 / 商品ID.1 ...，
+    与 read_excel 得到的列名一致。
     """
-    global NEED_PAUSE
+    headers = []
+    seen: dict[str, int] = {}
+    for cell in ws[1]:
+        name = "" if cell.value is None else str(cell.value).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        headers.append(name)
+    return headers
 
-    if not os.path.exists(mapping_path):
-        raise FileNotFoundError(f"未找到 Mapping_Data.xlsx：{mapping_path}")
 
-    map_df = pd.read_excel(mapping_path)
+def existing_mapping_codes(ws, headers: list[str]) -> set[str]:
+    """只读取 商品選項貨號 一列。"""
+    if CODE_COL not in headers:
+        raise KeyError(f"Mapping_Data 缺少列: {CODE_COL}")
+    col = headers.index(CODE_COL) + 1
+    return {
+        str(v).strip()
+        for (v,) in ws.iter_rows(min_row=2, min_col=col, max_col=col, values_only=True)
+        if not is_empty(v)
+    }
+
+
+def usable_scrape_rows(b_df: pd.DataFrame) -> pd.DataFrame:
+    """校验 B(done) 列，返回 商品選項貨號 和 属性SKU 均非空的行（商品選項貨號 已去空白）。"""
+    global NEED_PAUSE
 
     if CODE_COL not in b_df.columns:
         raise KeyError(f"B(done) 缺少列: {CODE_COL}")
@@ -143,10 +290,7 @@ def append_to_mapping(b_df: pd.DataFrame, mapping_path: str) -> pd.DataFrame:
             raise KeyError(f"B(done) 缺少列: {col}")
 
     # 筛选：code 和 属性SKU 都非空的行
-    def both_non_empty(row):
-        return (not is_empty(row[CODE_COL])) and (not is_empty(row[ATTR_COL]))
-
-    mask_use = b_df.apply(both_non_empty, axis=1)
+    mask_use = ~_empty_mask(b_df[CODE_COL]) & ~_empty_mask(b_df[ATTR_COL])
     used_df = b_df[mask_use].copy()
     skipped_df = b_df[~mask_use].copy()
 
@@ -157,110 +301,355 @@ def append_to_mapping(b_df: pd.DataFrame, mapping_path: str) -> pd.DataFrame:
         NEED_PAUSE = True  # 有警告，需要停留给你看
         print(skipped_df[[PID_COL, ATTR_COL, CODE_COL]].head(10))
 
-    if used_df.empty:
-        print("[INFO] 没有可追加到 Mapping_Data 的新数据。")
-        return map_df
+    used_df[CODE_COL] = used_df[CODE_COL].astype(str).str.strip()
+    return used_df
 
-    # 避免重复：按 商品選項貨號 去重
-    existing_codes = set(map_df[CODE_COL].astype(str))
-    used_df[CODE_COL] = used_df[CODE_COL].astype(str)
 
-    new_rows = used_df[~used_df[CODE_COL].isin(existing_codes)].copy()
-    print(f"[INFO] 去掉已存在的商品選項貨號后，新追加行数: {len(new_rows)}")
+def build_new_mapping_rows(b_df: pd.DataFrame, existing_codes: set[str]) -> pd.DataFrame:
+    """
+    从已经填好的 B(done).xlsx 中，筛选有用的行，构造要追加到 Mapping_Data 的新行。
+    - 只追加 商品選項貨號 和 属性SKU 均非空的行
+    - 避免重复商品選項貨號（包括本批内部重复）
+    """
+    used_df = usable_scrape_rows(b_df)
 
-    if new_rows.empty:
-        print("[INFO] 所有行的 商品選項貨號 在 Mapping_Data 中已存在，不追加。")
-        return map_df
+    # 避免重复：按 商品選項貨號 去重
+    new_rows = used_df[~used_df[CODE_COL].isin(existing_codes)]
+    new_rows = new_rows.drop_duplicates(CODE_COL)
+    print(f"[INFO] 去掉已存在的商品選項貨號后，新追加行数: {len(new_rows)}")
 
-    # 构造与 Mapping_Data 相同列结构的新 DataFrame
-    new_map_df = pd.DataFrame({
-        CODE_COL: new_rows[CODE_COL].astype(str),
+    # 与 Mapping_Data 相同列结构
+    return pd.DataFrame({
+        CODE_COL: new_rows[CODE_COL],
         "商品链接": new_rows[URL_COL],
         "商品ID": new_rows[PID_COL],
         "属性SKU": new_rows[ATTR_COL],
         "SKU ID": new_rows[SKU_ID_COL],
         "Spec ID": new_rows[SPEC_ID_COL],
         "主供应商": new_rows[SHOP_COL],
-        "属性SKU豁免": "",
-        "商品链接.1": "",
-        "商品ID.1": "",
-        "属性SKU.1": "",
-        "SKU ID.1": "",
-        "Spec ID.1": "",
-        "副供应商": "",
     })
 
-    new_map_df = new_map_df.reindex(columns=map_df.columns, fill_value="")
-    map_df = pd.concat([map_df, new_map_df], ignore_index=True)
 
-    return map_df
+def _cell_value(v):
+    if is_empty(v):
+        return None
+    return v.item() if hasattr(v, "item") else v  # numpy 标量转为 Python 类型
 
 
-def set_mapping_view_to_last_rows(path: str):
+def append_rows_to_sheet(ws, headers: list[str], rows: pd.DataFrame) -> int:
+    """\
+    把 rows 追加到工作表末尾（按表头对应列，缺少的列留空），
+    新行沿用原最后一行的单元格样式，筛选范围随之延伸。返回追加行数。
     """
-    用 openpyxl 把 Mapping_Data.xlsx 的视图移动到最后几行，
-    这样打开时光标就在新追加的行附近。
+    style_row = ws.max_row if ws.max_row >= 2 else None
+    styles = (
+        [copy(ws.cell(row=style_row, column=c)._style) for c in range(1, len(headers) + 1)]
+        if style_row else None
+    )
+    cols = [h if h in rows.columns else None for h in headers]
+
+    for record in rows.itertuples(index=False, name=None):
+        values = dict(zip(rows.columns, record))
+        ws.append([_cell_value(values[c]) if c else None for c in cols])
+        if styles:
+            r = ws.max_row
+            for c, style in enumerate(styles, start=1):
+                ws.cell(row=r, column=c)._style = copy(style)
+
+    # 筛选范围跟着延伸到新的最后一行
+    if ws.auto_filter.ref:
+        first, _, last = ws.auto_filter.ref.partition(":")
+        last_col = (last or first).rstrip("0123456789")
+        ws.auto_filter.ref = f"{first}:{last_col}{ws.max_row}"
+    return len(rows)
+
+
+def set_view_to_last_rows(ws) -> None:
+    """把视图移动到最后几行，这样打开时光标就在新追加的行附近。"""
+    last_row = ws.max_row
+    if last_row < 1:
+        return
+
+    # 视图左上角定位到 A(last_row-20) 以便看到下面几行
+    top_row = max(last_row - 20, 1)
+    ws.sheet_view.topLeftCell = f"A{top_row}"
+
+    # 选中最后一行的 A 列
+    sel = list(ws.sheet_view.selection)
+    target = f"A{last_row}"
+    if sel:
+        sel[0].activeCell = target
+        sel[0].sqref = target
+        ws.sheet_view.selection = tuple(sel)
+    else:
+        ws.sheet_view.selection = (Selection(activeCell=target, sqref=target),)
+
+
+def append_to_mapping(b_df: pd.DataFrame, mapping_path: str) -> int:
     """
-    try:
-        wb = load_workbook(path)
-        ws = wb.active
-        last_row = ws.max_row
-        if last_row < 1:
-            wb.save(path)
-            return
+    把 B(done) 中的新行追加到 Mapping_Data.xlsx，返回追加行数。
+    - 只打开一次工作簿：读取已有 商品選項貨號、在末尾写入新行、定位视图，一次保存
+    - 不改动已有行及其格式 / 列宽 / 筛选
+    """
+    if not os.path.exists(mapping_path):
+        raise FileNotFoundError(f"未找到 Mapping_Data.xlsx：{mapping_path}")
 
-        # 视图左上角定位到 A(last_row-20) 以便看到下面几行
-        top_row = max(last_row - 20, 1)
-        ws.sheet_view.topLeftCell = f"A{top_row}"
-
-        # 选中最后一行的 A 列
-        sel = list(ws.sheet_view.selection)
-        target = f"A{last_row}"
-        if sel:
-            sel[0].activeCell = target
-            sel[0].sqref = target
-            ws.sheet_view.selection = tuple(sel)
-        else:
-            ws.sheet_view.selection = (Selection(activeCell=target, sqref=target),)
+    wb = load_workbook(mapping_path)
+    ws = wb.active
+    headers = mapping_headers(ws)
 
-        wb.save(path)
-    except Exception as e:
-        # 这里不要让脚本失败，只是提醒
-        print("[WARN] 设置 Mapping_Data 视图位置失败:", e)
+    new_rows = build_new_mapping_rows(b_df, existing_mapping_codes(ws, headers))
+    if new_rows.empty:
+        print("[INFO] 没有可追加到 Mapping_Data 的新数据，不改动文件。")
+        return 0
 
+    added = append_rows_to_sheet(ws, headers, new_rows)
+    set_view_to_last_rows(ws)
+    wb.save(mapping_path)
+    return added
 
-def main():
+
+def sync_mapping_via_store(b_df: pd.DataFrame, mapping_path: str, db_path: str, source: str) -> tuple[int, int]:
+    """
+    存储模式：抓取结果 upsert 到 mapping_store（新增 + 更新变化的 SKU ID / Spec ID），
+    再把同样的改动写进 Mapping_Data.xlsx（改单元格 + 追加新行，一次保存）。
+    xlsx 在上次同步后被手工修改过时，先把表 import 进存储（以表为准）再 upsert。
+    返回 (新增行数, 更新行数)。
+    """
     global NEED_PAUSE
 
-    print("====================================================")
-    print("  从 B(done).xlsx 填充 商品選項貨號 并追加到 Mapping_Data.xlsx")
-    print("====================================================")
-    print("工作目录:", SCRAPE_FOLDER)
-    print("Mapping:", MAPPING_PATH)
+    used_df = usable_scrape_rows(b_df)
+    with MappingStore(db_path) as store:
+        if store.xlsx_changed(mapping_path):
+            # 换供应商 / 手工新增的行等以表为准，否则会把旧 offer 的 ID 写进已改过的行
+            print("[INFO] Mapping_Data.xlsx 在上次同步后被修改过，先导入表中的修改...")
+            n_new, n_upd = import_from_xlsx(store, mapping_path)
+            print(f"[INFO] 已导入：新增 {n_new}，更新 {n_upd}")
+        inserted, changes, conflicts = store.upsert_scraped(used_df, source=source)
+        # xlsx 按存储的最终状态写，不按逐行的返回值，保证两边一致
+        inserted_codes = list(dict.fromkeys(r["code"] for r in inserted))
+        changed_cols: dict[str, set[str]] = {}
+        for code, col, *_ in changes:
+            changed_cols.setdefault(code, set()).add(col)
+        final = {code: store.get(code) for code in [*inserted_codes, *changed_cols]}
+
+    updated_codes = set(changed_cols) - set(inserted_codes)
+    print(f"[INFO] 存储 upsert：新增 {len(inserted)} 行，更新 {len(updated_codes)} 行（{len(changes)} 个字段）")
+    for code, col, old, new in changes[:10]:
+        print(f"   [更新] {code} {HEADER_OF[col]}: {old or '(空)'} → {new}")
+    if conflicts:
+        NEED_PAUSE = True
+        print(f"[WARN] {len(conflicts)} 个 商品選項貨號 已映射到其他商品ID，未改动（需要换供应商请手工修改后 import）:")
+        for code, old_pid, new_pid in conflicts[:10]:
+            print(f"   {code}: 现有 {old_pid}，抓取 {new_pid}")
+    if not inserted and not changes:
+        print("[INFO] Mapping_Data 没有变化，不改动文件。")
+        return 0, 0
 
+    if not os.path.exists(mapping_path):
+        # 视图文件不存在时直接从存储生成
+        with MappingStore(db_path) as store:
+            store.write_xlsx(mapping_path)
+        return len(inserted), len(updated_codes)
+
+    wb = load_workbook(mapping_path)
+    ws = wb.active
+    headers = mapping_headers(ws)
+    code_idx = headers.index(CODE_COL) + 1
+    row_of: dict[str, int] = {}
+    for (cell,) in ws.iter_rows(min_row=2, min_col=code_idx, max_col=code_idx):
+        if not is_empty(cell.value):
+            # 与 import 一致：重复的 商品選項貨號 以第一行为准
+            row_of.setdefault(str(cell.value).strip(), cell.row)
+
+    def sheet_text(row: int, header: str) -> str:
+        value = ws.cell(row=row, column=headers.index(header) + 1).value if header in headers else None
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return "" if is_empty(value) else str(value).strip()
+
+    skipped: list[str] = []
+    for code in sorted(updated_codes):
+        cols = changed_cols[code]
+        if code not in row_of or any(HEADER_OF[col] not in headers for col in cols):
+            skipped.append(f"{code}（表中没有该行 / 列）")
+            continue
+        # 只改仍指向同一 offer 的行
+        pid_col = "offer_id2" if cols & set(SECONDARY_SLOT) else "offer_id"
+        sheet_pid = sheet_text(row_of[code], HEADER_OF[pid_col])
+        if sheet_pid not in ("", final[code][pid_col]):
+            skipped.append(f"{code}（表中 商品ID {sheet_pid}，存储 {final[code][pid_col]}）")
+            continue
+        for col in sorted(cols):
+            ws.cell(row=row_of[code], column=headers.index(HEADER_OF[col]) + 1).value = excel_value(
+                col, final[code][col]
+            )
+
+    new_codes = [code for code in inserted_codes if code not in row_of]
+    skipped += [f"{code}（表中已有该行）" for code in inserted_codes if code in row_of]
+    new_rows = pd.DataFrame(
+        [{HEADER_OF[col]: excel_value(col, v) for col, v in final[code].items()} for code in new_codes]
+    )
+    append_rows_to_sheet(ws, headers, new_rows)
+    set_view_to_last_rows(ws)
     try:
-        b_path = find_latest_done_workbook(SCRAPE_FOLDER)
-    except FileNotFoundError as e:
-        print(e)
+        wb.save(mapping_path)
+    except Exception:
+        # 存储已提交，再次运行时不会再有变化，只能从存储重新生成视图
+        print(
+            "[ERROR] 存储已更新，但 Mapping_Data.xlsx 保存失败（是否在 Excel 中打开？）。\n"
+            "        关闭文件后运行 python mapping_store.py export：按存储重建整个文件，"
+            "表格格式恢复为默认（原文件备份为 .bak）。"
+        )
+        raise
+    with MappingStore(db_path) as store:
+        store.mark_xlsx_synced(mapping_path)
+
+    if skipped:
         NEED_PAUSE = True
-        return
+        print(f"[WARN] {len(skipped)} 个 商品選項貨號 的改动只写入了存储，未写入 Mapping_Data.xlsx:")
+        for item in skipped[:10]:
+            print("   ", item)
+        print(
+            "   确认表中内容正确后运行 python mapping_store.py import 让存储以表为准。"
+            "不要直接 export：它会按存储重建整个文件，表格格式会丢失。"
+        )
+    return len(inserted_codes), len(updated_codes)
 
-    print(f"[INFO] 将处理最新的 (done) 工作簿: {b_path}")
 
-    # 1) 读取 B(done).xlsx 并填充 商品選項貨號
+def selftest_store_sync() -> bool:
+    """\
+    在临时目录里验证存储模式：
+      1. 同一批中重复的 商品選項貨號 以最后一行为准，重新抓取不覆盖人工维护的字段
+      2. 同步后手工换供应商 / 手工新增行：先导入表中修改，不把旧 offer 的 ID 写进换过的行
+      3. 表有未导入的修改时 export 拒绝覆盖
+    每一步都检查 Mapping_Data.xlsx 与存储逐字段一致。
+    """
+    import tempfile
+
+    import mapping_store
+    from mapping_store import FIELDS
+
+    scrape_cols = [CODE_COL, URL_COL, PID_COL, ATTR_COL, SKU_ID_COL, SPEC_ID_COL, SHOP_COL]
+    headers = [h.split(".")[0] for h, _ in FIELDS]  # 原表的重复列名没有 .1 后缀
+    curated_url = "https://detail.1688.com/offer/1.html?curated"
+    existing = {
+        CODE_COL: "A-红", URL_COL: curated_url, PID_COL: "1",
+        ATTR_COL: "红色（手工）", SKU_ID_COL: "11", SPEC_ID_COL: "s11", "主供应商": "手工供应商",
+    }
+    problems: list[str] = []
+
+    def check(step: str, mapping_path: str, db_path: str, expected: dict) -> None:
+        view = pd.read_excel(mapping_path, dtype=str).fillna("")
+        with MappingStore(db_path) as store:
+            stored = {code: store.get(code) for code in store.codes()}
+        if sorted(view[CODE_COL]) != sorted(stored):
+            problems.append(f"{step} 商品選項貨號 不一致: xlsx {sorted(view[CODE_COL])} / 存储 {sorted(stored)}")
+        for rec in view.to_dict("records"):
+            for header, col in FIELDS:
+                if rec[CODE_COL] in stored and rec[header] != stored[rec[CODE_COL]][col]:
+                    problems.append(
+                        f"{step} {rec[CODE_COL]} {header}: xlsx {rec[header]!r} / 存储 {stored[rec[CODE_COL]][col]!r}"
+                    )
+        for (code, col), value in expected.items():
+            got = (stored.get(code) or {}).get(col)
+            if got != value:
+                problems.append(f"{step} {code} {HEADER_OF[col]}: 期望 {value!r}，实际 {got!r}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mapping_path = os.path.join(tmp, "Mapping_Data.xlsx")
+        db_path = os.path.join(tmp, "mapping_store.sqlite")
+        pd.DataFrame([[existing.get(h) for h, _ in FIELDS]], columns=headers).to_excel(mapping_path, index=False)
+        mapping_store.main(["--db", db_path, "--mapping", mapping_path, "import"])
+
+        print("\n--- 1. 重复 商品選項貨號 / 人工字段 ---")
+        sync_mapping_via_store(
+            pd.DataFrame(
+                [
+                    ["A-红", "https://detail.1688.com/offer/1.html", "1", "红色", "12", "s12", "店铺1"],
+                    ["B-蓝", "https://detail.1688.com/offer/2.html", "2", "蓝色", "21", "s21", "店铺2"],
+                    ["B-蓝", "https://detail.1688.com/offer/2.html", "2", "蓝色", "22", "s22", "店铺2"],
+                ],
+                columns=scrape_cols,
+            ),
+            mapping_path, db_path, source="selftest1(done).xlsx",
+        )
+        check("1", mapping_path, db_path, {
+            ("A-红", "sku_id"): "12", ("A-红", "spec_id"): "s12", ("A-红", "url"): curated_url,
+            ("A-红", "attr"): existing[ATTR_COL], ("A-红", "supplier"): "手工供应商",
+            ("B-蓝", "sku_id"): "22", ("B-蓝", "spec_id"): "s22",
+        })
+
+        print("\n--- 2. 同步后手工换供应商 / 新增行（未 import） ---")
+        wb = load_workbook(mapping_path)
+        ws = wb.active
+        ws.cell(row=2, column=headers.index(PID_COL) + 1).value = 9
+        ws.append(["M-黄", "https://detail.1688.com/offer/3.html", 3, "黄色", 31, "s31", "店铺3"])
+        wb.save(mapping_path)
+        sync_mapping_via_store(
+            pd.DataFrame(
+                [
+                    ["A-红", "https://detail.1688.com/offer/1.html", "1", "红色", "13", "s13", "店铺1"],
+                    ["M-黄", "https://detail.1688.com/offer/3.html", "3", "黄色", "32", "s32", "店铺3"],
+                ],
+                columns=scrape_cols,
+            ),
+            mapping_path, db_path, source="selftest2(done).xlsx",
+        )
+        check("2", mapping_path, db_path, {
+            ("A-红", "offer_id"): "9", ("A-红", "sku_id"): "12", ("M-黄", "sku_id"): "32",
+        })
+
+        print("\n--- 3. 表有未导入的修改时 export ---")
+        wb = load_workbook(mapping_path)
+        wb.active.cell(row=2, column=headers.index("主供应商") + 1).value = "又改了"
+        wb.save(mapping_path)
+        if mapping_store.main(["--db", db_path, "--mapping", mapping_path, "export"]) != 1:
+            problems.append("3 export 覆盖了未导入的手工修改")
+        elif pd.read_excel(mapping_path, dtype=str)["主供应商"][0] != "又改了":
+            problems.append("3 export 拒绝后表仍被改动")
+
+    print()
+    for p in problems:
+        print("   [FAIL]", p)
+    print("[OK] 存储模式自检通过" if not problems else f"[FAIL] 存储模式自检失败（{len(problems)} 处）")
+    return not problems
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="从 (done) 工作簿填充 商品選項貨號 并追加到 Mapping_Data.xlsx")
+    ap.add_argument(
+        "--all", action="store_true",
+        help="一次导入 ID_Scrape 中所有未导入过的 (done) 工作簿（Mapping 只读写一次）",
+    )
+    ap.add_argument(
+        "--bench-fill", type=int, nargs="?", const=100_000, metavar="ROWS",
+        help="压测 fill_code_column 新旧实现（默认 100000 行），不读写任何文件",
+    )
+    ap.add_argument(
+        "--selftest", action="store_true",
+        help="在临时目录中自检存储模式（重复 商品選項貨號 / 人工字段保护 / xlsx 与存储一致）",
+    )
+    return ap.parse_args(argv)
+
+
+def load_and_fill_workbook(b_path: str) -> pd.DataFrame | None:
+    """读取 B(done).xlsx，填充 商品選項貨號 并写回；失败时返回 None。"""
+    global NEED_PAUSE
+
     try:
         b_df = pd.read_excel(b_path)
     except Exception as e:
         print("[ERROR] 读取 B(done).xlsx 失败:", e)
         NEED_PAUSE = True
-        return
+        return None
 
     try:
         b_df = fill_code_column(b_df)
     except Exception as e:
         print("[ERROR] 填充 商品選項貨號 时出错:", e)
         NEED_PAUSE = True
-        return
+        return None
 
     try:
         b_df.to_excel(b_path, index=False)
@@ -268,38 +657,132 @@ def main():
     except Exception as e:
         print("[ERROR] 保存 B(done).xlsx 失败:", e)
         NEED_PAUSE = True
-        return
+        return None
+
+    return b_df
 
-    # 2) 追加到 Mapping_Data.xlsx
-    try:
-        map_df = append_to_mapping(b_df, MAPPING_PATH)
-    except Exception as e:
-        print("[ERROR] 处理 Mapping_Data 时出错:", e)
-        NEED_PAUSE = True
-        return
 
-    # 保存 Mapping_Data，并把视图定位到最后几行
+def update_mapping(b_df: pd.DataFrame, source: str) -> bool:
+    """把 B(done) 行写入 Mapping（存储模式或追加模式），成功返回 True。"""
+    global NEED_PAUSE
+
     try:
-        map_df.to_excel(MAPPING_PATH, index=False)
-        set_mapping_view_to_last_rows(MAPPING_PATH)
-        print(f"[INFO] 已更新 Mapping_Data.xlsx: {MAPPING_PATH}")
+        if os.path.exists(MAPPING_DB_PATH):
+            added, updated = sync_mapping_via_store(b_df, MAPPING_PATH, MAPPING_DB_PATH, source=source)
+            if added or updated:
+                print(f"[INFO] Mapping_Data.xlsx 已同步：新增 {added} 行，更新 {updated} 行: {MAPPING_PATH}")
+        else:
+            added = append_to_mapping(b_df, MAPPING_PATH)
+            if added:
+                print(f"[INFO] 已向 Mapping_Data.xlsx 追加 {added} 行: {MAPPING_PATH}")
     except Exception as e:
-        print("[ERROR] 保存 Mapping_Data.xlsx 失败:", e)
+        print("[ERROR] 更新 Mapping_Data 时出错:", e)
         NEED_PAUSE = True
+        return False
+    return True
+
+
+def ingest_all_pending() -> list[str]:
+    """\
+    批量模式：依次填充所有待导入的 (done) 工作簿，合并后一次写入 Mapping，
+    成功后记入导入记录。返回已导入的文件列表。
+    """
+    ledger = load_ingest_ledger()
+    pending = find_pending_done_workbooks(SCRAPE_FOLDER, ledger)
+    if not pending:
+        print("[INFO] 没有待导入的 (done) 工作簿。")
+        return []
+
+    print(f"[INFO] 待导入 {len(pending)} 个 (done) 工作簿:")
+    for path in pending:
+        print("   ", os.path.basename(path))
+
+    frames = []
+    ok_paths = []
+    rows_of = {}
+    for path in pending:
+        print(f"\n[INFO] 填充: {os.path.basename(path)}")
+        b_df = load_and_fill_workbook(path)
+        if b_df is None:
+            continue
+        # 每行带上来源文件名：存储模式下写进变更历史
+        frames.append(b_df.assign(**{SOURCE_COL: os.path.basename(path)}))
+        ok_paths.append(path)
+        rows_of[path] = len(b_df)
+
+    if not frames:
+        return []
+
+    combined = pd.concat(frames, ignore_index=True)
+    # 同一 商品選項貨號 出现在多个工作簿时以最新的为准（pending 按从旧到新排列）
+    usable = ~_empty_mask(combined[CODE_COL]) & ~_empty_mask(combined[ATTR_COL])
+    codes = combined.loc[usable, CODE_COL].astype(str).str.strip()
+    stale = codes.index[codes.duplicated(keep="last")]
+    if len(stale):
+        print(f"[INFO] {len(stale)} 行 商品選項貨號 在较新的工作簿中再次出现，以最新的为准")
+        combined = combined.drop(index=stale)
+
+    print(f"\n[INFO] 合并 {len(frames)} 个工作簿，共 {len(combined)} 行，写入 Mapping_Data")
+    # 只有 Mapping 保存成功后才记入导入记录，失败时下次 --all 会重新导入
+    if not update_mapping(combined, source="批量导入"):
+        return []
+
+    record_ingested(ledger, ok_paths, rows_of)
+    save_ingest_ledger(ledger)
+    print(f"[INFO] 已记入导入记录: {LEDGER_PATH}")
+    return ok_paths
+
+
+def main(argv=None):
+    global NEED_PAUSE
+
+    args = parse_args(argv)
+    if args.bench_fill:
+        bench_fill_code_column(args.bench_fill)
         return
+    if args.selftest:
+        sys.exit(0 if selftest_store_sync() else 1)
 
-    # 3) 打开两个文件
-    try:
-        os.startfile(b_path)
-    except Exception as e:
-        print("[WARN] 无法自动打开 B(done):", e)
-        NEED_PAUSE = True
+    print("====================================================")
+    print("  从 B(done).xlsx 填充 商品選項貨號 并追加到 Mapping_Data.xlsx")
+    print("====================================================")
+    print("工作目录:", SCRAPE_FOLDER)
+    print("Mapping:", MAPPING_PATH)
 
-    try:
-        os.startfile(MAPPING_PATH)
-    except Exception as e:
-        print("[WARN] 无法自动打开 Mapping_Data:", e)
-        NEED_PAUSE = True
+    if args.all:
+        # 批量模式：只打开 Mapping_Data
+        to_open = [MAPPING_PATH] if ingest_all_pending() else []
+    else:
+        try:
+            b_path = find_latest_done_workbook(SCRAPE_FOLDER)
+        except FileNotFoundError as e:
+            print(e)
+            NEED_PAUSE = True
+            return
+
+        print(f"[INFO] 将处理最新的 (done) 工作簿: {b_path}")
+
+        # 1) 读取 B(done).xlsx 并填充 商品選項貨號
+        b_df = load_and_fill_workbook(b_path)
+        if b_df is None:
+            return
+
+        # 2) 写入 Mapping_Data.xlsx（只写新行 / 改动，并把视图定位到最后几行）
+        if not update_mapping(b_df, source=os.path.basename(b_path)):
+            return
+
+        ledger = load_ingest_ledger()
+        record_ingested(ledger, [b_path], {b_path: len(b_df)})
+        save_ingest_ledger(ledger)
+        to_open = [b_path, MAPPING_PATH]
+
+    # 3) 打开文件
+    for path in to_open:
+        try:
+            os.startfile(path)
+        except Exception as e:
+            print(f"[WARN] 无法自动打开 {os.path.basename(path)}:", e)
+            NEED_PAUSE = True
 
     print("全部处理完成。")
 
@@ -0,0 +1,562 @@
+"""\
+本地 Dianxiaomi (DXM) 接口替身，用于离线端到端压测 / 回归测试。
+
+实现的接口（与 DXM_export_and_audit.py 使用的一致）：
+  - POST /api/package/list.json        分页 + orderId 搜索（仅返回【待审核】包裹）
+  - POST /order/exportPickData.json    创建导出任务，返回 uuid
+  - POST /checkProcess.json            逐次推进 num/totalNum，完成后 msg 为下载链接
+  - GET  /download/<uuid>.xlsx         按任务包裹即时生成拣货单 xlsx
+  - POST /api/package/batchAudit.json  审核后包裹离开【待审核】
+
+用法：
+  python fake_dxm_server.py serve --packages 10000 --latency-ms 50
+  python fake_dxm_server.py bench --packages 10000
+  python fake_dxm_server.py bench-parse --packages 10000
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+import uuid as uuid_lib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openpyxl import Workbook
+
+
+# ================== CONFIG ==================
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+PICK_COLUMNS = ["仓库", "SKU", "商品编码", "名称", "货架位", "数量", "拣货备注", "客服备注"]
+
+
+# ================== FAKE DATA ==================
+
+
+class FakeDxmState:
+    """服务端内存状态：待审核包裹、导出任务、已审核包裹。"""
+
+    def __init__(
+        self,
+        packages: int = 1000,
+        items_per_package: int = 3,
+        sku_count: int = 500,
+        export_steps: int = 3,
+        seed: int = 1688,
+    ):
+        rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.export_steps = max(1, export_steps)
+
+        # 有序 dict：保持 order_pay_time 顺序，分页稳定
+        self.pending: dict[str, dict] = {}
+        self.by_order_id: dict[str, str] = {}
+        self.audited: set[str] = set()
+        self.tasks: dict[str, dict] = {}
+        self.xlsx_cache: dict[str, bytes] = {}
+
+        base_id = 900000000000000000
+        for i in range(packages):
+            pkg_id = base_id + i
+            order_id = f"{250000000000 + i}"
+            items = []
+            for _ in range(rnd.randint(1, max(1, items_per_package))):
+                sku_no = rnd.randrange(sku_count)
+                items.append(
+                    {
+                        "sku": f"SKU{sku_no:05d}",
+                        "productCode": f"P{sku_no:05d}",
+                        "productName": f"测试商品 {sku_no}",
+                        "shelf": f"A-{sku_no % 40:02d}",
+                        "quantity": rnd.randint(1, 5),
+                        "price": round(rnd.uniform(1, 99), 2),
+                        "imgUrl": f"https://img.example.com/{sku_no}.jpg",
+                    }
+                )
+            self.pending[str(pkg_id)] = {
+                "id": pkg_id,
+                "idStr": str(pkg_id),
+                "orderId": order_id,
+                "shopId": rnd.randint(1, 20),
+                "platform": "shopee",
+                "state": "paid",
+                "orderPayTime": 1700000000000 + i * 1000,
+                "buyerAccount": f"buyer_{rnd.randrange(10 ** 6)}",
+                "buyerName": f"测试买家 {i}",
+                "address": {
+                    "country": "TW",
+                    "province": "台北市",
+                    "city": "信义区",
+                    "street": f"测试路 {rnd.randint(1, 999)} 号",
+                    "zip": f"{rnd.randint(100, 999)}",
+                    "phone": f"09{rnd.randint(10 ** 7, 10 ** 8 - 1)}",
+                },
+                "productList": items,
+                "remark": "",
+            }
+            self.by_order_id[order_id] = str(pkg_id)
+
+    def expected_quantity(self, package_ids: list[str] | None = None) -> int:
+        """给定包裹（默认全部待审核）的商品总数量，用于回归校验。"""
+        ids = package_ids if package_ids is not None else list(self.pending)
+        total = 0
+        for pid in ids:
+            pkg = self.pending.get(pid)
+            if pkg:
+                total += sum(it["quantity"] for it in pkg["productList"])
+        return total
+
+    def build_pick_xlsx(self, package_ids: list[str]) -> bytes:
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("拣货单")
+        ws.append(PICK_COLUMNS)
+        for pid in package_ids:
+            pkg = self.pending.get(pid)
+            if not pkg:
+                continue
+            for it in pkg["productList"]:
+                ws.append(
+                    [
+                        "默认仓库",
+                        it["sku"],
+                        it["productCode"],
+                        it["productName"],
+                        it["shelf"],
+                        it["quantity"],
+                        "",
+                        "",
+                    ]
+                )
+        buf = io.BytesIO()
+        wb.save(buf)
+        return buf.getvalue()
+
+
+# ================== HTTP HANDLER ==================
+
+
+class FakeDxmHandler(BaseHTTPRequestHandler):
+    server_version = "FakeDXM/1.0"
+
+    # 关闭默认的逐请求访问日志，压测时避免刷屏
+    def log_message(self, fmt, *args):
+        if getattr(self.server, "verbose", False):
+            super().log_message(fmt, *args)
+
+    @property
+    def state(self) -> FakeDxmState:
+        return self.server.state  # type: ignore[attr-defined]
+
+    def _sleep_latency(self) -> None:
+        latency = getattr(self.server, "latency_s", 0.0)
+        jitter = getattr(self.server, "jitter_s", 0.0)
+        delay = latency + (random.uniform(0, jitter) if jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _read_form(self) -> dict[str, str]:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        parsed = urllib.parse.parse_qs(body, keep_blank_values=True)
+        return {k: v[0] for k, v in parsed.items()}
+
+    def _send_json(self, obj: dict, status: int = 200) -> None:
+        raw = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    # ---------- routes ----------
+
+    def do_POST(self):
+        self._sleep_latency()
+        path = urllib.parse.urlparse(self.path).path
+        form = self._read_form()
+
+        if path == "/api/package/list.json":
+            self._handle_list(form)
+        elif path == "/order/exportPickData.json":
+            self._handle_export(form)
+        elif path == "/checkProcess.json":
+            self._handle_check_process(form)
+        elif path == "/api/package/batchAudit.json":
+            self._handle_batch_audit(form)
+        else:
+            self._send_json({"code": 404, "msg": f"unknown path {path}"}, status=404)
+
+    def do_GET(self):
+        self._sleep_latency()
+        path = urllib.parse.urlparse(self.path).path
+        if path.startswith("/download/") and path.endswith(".xlsx"):
+            self._handle_download(path[len("/download/") : -len(".xlsx")])
+        else:
+            self.send_error(404)
+
+    def _handle_list(self, form: dict[str, str]) -> None:
+        page_no = max(1, int(form.get("pageNo") or 1))
+        page_size = max(1, int(form.get("pageSize") or 50))
+        order_id = (form.get("orderId") or "").strip()
+
+        with self.state.lock:
+            if form.get("isSearch") == "1" and form.get("searchType") == "orderId" and order_id:
+                pid = self.state.by_order_id.get(order_id)
+                rows = [self.state.pending[pid]] if pid in self.state.pending else []
+            else:
+                rows = list(self.state.pending.values())
+
+        total = len(rows)
+        start = (page_no - 1) * page_size
+        page_rows = rows[start : start + page_size]
+        self._send_json(
+            {
+                "code": 0,
+                "msg": "",
+                "data": {
+                    "page": {
+                        "pageNo": page_no,
+                        "pageSize": page_size,
+                        "totalSize": total,
+                        "totalPage": (total + page_size - 1) // page_size,
+                        "list": page_rows,
+                    }
+                },
+            }
+        )
+
+    def _handle_export(self, form: dict[str, str]) -> None:
+        ids = [x for x in (form.get("packageIds") or "").split(",") if x]
+        if not ids:
+            self._send_json({"code": 1, "msg": "packageIds 为空"})
+            return
+        task_uuid = uuid_lib.uuid4().hex
+        with self.state.lock:
+            self.state.tasks[task_uuid] = {"ids": ids, "polls": 0}
+        self._send_json({"code": 0, "msg": "", "uuid": task_uuid})
+
+    def _handle_check_process(self, form: dict[str, str]) -> None:
+        task_uuid = form.get("uuid") or ""
+        with self.state.lock:
+            task = self.state.tasks.get(task_uuid)
+            if task is None:
+                self._send_json({"processMsg": {"code": -1, "msg": "任务不存在"}})
+                return
+            task["polls"] += 1
+            polls = task["polls"]
+            total = len(task["ids"])
+
+        steps = self.state.export_steps
+        if polls < steps:
+            num = total * polls // steps
+            self._send_json(
+                {"processMsg": {"code": 0, "num": num, "totalNum": total, "msg": "导出中..."}}
+            )
+            return
+
+        host, port = self.server.server_address[:2]
+        link = f"http://{host}:{port}/download/{task_uuid}.xlsx"
+        self._send_json(
+            {"processMsg": {"code": 1, "num": total, "totalNum": total, "msg": link}}
+        )
+
+    def _handle_download(self, task_uuid: str) -> None:
+        with self.state.lock:
+            task = self.state.tasks.get(task_uuid)
+            raw = self.state.xlsx_cache.get(task_uuid)
+        if task is None:
+            self.send_error(404)
+            return
+        if raw is None:
+            raw = self.state.build_pick_xlsx(task["ids"])
+            with self.state.lock:
+                self.state.xlsx_cache[task_uuid] = raw
+
+        self.send_response(200)
+        self.send_header(
+            "Content-Type",
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _handle_batch_audit(self, form: dict[str, str]) -> None:
+        ids = [x for x in (form.get("packageIds") or "").split(",") if x]
+        audited = 0
+        with self.state.lock:
+            for pid in ids:
+                pkg = self.state.pending.pop(pid, None)
+                if pkg is not None:
+                    self.state.by_order_id.pop(pkg["orderId"], None)
+                    self.state.audited.add(pid)
+                    audited += 1
+        self._send_json({"code": 0, "msg": f"审核成功 {audited} 个包裹"})
+
+
+# ================== SERVER ==================
+
+
+def start_server(
+    state: FakeDxmState,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    verbose: bool = False,
+) -> ThreadingHTTPServer:
+    """在后台线程启动服务，返回 server（调用方负责 shutdown）。port=0 时自动分配端口。"""
+    httpd = ThreadingHTTPServer((host, port), FakeDxmHandler)
+    httpd.daemon_threads = True
+    httpd.state = state  # type: ignore[attr-defined]
+    httpd.latency_s = latency_ms / 1000.0  # type: ignore[attr-defined]
+    httpd.jitter_s = jitter_ms / 1000.0  # type: ignore[attr-defined]
+    httpd.verbose = verbose  # type: ignore[attr-defined]
+
+    t = threading.Thread(target=httpd.serve_forever, daemon=True)
+    t.start()
+    return httpd
+
+
+def server_base_url(httpd: ThreadingHTTPServer) -> str:
+    host, port = httpd.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+# ================== BENCHMARK ==================
+
+
+def run_e2e_bench(args) -> int:
+    """启动本地替身 → 以 Mode 1 跑 export_and_maybe_audit → 校验结果并输出耗时。"""
+    print("=== 构造模拟数据 ===")
+    t0 = time.perf_counter()
+    state = FakeDxmState(
+        packages=args.packages,
+        items_per_package=args.items_per_package,
+        sku_count=args.skus,
+        export_steps=args.export_steps,
+        seed=args.seed,
+    )
+    all_ids = list(state.pending)
+    expected_qty = state.expected_quantity()
+    print(f"[INFO] 包裹 {len(all_ids)} 个，商品总数量 {expected_qty}，耗时 {time.perf_counter() - t0:.2f}s")
+
+    httpd = start_server(
+        state,
+        port=0,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        verbose=args.verbose,
+    )
+    base_url = server_base_url(httpd)
+    print(f"[INFO] Fake DXM 已启动: {base_url}")
+
+    # DXM_export_and_audit 在导入时读取这些环境变量
+    os.environ["DXM_BASE_URL"] = base_url
+    os.environ.setdefault("DXM_COOKIE", "fake=1")
+
+    import DXM_export_and_audit as dxm
+    import picklist_store
+
+    out_dir = tempfile.mkdtemp(prefix="fake_dxm_bench_")
+    dxm.DOWNLOAD_DIR = out_dir
+    picklist_store.STORE_DIR = os.path.join(out_dir, "Picklist_Store")
+    dxm.POLL_INTERVAL = args.poll_interval
+    dxm.DRY_RUN = False
+    dxm.DO_EXPORT = True
+    dxm.DO_AUDIT = True
+    dxm.EXPORT_CACHE_TTL_SEC = 0  # 压测必须真实走导出流程
+
+    print(f"[INFO] 下载目录: {out_dir}")
+    print("=== 运行 export_and_maybe_audit(mode=1) ===")
+    t1 = time.perf_counter()
+    dxm.export_and_maybe_audit(mode=1)
+    elapsed = time.perf_counter() - t1
+    httpd.shutdown()
+
+    import pandas as pd
+
+    files = sorted(
+        os.path.join(out_dir, f) for f in os.listdir(out_dir) if f.lower().endswith(".xlsx")
+    )
+    stored_qty = int(picklist_store.sku_demand(days=1)["数量"].sum()) if picklist_store.pa else None
+    got_qty = 0
+    for f in files:
+        df = pd.read_excel(f)
+        got_qty += int(pd.to_numeric(df["数量"], errors="coerce").fillna(0).sum())
+
+    expected_files = (len(all_ids) + dxm.MAX_ORDERS - 1) // dxm.MAX_ORDERS
+    checks = {
+        "导出文件数": (len(files), expected_files),
+        "商品总数量": (got_qty, expected_qty),
+        "已审核包裹数": (len(state.audited), len(all_ids)),
+        "剩余待审核": (len(state.pending), 0),
+    }
+    if stored_qty is not None:
+        checks["拣货单存储数量"] = (stored_qty, expected_qty)
+
+    print("\n=== 结果 ===")
+    ok = True
+    for name, (got, want) in checks.items():
+        flag = "OK" if got == want else "FAIL"
+        ok = ok and got == want
+        print(f"[{flag}] {name}: {got} (期望 {want})")
+    print(f"[INFO] 端到端耗时: {elapsed:.2f}s ({len(all_ids) / elapsed:.0f} 包裹/秒)")
+    return 0 if ok else 1
+
+
+def build_list_pages(state: FakeDxmState, page_size: int) -> list[bytes]:
+    """把全部待审核包裹序列化成 list.json 分页响应（与服务端返回格式一致）。"""
+    rows = list(state.pending.values())
+    pages = []
+    for start in range(0, len(rows), page_size):
+        body = {
+            "code": 0,
+            "msg": "",
+            "data": {"page": {"pageNo": start // page_size + 1, "list": rows[start : start + page_size]}},
+        }
+        pages.append(json.dumps(body, ensure_ascii=False).encode("utf-8"))
+    return pages
+
+
+def _measure(label: str, fn, pages: list[bytes], rounds: int) -> None:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn(pages)
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    kept = fn(pages)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"  {label:<24} 行数={len(kept):>6}  最快={best * 1000:8.1f} ms  "
+        f"常驻={retained / 1024 / 1024:7.2f} MB  峰值={peak / 1024 / 1024:7.2f} MB"
+    )
+
+
+def run_parse_bench(args) -> int:
+    """对比：完整 dict 常驻（旧实现） vs parse_list_json_page 投影。"""
+    os.environ.setdefault("DXM_COOKIE", "fake=1")
+    import DXM_export_and_audit as dxm
+
+    state = FakeDxmState(
+        packages=args.packages,
+        items_per_package=args.items_per_package,
+        sku_count=args.skus,
+        seed=args.seed,
+    )
+    pages = build_list_pages(state, dxm.MAX_ORDERS)
+    total_mb = sum(len(p) for p in pages) / 1024 / 1024
+    print(f"=== list.json 解析压测: {args.packages} 包裹, {len(pages)} 页, {total_mb:.1f} MB ===")
+    print(f"[INFO] orjson 可用: {dxm.orjson is not None}")
+
+    def legacy(pages):
+        out = []
+        for raw in pages:
+            j = json.loads(raw)
+            out.extend(j.get("data", {}).get("page", {}).get("list", []) or [])
+        return out
+
+    def projected(pages):
+        out = []
+        for raw in pages:
+            rows, _ = dxm.parse_list_json_page(raw)
+            out.extend(rows)
+        return out
+
+    _measure("完整 dict (json)", legacy, pages, args.rounds)
+    _measure("投影 PendingPackage", projected, pages, args.rounds)
+
+    if [r.get("idStr") for r in legacy(pages)] != [p.package_id for p in projected(pages)]:
+        print("[FAIL] 投影结果与完整解析的 packageId 不一致")
+        return 1
+    print("[OK] 投影结果与完整解析一致")
+    return 0
+
+
+# ================== MAIN ==================
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="本地 DXM 接口替身 / 端到端压测")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    def add_common(p):
+        p.add_argument("--packages", type=int, default=1000, help="待审核包裹数量")
+        p.add_argument("--items-per-package", type=int, default=3, help="每个包裹最多商品行数")
+        p.add_argument("--skus", type=int, default=500, help="SKU 种类数")
+        p.add_argument("--export-steps", type=int, default=3, help="checkProcess 需要轮询几次才完成")
+        p.add_argument("--latency-ms", type=float, default=0.0, help="每个请求的固定延迟")
+        p.add_argument("--jitter-ms", type=float, default=0.0, help="每个请求额外的随机延迟上限")
+        p.add_argument("--seed", type=int, default=1688)
+        p.add_argument("--verbose", action="store_true", help="打印访问日志")
+
+    p_serve = sub.add_parser("serve", help="前台运行服务")
+    add_common(p_serve)
+    p_serve.add_argument("--host", default=DEFAULT_HOST)
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    p_bench = sub.add_parser("bench", help="端到端压测 export_and_maybe_audit")
+    add_common(p_bench)
+    p_bench.add_argument("--poll-interval", type=float, default=0.05, help="覆盖 POLL_INTERVAL（秒）")
+
+    p_parse = sub.add_parser("bench-parse", help="list.json 解析耗时 / 内存对比")
+    add_common(p_parse)
+    p_parse.add_argument("--rounds", type=int, default=3, help="计时轮数（取最快）")
+
+    return ap
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+
+    if args.command == "bench":
+        return run_e2e_bench(args)
+    if args.command == "bench-parse":
+        return run_parse_bench(args)
+
+    state = FakeDxmState(
+        packages=args.packages,
+        items_per_package=args.items_per_package,
+        sku_count=args.skus,
+        export_steps=args.export_steps,
+        seed=args.seed,
+    )
+    httpd = start_server(
+        state,
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        verbose=args.verbose,
+    )
+    base_url = server_base_url(httpd)
+    print(f"=== Fake DXM 已启动: {base_url} ===")
+    print(f"[INFO] 待审核包裹 {len(state.pending)} 个")
+    print("[提示] 另开终端执行:")
+    print(f"       set DXM_BASE_URL={base_url}")
+    print("       set DXM_COOKIE=fake=1")
+    print("       python DXM_export_and_audit.py")
+    print("按 Ctrl+C 停止。")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        httpd.shutdown()
+        print("\n已停止。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""\
+Mapping_Data 新鲜度巡检：后台增量重新抓取 Mapping_Data 引用的 1688 商品，
+在加购失败之前发现 Spec ID 已变化 / SKU 已删除的映射。
+
+每轮巡检：
+  1. 读取 Mapping_Data（主 / 副供应商）中所有 offer 及其映射行
+  2. 按优先级排序：最近 N 天拣货数量（picklist_store）× 距上次检查的天数
+  3. 取前 --batch 个 offer 重新抓取（HTTP-first，被拦截的走常驻服务 / 无界面浏览器）
+  4. 与 Mapping_Data 对比，输出变化清单 Mapping_Freshness/freshness_diff_*.xlsx
+     （抓取失败的 offer 单独列在“抓取失败”工作表，不算作变化）
+
+抓取结果写回 SKU 缓存（sku_scrape_cache.sqlite），检查时间记录在同一数据库的
+freshness_checks 表中；只有抓到 SKU 的 offer 才记为已检查，被拦截 / 出错的下一轮重试。
+
+用法：
+  python mapping_freshness_sweeper.py --dry-run              # 只看优先级，不联网
+  python mapping_freshness_sweeper.py --batch 30             # 巡检一轮
+  python mapping_freshness_sweeper.py --every 120           # 每 120 分钟一轮（Ctrl+C 停止）
+  python mapping_freshness_sweeper.py --every 120 --daemon   # 同上，需要浏览器的 offer 交给常驻浏览器服务
+
+巡检始终无人值守运行：不打开有界面浏览器、不等待输入；登录失效时需要浏览器的 offer 留到下一轮。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import scrape_1688_http_paste_links_open as scraper
+from config import MAPPING_PATH, SCRAPE_FOLDER
+from sku_scrape_cache import SkuScrapeCache
+
+try:
+    import picklist_store
+except ImportError:
+    picklist_store = None
+
+
+# ================== CONFIG ==================
+
+OUTPUT_DIR = os.path.join(SCRAPE_FOLDER, "Mapping_Freshness")
+
+DEFAULT_BATCH = 30
+# 距上次检查不足这么多天的 offer 不参与本轮
+DEFAULT_MIN_AGE_DAYS = 7
+# 拣货需求统计窗口（天）
+DEMAND_DAYS = 90
+# 从未检查过的 offer 按这么多天计算陈旧度
+NEVER_CHECKED_AGE_DAYS = 365
+
+CODE_COLS = ("商品選項貨號", "商品选項貨號", "商品选项货号")
+
+# (供应商, 商品链接列, 商品ID列, 属性SKU列, SKU ID列, Spec ID列)
+SUPPLIER_SLOTS = (
+    ("主", "商品链接", "商品ID", "属性SKU", "SKU ID", "Spec ID"),
+    ("副", "商品链接.1", "商品ID.1", "属性SKU.1", "SKU ID.1", "Spec ID.1"),
+)
+
+CHECKS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS freshness_checks (
+    offer_id   TEXT PRIMARY KEY,
+    checked_at REAL NOT NULL,
+    status     TEXT NOT NULL DEFAULT '',
+    changes    INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+DIFF_COLUMNS = [
+    "商品選項貨號",
+    "供应商",
+    "商品ID",
+    "属性SKU",
+    "变化",
+    "旧 SKU ID",
+    "新 SKU ID",
+    "旧 Spec ID",
+    "新 Spec ID",
+    "说明",
+]
+
+FAILED_COLUMNS = ["商品ID", "商品链接", "失败原因", "商品選項貨號"]
+
+
+# ================== Load ==================
+
+
+def load_mapping_entries(mapping_path: str = MAPPING_PATH) -> pd.DataFrame:
+    """\
+    把 Mapping_Data 展开成每个 (商品選項貨號, 供应商) 一行：
+    columns: code, slot, offer_id, attr, sku_id, spec_id
+    """
+    df = pd.read_excel(mapping_path, dtype=str).fillna("")
+    df.columns = [str(c).strip() for c in df.columns]
+    code_col = next((c for c in CODE_COLS if c in df.columns), None)
+    if code_col is None:
+        raise KeyError("Mapping_Data 中未找到 '商品選項貨號' 列")
+
+    parts = []
+    for slot, url_col, pid_col, attr_col, sku_col, spec_col in SUPPLIER_SLOTS:
+        if pid_col not in df.columns and url_col not in df.columns:
+            continue
+        pid = df.get(pid_col, pd.Series("", index=df.index)).str.strip()
+        from_url = df.get(url_col, pd.Series("", index=df.index)).map(scraper.extract_offer_id)
+        part = pd.DataFrame(
+            {
+                "code": df[code_col].str.strip(),
+                "slot": slot,
+                "offer_id": pid.where(pid.str.isdigit(), from_url),
+                "attr": df.get(attr_col, pd.Series("", index=df.index)).str.strip(),
+                "sku_id": df.get(sku_col, pd.Series("", index=df.index)).str.strip(),
+                "spec_id": df.get(spec_col, pd.Series("", index=df.index)).str.strip(),
+            }
+        )
+        parts.append(part[part["offer_id"] != ""])
+
+    if not parts:
+        return pd.DataFrame(columns=["code", "slot", "offer_id", "attr", "sku_id", "spec_id"])
+    return pd.concat(parts, ignore_index=True)
+
+
+def load_demand(days: int = DEMAND_DAYS) -> dict[str, int]:
+    """商品選項貨號(大写) → 最近 days 天拣货数量；没有拣货单存储时返回空。"""
+    if picklist_store is None:
+        return {}
+    try:
+        df = picklist_store.sku_demand(days=days)
+    except Exception as e:
+        print(f"[WARN] 读取拣货需求失败，按陈旧度排序: {e}")
+        return {}
+    return dict(zip(df["SKU"].astype(str).str.strip().str.upper(), df["数量"].astype(int)))
+
+
+def last_checked(cache: SkuScrapeCache) -> dict[str, float]:
+    """offer_id → 最近一次检查时间（巡检记录与正常抓取缓存取较新者）。"""
+    cache.conn.executescript(CHECKS_SCHEMA)
+    out: dict[str, float] = {}
+    for offer_id, ts in cache.conn.execute("SELECT offer_id, fetched_at FROM offers"):
+        out[offer_id] = ts
+    # 只算成功的检查（旧版本也记录过失败）
+    for offer_id, ts in cache.conn.execute("SELECT offer_id, checked_at FROM freshness_checks WHERE status = 'ok'"):
+        out[offer_id] = max(ts, out.get(offer_id, 0.0))
+    return out
+
+
+# ================== Plan ==================
+
+
+def plan_sweep(
+    entries: pd.DataFrame,
+    demand: dict[str, int],
+    checked: dict[str, float],
+    batch: int,
+    min_age_days: float,
+) -> pd.DataFrame:
+    """返回本轮要检查的 offer（按优先级降序）：offer_id, units, age_days, score, codes。"""
+    now = time.time()
+    units = entries["code"].str.upper().map(demand).fillna(0).astype(int)
+    per_offer = (
+        entries.assign(units=units)
+        .groupby("offer_id")
+        .agg(units=("units", "sum"), codes=("code", "nunique"))
+        .reset_index()
+    )
+    per_offer["age_days"] = [
+        (now - checked[o]) / 86400 if o in checked else NEVER_CHECKED_AGE_DAYS
+        for o in per_offer["offer_id"]
+    ]
+    per_offer["score"] = (1 + per_offer["units"]) * per_offer["age_days"]
+    due = per_offer[per_offer["age_days"] >= min_age_days]
+    return due.sort_values("score", ascending=False).head(batch).reset_index(drop=True)
+
+
+# ================== Diff ==================
+
+
+def diff_offer(mapped: pd.DataFrame, rows: list[dict]) -> list[dict]:
+    """对比一个 offer 的映射行与最新抓取结果（rows 非空），返回变化记录（无变化时为空）。"""
+    out = []
+
+    def record(m, change, new_sku="", new_spec="", note=""):
+        out.append(
+            {
+                "商品選項貨號": m.code,
+                "供应商": m.slot,
+                "商品ID": m.offer_id,
+                "属性SKU": m.attr,
+                "变化": change,
+                "旧 SKU ID": m.sku_id,
+                "新 SKU ID": new_sku,
+                "旧 Spec ID": m.spec_id,
+                "新 Spec ID": new_spec,
+                "说明": note,
+            }
+        )
+
+    by_spec = {str(r["Spec ID"]): r for r in rows}
+    by_attr = {scraper.normalize_text(r["属性SKU"]): r for r in rows}
+    for m in mapped.itertuples(index=False):
+        if m.spec_id and m.spec_id in by_spec:
+            fresh = by_spec[m.spec_id]
+            if m.sku_id and str(fresh["SKU ID"]) != m.sku_id:
+                record(m, "SKU ID 变化", str(fresh["SKU ID"]), m.spec_id)
+            continue
+        fresh = by_attr.get(m.attr)
+        if fresh is not None:
+            record(m, "Spec ID 变化", str(fresh["SKU ID"]), str(fresh["Spec ID"]))
+        elif m.spec_id or m.attr:
+            record(m, "规格已删除", note=f"当前共有 {len(rows)} 个规格")
+    return out
+
+
+# ================== Sweep ==================
+
+
+def scrape_args(args: argparse.Namespace) -> argparse.Namespace:
+    """巡检使用的抓取参数：HTTP-first + 无界面浏览器兜底，无人值守（不等待登录 / 验证）。"""
+    argv = ["--http-first", "--unattended", "--tabs", str(args.tabs), "--pace", str(args.pace)]
+    if args.daemon:
+        argv += ["--daemon", args.daemon]
+    return scraper.parse_args(argv)
+
+
+async def sweep_once(args: argparse.Namespace) -> pd.DataFrame:
+    print(f"\n=== Mapping_Data 巡检 {datetime.now():%Y-%m-%d %H:%M:%S} ===")
+    entries = load_mapping_entries(args.mapping)
+    demand = load_demand(args.demand_days)
+
+    cache = SkuScrapeCache()
+    try:
+        plan = plan_sweep(entries, demand, last_checked(cache), args.batch, args.min_age_days)
+        print(
+            f"[INFO] Mapping_Data 共 {entries['offer_id'].nunique()} 个 offer，"
+            f"本轮检查 {len(plan)} 个（需求窗口 {args.demand_days} 天）"
+        )
+        if plan.empty:
+            return pd.DataFrame(columns=DIFF_COLUMNS)
+        print(plan.head(20).to_string(index=False))
+        if args.dry_run:
+            return pd.DataFrame(columns=DIFF_COLUMNS)
+
+        offer_ids = plan["offer_id"].tolist()
+        urls = [scraper.offer_url(o) for o in offer_ids]
+        fetched: dict[str, tuple[list[dict], str]] = {}
+
+        def on_result(j: int, res: tuple[str, list[dict], str]) -> None:
+            url, rows, error = res
+            offer_id = offer_ids[j]
+            fetched[offer_id] = (rows, error)
+            if rows:
+                records = [{k: r[k] for k in ("SKU ID", "Spec ID", "属性SKU")} for r in rows]
+                cache.put(offer_id, url, records, rows[0]["店铺名称"])
+
+        await scraper.fetch_links(scrape_args(args), urls, on_result)
+
+        diffs: list[dict] = []
+        failed: list[dict] = []
+        by_offer = entries.groupby("offer_id")
+        deferred = [o for o in offer_ids if o not in fetched]
+        if deferred:
+            print(f"[WARN] {len(deferred)} 个 offer 需要登录后的浏览器，本轮未检查，留到下一轮")
+        with cache.conn:
+            for offer_id, url in zip(offer_ids, urls):
+                rows, error = fetched.get(offer_id, ([], ""))
+                mapped = by_offer.get_group(offer_id)
+                if not rows:
+                    # 被拦截 / 出错：不记录检查时间，下一轮仍按原优先级排队
+                    if offer_id in fetched:
+                        failed.append(
+                            {
+                                "商品ID": offer_id,
+                                "商品链接": url,
+                                "失败原因": error,
+                                "商品選項貨號": "、".join(dict.fromkeys(mapped["code"])),
+                            }
+                        )
+                    continue
+                changes = diff_offer(mapped, rows)
+                diffs.extend(changes)
+                cache.conn.execute(
+                    "INSERT OR REPLACE INTO freshness_checks (offer_id, checked_at, status, changes) "
+                    "VALUES (?, ?, ?, ?)",
+                    (offer_id, time.time(), "ok", len(changes)),
+                )
+    finally:
+        cache.close()
+
+    diff_df = pd.DataFrame(diffs, columns=DIFF_COLUMNS)
+    failed_df = pd.DataFrame(failed, columns=FAILED_COLUMNS)
+    n_ok = len(offer_ids) - len(deferred) - len(failed_df)
+    print(
+        f"\n[INFO] 抓取成功 {n_ok}/{len(offer_ids)} 个 offer，发现 {len(diff_df)} 条变化；"
+        f"抓取失败 {len(failed_df)} 个（下一轮重试）"
+    )
+    if not failed_df.empty:
+        print(failed_df["失败原因"].value_counts().head(10).to_string())
+    if not diff_df.empty or not failed_df.empty:
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        out_path = os.path.join(
+            OUTPUT_DIR, f"freshness_diff_{datetime.now().strftime('%Y%m%d-%H%M%S')}.xlsx"
+        )
+        with pd.ExcelWriter(out_path) as writer:
+            diff_df.to_excel(writer, sheet_name="变化", index=False)
+            if not failed_df.empty:
+                failed_df.to_excel(writer, sheet_name="抓取失败", index=False)
+        if not diff_df.empty:
+            print(diff_df["变化"].value_counts().to_string())
+        print(f"[OK] 巡检结果已写出: {out_path}")
+    return diff_df
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Mapping_Data 新鲜度巡检")
+    ap.add_argument("--mapping", default=MAPPING_PATH, help="Mapping_Data.xlsx 路径")
+    ap.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="每轮最多检查的 offer 数")
+    ap.add_argument(
+        "--min-age-days",
+        type=float,
+        default=DEFAULT_MIN_AGE_DAYS,
+        help="距上次检查不足 N 天的 offer 跳过",
+    )
+    ap.add_argument("--demand-days", type=int, default=DEMAND_DAYS, help="拣货需求统计窗口（天）")
+    ap.add_argument("--every", type=float, help="每隔 N 分钟巡检一轮（不指定则只跑一轮）")
+    ap.add_argument("--dry-run", action="store_true", help="只打印本轮计划，不联网")
+    ap.add_argument("--tabs", type=int, default=2, help="并发数（HTTP / 浏览器标签页）")
+    ap.add_argument("--pace", type=float, default=3.0, help="同域名请求最小间隔（秒）")
+    ap.add_argument(
+        "--daemon",
+        nargs="?",
+        const=scraper.DEFAULT_DAEMON_URL,
+        metavar="URL",
+        help="需要浏览器的 offer 交给常驻浏览器服务",
+    )
+    args = ap.parse_args(argv)
+
+    if not os.path.exists(args.mapping):
+        print(f"[ERROR] 未找到 Mapping_Data: {args.mapping}")
+        return 1
+
+    try:
+        while True:
+            try:
+                asyncio.run(sweep_once(args))
+            except Exception as e:
+                # 单轮失败（浏览器目录被占用 / 网络错误等）不影响常驻巡检
+                print(f"[ERROR] 本轮巡检失败: {type(e).__name__}: {e}")
+                if not args.every:
+                    return 1
+            if not args.every or args.dry_run:
+                break
+            print(f"[INFO] {args.every:.0f} 分钟后进行下一轮（Ctrl+C 停止）")
+            time.sleep(args.every * 60)
+    except KeyboardInterrupt:
+        print("\n已停止。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
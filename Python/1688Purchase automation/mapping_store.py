@@ -0,0 +1,436 @@
+"""\
+Mapping_Data 的 SQLite 存储：商品選項貨號 唯一索引 + upsert + 变更历史。
+
+Mapping_Data.xlsx 仍是下游脚本（加购 / 抓取预筛 / 新鲜度巡检）读取的视图，
+记录本身保存在 mapping_store.sqlite 中：
+
+  - 同一 商品選項貨號 只有一行，查找 / 去重走索引
+  - 抓取结果 upsert：同一 offer 的 SKU ID / Spec ID 变化时直接更新（主 / 副供应商槽位各自匹配），
+    链接 / 属性SKU / 供应商 等人工维护的字段只在为空时补上
+  - 每次字段变化写入 mapping_history，可按 商品選項貨號 追溯
+  - 记录 xlsx 上次 import / export / 同步时的文件签名；表在那之后被手工修改时，
+    同步前先 import，export 拒绝覆盖（--force 除外）
+
+用法：
+  python mapping_store.py import                  # 从 Mapping_Data.xlsx 建库 / 同步手工修改
+  python mapping_store.py export                  # 从存储重新生成 Mapping_Data.xlsx
+  python mapping_store.py get ABC-红色
+  python mapping_store.py history --code ABC-红色
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+from openpyxl.worksheet.views import Selection
+
+from config import MAPPING_DB_PATH, MAPPING_PATH
+
+
+# ================== CONFIG ==================
+
+# (xlsx 列名（read_excel 得到的名字）, 数据库列名)
+FIELDS = [
+    ("商品選項貨號", "code"),
+    ("商品链接", "url"),
+    ("商品ID", "offer_id"),
+    ("属性SKU", "attr"),
+    ("SKU ID", "sku_id"),
+    ("Spec ID", "spec_id"),
+    ("主供应商", "supplier"),
+    ("属性SKU豁免", "attr_exempt"),
+    ("商品链接.1", "url2"),
+    ("商品ID.1", "offer_id2"),
+    ("属性SKU.1", "attr2"),
+    ("SKU ID.1", "sku_id2"),
+    ("Spec ID.1", "spec_id2"),
+    ("副供应商", "supplier2"),
+]
+COLUMN_OF = dict(FIELDS)
+HEADER_OF = {col: header for header, col in FIELDS}
+
+# 抓取结果能更新的槽位：主供应商 / 副供应商
+PRIMARY_SLOT = ["url", "offer_id", "attr", "sku_id", "spec_id", "supplier"]
+SECONDARY_SLOT = ["url2", "offer_id2", "attr2", "sku_id2", "spec_id2", "supplier2"]
+# 可能经过人工整理的字段：重新抓取不覆盖，只在为空时填入
+CURATED_FIELDS = {"url", "attr", "supplier", "url2", "attr2", "supplier2"}
+
+# 导出 xlsx 时写成数字的列（与原表一致，避免“以文本形式存储的数字”）
+NUMERIC_COLUMNS = {"offer_id", "sku_id", "offer_id2", "sku_id2"}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS mapping (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    {", ".join(f"{col} TEXT NOT NULL DEFAULT ''" for _, col in FIELDS)},
+    updated_at REAL NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mapping_code ON mapping (code);
+CREATE INDEX IF NOT EXISTS idx_mapping_offer ON mapping (offer_id);
+CREATE TABLE IF NOT EXISTS mapping_history (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    code       TEXT NOT NULL,
+    field      TEXT NOT NULL,
+    old_value  TEXT NOT NULL,
+    new_value  TEXT NOT NULL,
+    source     TEXT NOT NULL DEFAULT '',
+    changed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_code ON mapping_history (code);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+# ================== Helpers ==================
+
+
+def _text(value) -> str:
+    """统一转成去空白的字符串；空值 / NaN → ""，整数形式的浮点数去掉 .0。"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:
+            return ""
+        if value.is_integer():
+            return str(int(value))
+    return str(value).strip()
+
+
+def xlsx_signature(path: str) -> str:
+    """文件修改时间 + 大小，用来判断 xlsx 在上次同步后是否被改过。"""
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def excel_value(col: str, value: str):
+    """存储中的文本 → 写入 xlsx 的值（空 → None，ID 列转回数字）。"""
+    if value == "":
+        return None
+    if col in NUMERIC_COLUMNS and value.isdigit() and not value.startswith("0") and len(value) <= 15:
+        return int(value)
+    return value
+
+
+# ================== Store ==================
+
+
+class MappingStore:
+    """商品選項貨號 → 主 / 副供应商映射。"""
+
+    def __init__(self, path: str = MAPPING_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM mapping").fetchone()[0]
+
+    def get(self, code: str) -> dict | None:
+        cols = [col for _, col in FIELDS]
+        row = self.conn.execute(
+            f"SELECT {', '.join(cols)} FROM mapping WHERE code = ?", (_text(code),)
+        ).fetchone()
+        return dict(zip(cols, row)) if row else None
+
+    def codes(self) -> set[str]:
+        return {code for (code,) in self.conn.execute("SELECT code FROM mapping")}
+
+    def _insert(self, record: dict, now: float) -> None:
+        cols = [col for _, col in FIELDS]
+        self.conn.execute(
+            f"INSERT INTO mapping ({', '.join(cols)}, updated_at) "
+            f"VALUES ({', '.join('?' * len(cols))}, ?)",
+            [record.get(col, "") for col in cols] + [now],
+        )
+
+    def _update(self, code: str, changes: dict, source: str, now: float) -> list[tuple]:
+        """changes: {列名: (旧值, 新值)}；写入 mapping 和 mapping_history，返回变更列表。"""
+        self.conn.execute(
+            f"UPDATE mapping SET {', '.join(f'{col} = ?' for col in changes)}, updated_at = ? "
+            "WHERE code = ?",
+            [new for _, new in changes.values()] + [now, code],
+        )
+        self.conn.executemany(
+            "INSERT INTO mapping_history (code, field, old_value, new_value, source, changed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(code, col, old, new, source, now) for col, (old, new) in changes.items()],
+        )
+        return [(code, col, old, new) for col, (old, new) in changes.items()]
+
+    def import_dataframe(self, df: pd.DataFrame, source: str) -> tuple[int, int]:
+        """\
+        以 Mapping_Data.xlsx 为准整行 upsert（包括手工清空的字段），返回 (新增, 更新) 行数。
+        同一 商品選項貨號 在表中出现多次时保留第一行。
+        """
+        if "商品選項貨號" not in df.columns:
+            raise KeyError("Mapping_Data 缺少列: 商品選項貨號")
+        unknown = [c for c in df.columns if c not in COLUMN_OF]
+        if unknown:
+            print(f"[WARN] 以下列不在存储结构中，将被忽略: {unknown}")
+
+        present = [(header, col) for header, col in FIELDS if header in df.columns]
+        now = time.time()
+        inserted = updated = duplicates = 0
+        seen: set[str] = set()
+        with self.conn:
+            for values in df[[h for h, _ in present]].itertuples(index=False, name=None):
+                record = {col: _text(v) for (_, col), v in zip(present, values)}
+                code = record["code"]
+                if not code:
+                    continue
+                if code in seen:
+                    duplicates += 1
+                    continue
+                seen.add(code)
+
+                old = self.get(code)
+                if old is None:
+                    self._insert(record, now)
+                    inserted += 1
+                    continue
+                changes = {
+                    col: (old[col], new) for col, new in record.items() if old[col] != new
+                }
+                if changes:
+                    self._update(code, changes, source, now)
+                    updated += 1
+
+        if duplicates:
+            print(f"[WARN] 表中有 {duplicates} 行 商品選項貨號 重复，只保留了第一行。")
+        only_in_store = len(self.codes() - seen)
+        if only_in_store:
+            print(f"[WARN] 存储中有 {only_in_store} 个 商品選項貨號 不在本次导入的表中（未删除）。")
+        return inserted, updated
+
+    def upsert_scraped(self, rows: pd.DataFrame, source: str) -> tuple[list[dict], list[tuple], list[tuple]]:
+        """\
+        用抓取结果（列: 商品選項貨號 / 商品链接 / 商品ID / 属性SKU / SKU ID / Spec ID / 店铺名称）upsert。
+
+        - 同一批中 商品選項貨號 重复时以最后一行为准
+        - 新 商品選項貨號 → 新增一行（写入主供应商槽位）
+        - 已存在且 商品ID 与主供应商（或主供应商为空）/ 副供应商一致 → 更新该槽位中变化的 ID 列
+          （SKU ID / Spec ID）；链接 / 属性SKU / 供应商 只在为空时填入
+        - 商品ID 与两个槽位都不一致 → 不改动，作为冲突返回（需要人工确认换供应商）
+
+        返回 (新增记录, 变更 [(code, 列名, 旧值, 新值)], 冲突 [(code, 已有商品ID, 抓取商品ID)])。
+        """
+        src_cols = ["商品選項貨號", "商品链接", "商品ID", "属性SKU", "SKU ID", "Spec ID", "店铺名称"]
+        missing = [c for c in src_cols if c not in rows.columns]
+        if missing:
+            raise KeyError(f"抓取结果缺少列: {missing}")
+
+        codes = rows["商品選項貨號"].map(_text)
+        duplicated = (codes != "") & codes.duplicated(keep="last")
+        if duplicated.any():
+            print(f"[WARN] 本批抓取结果中有 {int(duplicated.sum())} 行 商品選項貨號 重复，以最后一行为准。")
+            rows = rows[~duplicated.to_numpy()]
+
+        # 批量导入时每行可带 来源文件 列，变更历史按行记录来源
+        sources = rows["来源文件"] if "来源文件" in rows.columns else [source] * len(rows)
+
+        now = time.time()
+        inserted: list[dict] = []
+        changes: list[tuple] = []
+        conflicts: list[tuple] = []
+        with self.conn:
+            for values, row_source in zip(rows[src_cols].itertuples(index=False, name=None), sources):
+                code, url, offer_id, attr, sku_id, spec_id, shop = map(_text, values)
+                if not code:
+                    continue
+                scraped = [url, offer_id, attr, sku_id, spec_id, shop]
+
+                old = self.get(code)
+                if old is None:
+                    record = {"code": code, **dict(zip(PRIMARY_SLOT, scraped))}
+                    self._insert(record, now)
+                    inserted.append(record)
+                    continue
+
+                if old["offer_id"] in ("", offer_id):
+                    slot = PRIMARY_SLOT
+                elif old["offer_id2"] == offer_id:
+                    slot = SECONDARY_SLOT
+                else:
+                    conflicts.append((code, old["offer_id"], offer_id))
+                    continue
+
+                diff = {
+                    col: (old[col], new)
+                    for col, new in zip(slot, scraped)
+                    if new and old[col] != new and not (col in CURATED_FIELDS and old[col])
+                }
+                if diff:
+                    changes.extend(self._update(code, diff, row_source, now))
+        return inserted, changes, conflicts
+
+    def history(self, code: str | None = None, limit: int = 50) -> pd.DataFrame:
+        sql = "SELECT code, field, old_value, new_value, source, changed_at FROM mapping_history"
+        params: tuple = ()
+        if code:
+            sql += " WHERE code = ?"
+            params = (_text(code),)
+        sql += " ORDER BY id DESC LIMIT ?"
+        df = pd.read_sql_query(sql, self.conn, params=params + (limit,))
+        df["field"] = df["field"].map(HEADER_OF)
+        df["changed_at"] = pd.to_datetime(df["changed_at"], unit="s").dt.strftime("%Y-%m-%d %H:%M")
+        return df
+
+    def _set_meta(self, key: str, value: str) -> None:
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_headers(self, headers: list[str]) -> None:
+        self._set_meta("headers", json.dumps(headers, ensure_ascii=False))
+
+    def headers(self) -> list[str]:
+        """导出时使用的表头文字（导入时记录的原表头；没有时用 FIELDS）。"""
+        value = self._meta("headers")
+        if value:
+            headers = json.loads(value)
+            if len(headers) == len(FIELDS):
+                return headers
+        return [header for header, _ in FIELDS]
+
+    def mark_xlsx_synced(self, path: str, signature: str | None = None) -> None:
+        """记录 xlsx 的文件签名（import / export / 同步保存成功后调用；默认取当前签名）。"""
+        self._set_meta("xlsx_signature", signature or xlsx_signature(path))
+
+    def xlsx_changed(self, path: str) -> bool:
+        """xlsx 在上次 import / export / 同步之后被修改过（或从未记录过）时返回 True。"""
+        if not os.path.exists(path):
+            return False
+        return self._meta("xlsx_signature") != xlsx_signature(path)
+
+    def write_xlsx(self, path: str = MAPPING_PATH) -> int:
+        """从存储重新生成 Mapping_Data.xlsx（原文件备份为 .bak），返回数据行数。"""
+        cols = [col for _, col in FIELDS]
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Sheet1"
+        ws.append(self.headers())
+        for cell in ws[1]:
+            cell.font = Font(bold=True)
+        n = 0
+        for row in self.conn.execute(f"SELECT {', '.join(cols)} FROM mapping ORDER BY seq"):
+            ws.append([excel_value(col, v) for col, v in zip(cols, row)])
+            n += 1
+        ws.freeze_panes = "A2"
+        ws.auto_filter.ref = ws.dimensions
+
+        # 视图定位到最后几行（与 Update_mapping_from_scrape 追加后一致）
+        last_row = ws.max_row
+        ws.sheet_view.topLeftCell = f"A{max(last_row - 20, 1)}"
+        ws.sheet_view.selection = (Selection(activeCell=f"A{last_row}", sqref=f"A{last_row}"),)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.xlsx"
+        wb.save(tmp)
+        if os.path.exists(path):
+            shutil.copy2(path, path + ".bak")
+        os.replace(tmp, path)
+        self.mark_xlsx_synced(path)
+        return n
+
+
+def read_mapping_headers(path: str) -> list[str]:
+    """读取 xlsx 第一行的原始表头文字。"""
+    wb = load_workbook(path, read_only=True)
+    try:
+        first = next(wb.active.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        return [_text(v) for v in first]
+    finally:
+        wb.close()
+
+
+def import_from_xlsx(store: MappingStore, path: str = MAPPING_PATH) -> tuple[int, int]:
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"未找到 Mapping_Data.xlsx：{path}")
+    signature = xlsx_signature(path)
+    df = pd.read_excel(path, dtype=str)
+    store.set_headers(read_mapping_headers(path))
+    result = store.import_dataframe(df, source=f"xlsx:{os.path.basename(path)}")
+    # 记录读取前的签名：导入期间表又被保存时，下次仍会重新导入
+    store.mark_xlsx_synced(path, signature)
+    return result
+
+
+# ================== CLI ==================
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Mapping_Data SQLite 存储")
+    ap.add_argument("--db", default=MAPPING_DB_PATH, help="存储文件")
+    ap.add_argument("--mapping", default=MAPPING_PATH, help="Mapping_Data.xlsx 路径")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("import", help="从 Mapping_Data.xlsx 建库 / 同步手工修改（以表为准）")
+    p_export = sub.add_parser("export", help="从存储重新生成 Mapping_Data.xlsx（整表重建，格式恢复为默认）")
+    p_export.add_argument(
+        "--force", action="store_true", help="表在上次 import / 同步后被修改过时也覆盖（丢失这些修改）"
+    )
+
+    p_get = sub.add_parser("get", help="按 商品選項貨號 查询")
+    p_get.add_argument("code")
+
+    p_hist = sub.add_parser("history", help="查看变更历史")
+    p_hist.add_argument("--code")
+    p_hist.add_argument("--limit", type=int, default=50)
+
+    args = ap.parse_args(argv)
+
+    with MappingStore(args.db) as store:
+        if args.command == "import":
+            t0 = time.perf_counter()
+            inserted, updated = import_from_xlsx(store, args.mapping)
+            print(
+                f"[OK] 导入完成：新增 {inserted}，更新 {updated}，共 {store.count()} 行"
+                f"（{time.perf_counter() - t0:.1f}s）"
+            )
+        elif args.command == "export":
+            if store.xlsx_changed(args.mapping) and not args.force:
+                print(
+                    "[ERROR] Mapping_Data.xlsx 在上次 import / 同步之后被修改过。export 会按存储重建整个文件，"
+                    "这些手工修改和表格格式都会丢失。\n"
+                    "        请先运行 python mapping_store.py import 合入修改；确认要覆盖时加 --force。"
+                )
+                return 1
+            n = store.write_xlsx(args.mapping)
+            print(f"[OK] 已重新生成 {args.mapping}（{n} 行，格式为默认格式；原文件备份为 .bak）")
+        elif args.command == "get":
+            rec = store.get(args.code)
+            if rec is None:
+                print(f"[WARN] 未找到: {args.code}")
+                return 1
+            for col, value in rec.items():
+                print(f"  {HEADER_OF[col]:<8} {value}")
+        elif args.command == "history":
+            df = store.history(args.code, args.limit)
+            print(df.to_string(index=False) if not df.empty else "[INFO] 没有变更记录")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""\
+历史拣货单列式存储（Parquet，按日期分区）+ 按 SKU 需求聚合查询。
+
+每张汇总后的 DXM 拣货单都会追加一份到:
+    Picklist_Store/date=YYYY-MM-DD/<拣货单文件名>.parquet
+
+同名拣货单重复写入会覆盖原分区文件，因此导出缓存命中 / 重跑不会重复计数。
+
+用法：
+  python picklist_store.py demand --days 30 --top 50
+  python picklist_store.py demand --start 2026-09-01 --end 2026-09-30 --out demand.xlsx
+  python picklist_store.py backfill           # 从 Finished_added_to_cart 回填历史拣货单
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # 可选依赖：未安装时仅跳过存储，不影响导出流程
+    pa = None
+
+from config import PICKLIST_FOLDER, PICKLIST_STORE_DIR
+
+
+# ================== CONFIG ==================
+
+STORE_DIR = PICKLIST_STORE_DIR
+FINISHED_DIR = os.path.join(PICKLIST_FOLDER, "Finished_added_to_cart")
+
+PARTITION_PREFIX = "date="
+
+
+# ================== Helpers ==================
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("未安装 pyarrow，无法使用拣货单存储。请执行: pip install pyarrow")
+
+
+def _partition_dir(day: date) -> str:
+    return os.path.join(STORE_DIR, f"{PARTITION_PREFIX}{day.isoformat()}")
+
+
+def _parse_day(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), "%Y-%m-%d").date()
+
+
+def list_partitions(start: date, end: date) -> list[tuple[date, str]]:
+    """返回 [start, end] 区间内的分区目录（只看目录名，不打开任何文件）。"""
+    if not os.path.isdir(STORE_DIR):
+        return []
+    out = []
+    for name in os.listdir(STORE_DIR):
+        if not name.startswith(PARTITION_PREFIX):
+            continue
+        try:
+            day = _parse_day(name[len(PARTITION_PREFIX):])
+        except ValueError:
+            continue
+        if start <= day <= end:
+            out.append((day, os.path.join(STORE_DIR, name)))
+    out.sort()
+    return out
+
+
+def find_source_files(source: str) -> list[tuple[date, str]]:
+    """同名拣货单在所有分区中的文件（正常情况下最多一个）。"""
+    name = f"{source}.parquet"
+    return [
+        (day, os.path.join(part_dir, name))
+        for day, part_dir in list_partitions(date.min, date.max)
+        if os.path.exists(os.path.join(part_dir, name))
+    ]
+
+
+# ================== Write ==================
+
+
+def append_picklist(xlsx_path: str, picked_date=None) -> int:
+    """\
+    把一张（已按 SKU 汇总的）拣货单写入存储，返回写入的 SKU 行数。
+
+    拣货单文件名是整个存储内的去重键：同名拣货单已存在时替换旧记录，不会在另一天的分区
+    再写一份。picked_date 未指定时沿用已有记录的日期（首次写入取今天）；
+    指定时移动到该日期的分区。
+    """
+    _require_pyarrow()
+
+    df = pd.read_excel(xlsx_path, dtype={"SKU": str})
+    if "SKU" not in df.columns or "数量" not in df.columns:
+        print(f"[WARN] 拣货单缺少 SKU / 数量 列，未写入存储: {xlsx_path}")
+        return 0
+
+    source = os.path.splitext(os.path.basename(xlsx_path))[0]
+    existing = find_source_files(source)
+    if picked_date is not None:
+        day = _parse_day(picked_date)
+    elif existing:
+        day = existing[0][0]
+    else:
+        day = date.today()
+
+    skus = df["SKU"].astype(str).str.strip()
+    qty = pd.to_numeric(df["数量"], errors="coerce").fillna(0).astype("int64")
+    keep = (skus != "") & (skus.str.lower() != "nan")
+    out = (
+        pd.DataFrame({"SKU": skus[keep], "数量": qty[keep]})
+        .groupby("SKU", as_index=False)["数量"]
+        .sum()
+    )
+    out["source"] = source
+
+    part_dir = _partition_dir(day)
+    os.makedirs(part_dir, exist_ok=True)
+    target = os.path.join(part_dir, f"{source}.parquet")
+    tmp = target + ".tmp"
+    pq.write_table(pa.Table.from_pandas(out, preserve_index=False), tmp)
+    os.replace(tmp, target)
+    for _, old_path in existing:
+        if old_path != target:
+            os.remove(old_path)
+            if not os.listdir(os.path.dirname(old_path)):
+                os.rmdir(os.path.dirname(old_path))
+
+    print(f"[STORE] 拣货单已写入存储 ({day.isoformat()}, {len(out)} 个 SKU): {target}")
+    return len(out)
+
+
+def backfill_from_folder(folder: str = FINISHED_DIR) -> int:
+    """\
+    回填 Finished_added_to_cart 中的历史拣货单（忽略 (done) 结果表），
+    日期取文件修改时间。返回处理的文件数。
+    """
+    _require_pyarrow()
+    if not os.path.isdir(folder):
+        print(f"[WARN] 目录不存在: {folder}")
+        return 0
+
+    count = 0
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(".xlsx") or name.startswith("~$") or "(done)" in name:
+            continue
+        path = os.path.join(folder, name)
+        day = datetime.fromtimestamp(os.path.getmtime(path)).date()
+        try:
+            if append_picklist(path, picked_date=day):
+                count += 1
+        except Exception as e:
+            print(f"[WARN] 回填失败: {name} ({e})")
+    print(f"[INFO] 回填完成，共 {count} 个拣货单。")
+    return count
+
+
+# ================== Query ==================
+
+
+def sku_demand(
+    days: int = 30,
+    start=None,
+    end=None,
+) -> pd.DataFrame:
+    """\
+    按 SKU 聚合 [start, end] 区间（默认最近 days 天，含今天）的拣货数量。
+    只读取区间内的分区，聚合在 Arrow 内完成。
+
+    返回列: SKU, 数量, 出现天数, 日均
+    """
+    _require_pyarrow()
+
+    end_day = _parse_day(end) if end is not None else date.today()
+    start_day = _parse_day(start) if start is not None else end_day - timedelta(days=days - 1)
+    window_days = (end_day - start_day).days + 1
+
+    files = []
+    day_of_file = []
+    for day, part_dir in list_partitions(start_day, end_day):
+        for name in os.listdir(part_dir):
+            if name.endswith(".parquet"):
+                files.append(os.path.join(part_dir, name))
+                day_of_file.append(day.isoformat())
+
+    columns = ["SKU", "数量", "出现天数", "日均"]
+    if not files:
+        return pd.DataFrame(columns=columns)
+
+    tables = []
+    for path, day_str in zip(files, day_of_file):
+        t = pq.read_table(path, columns=["SKU", "数量"])
+        tables.append(t.append_column("date", pa.array([day_str] * t.num_rows, pa.string())))
+    table = pa.concat_tables(tables)
+
+    agg = table.group_by("SKU").aggregate([("数量", "sum"), ("date", "count_distinct")])
+    out = agg.to_pandas().rename(columns={"数量_sum": "数量", "date_count_distinct": "出现天数"})
+    out["日均"] = (out["数量"] / window_days).round(2)
+    return out[columns].sort_values("数量", ascending=False, ignore_index=True)
+
+
+def open_dataset():
+    """返回整个存储的 pyarrow Dataset（带 date 分区列），供临时分析使用。"""
+    _require_pyarrow()
+    files = [
+        os.path.join(part_dir, name)
+        for _, part_dir in list_partitions(date.min, date.max)
+        for name in os.listdir(part_dir)
+        if name.endswith(".parquet")
+    ]
+    return ds.dataset(
+        files, format="parquet", partitioning="hive", partition_base_dir=STORE_DIR
+    )
+
+
+# ================== CLI ==================
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="历史拣货单存储 / SKU 需求查询")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p_demand = sub.add_parser("demand", help="按 SKU 查询区间需求")
+    p_demand.add_argument("--days", type=int, default=30, help="最近 N 天（含今天）")
+    p_demand.add_argument("--start", help="开始日期 YYYY-MM-DD（优先于 --days）")
+    p_demand.add_argument("--end", help="结束日期 YYYY-MM-DD（默认今天）")
+    p_demand.add_argument("--top", type=int, default=30, help="打印前 N 个 SKU")
+    p_demand.add_argument("--out", help="把完整结果写入 xlsx")
+
+    p_backfill = sub.add_parser("backfill", help="从 Finished_added_to_cart 回填")
+    p_backfill.add_argument("--folder", default=FINISHED_DIR)
+
+    args = ap.parse_args(argv)
+
+    if args.command == "backfill":
+        backfill_from_folder(args.folder)
+        return 0
+
+    t0 = time.perf_counter()
+    df = sku_demand(days=args.days, start=args.start, end=args.end)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    print(f"[INFO] 共 {len(df)} 个 SKU，查询耗时 {elapsed_ms:.1f} ms")
+    if not df.empty:
+        print(df.head(args.top).to_string(index=False))
+    if args.out:
+        df.to_excel(args.out, index=False)
+        print(f"[INFO] 已写出: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
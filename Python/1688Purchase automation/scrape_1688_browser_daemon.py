@@ -0,0 +1,214 @@
+"""\
+1688 抓取用常驻浏览器服务。
+
+启动一次 Chrome（持久化用户目录 playwright_1688_profile）并保持登录，
+之后的抓取任务通过本地 HTTP 接口提交，不再重复启动浏览器 / 打开首页 / 等待登录。
+
+接口（仅监听 127.0.0.1）：
+  - GET  /status     运行状态（登录是否有效、是否忙碌、已处理链接数）
+  - POST /scrape     {"urls": [...], "block_profile": "full"}
+                     → {"results": [{"url", "rows", "error"}, ...]}（与 urls 顺序一致）
+  - POST /shutdown   关闭浏览器并退出
+
+同一时间只执行一个批次（多个请求排队），节流状态在批次之间保留；
+每个批次都可以再暂停一次等待手动验证，批次结束后轮转 debug_html。
+
+用法：
+  python scrape_1688_browser_daemon.py --tabs 3
+  python scrape_1688_http_paste_links_open.py --daemon
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from playwright.async_api import async_playwright
+
+import scrape_1688_http_paste_links_open as scraper
+
+
+# ================== CONFIG ==================
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+
+
+# ================== Service ==================
+
+
+class BrowserService:
+    """持有已登录的浏览器上下文；HTTP 线程通过 submit() 把任务投递到事件循环。"""
+
+    def __init__(self, context, page, loop, tabs: int, pace: float, block_profile: str):
+        self.context = context
+        self.page = page
+        self.loop = loop
+        self.tabs = tabs
+        self.block_profile = block_profile
+        self.pacer = scraper.AdaptivePacer(pace, tabs)
+        self.lock = asyncio.Lock()
+        self.busy = False
+        self.jobs_done = 0
+        self.urls_done = 0
+        self.started_at = time.time()
+        self.stopped = asyncio.Event()
+
+    async def scrape(self, urls: list[str], block_profile: str | None = None) -> list[dict]:
+        async with self.lock:
+            self.busy = True
+            try:
+                if not await scraper.is_logged_in(self.context):
+                    print("[WARN] 登录已失效，请在浏览器中重新登录。")
+                    await scraper.wait_for_manual_login(self.page)
+                # 间隔 / 并发沿用上一批，但“每次运行只暂停一次”按批次计算
+                self.pacer.paused_once = False
+                results = await scraper.scrape_links_with_retry(
+                    self.context,
+                    urls,
+                    self.tabs,
+                    self.pacer,
+                    block_profile or self.block_profile,
+                )
+                # 顺便刷新导出的 Cookie，供 --http-first 使用
+                await scraper.export_browser_cookies(self.context, self.page)
+            finally:
+                self.busy = False
+                await asyncio.to_thread(scraper.prune_debug_html)
+            self.jobs_done += 1
+            self.urls_done += len(urls)
+        return [{"url": url, "rows": rows, "error": error} for url, rows, error in results]
+
+    async def status(self) -> dict:
+        return {
+            "ok": True,
+            "logged_in": await scraper.is_logged_in(self.context),
+            "busy": self.busy,
+            "jobs_done": self.jobs_done,
+            "urls_done": self.urls_done,
+            "uptime_sec": round(time.time() - self.started_at, 1),
+            "tabs": self.pacer.tabs,
+            "interval_sec": round(self.pacer.min_interval, 2),
+        }
+
+    def submit(self, coro):
+        """供 HTTP 线程调用：在浏览器事件循环中执行 coro 并等待结果。"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+# ================== HTTP ==================
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    @property
+    def service(self) -> BrowserService:
+        return self.server.service  # type: ignore[attr-defined]
+
+    def _send_json(self, obj: dict, status: int = 200) -> None:
+        raw = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path == "/status":
+            self._send_json(self.service.submit(self.service.status()))
+        else:
+            self._send_json({"ok": False, "msg": f"unknown path {path}"}, status=404)
+
+    def do_POST(self):
+        path = urllib.parse.urlparse(self.path).path
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._send_json({"ok": False, "msg": "请求体不是 JSON"}, status=400)
+            return
+
+        if path == "/scrape":
+            urls = [scraper.normalize_text(u) for u in body.get("urls", [])]
+            urls = [u for u in urls if u]
+            profile = body.get("block_profile")
+            if profile is not None and profile not in scraper.BLOCK_PROFILES:
+                self._send_json({"ok": False, "msg": f"未知 block_profile: {profile}"}, status=400)
+                return
+            print(f"\n[INFO] 收到抓取任务：{len(urls)} 个链接")
+            results = self.service.submit(self.service.scrape(urls, profile))
+            self._send_json({"ok": True, "results": results})
+        elif path == "/shutdown":
+            self._send_json({"ok": True})
+            self.service.loop.call_soon_threadsafe(self.service.stopped.set)
+        else:
+            self._send_json({"ok": False, "msg": f"unknown path {path}"}, status=404)
+
+
+# ================== Main ==================
+
+
+async def serve(args: argparse.Namespace) -> None:
+    print("=== 1688 常驻浏览器服务 ===")
+    print("版本:", scraper.SCRIPT_VERSION)
+    print("浏览器用户目录:", scraper.PROFILE_DIR)
+
+    async with async_playwright() as p:
+        context = await scraper.launch_browser_context(p)
+        page = await scraper.open_logged_in_page(context)
+        await scraper.export_browser_cookies(context, page)
+
+        service = BrowserService(
+            context, page, asyncio.get_running_loop(), args.tabs, args.pace, args.block_profile
+        )
+        httpd = ThreadingHTTPServer((args.host, args.port), DaemonHandler)
+        httpd.daemon_threads = True
+        httpd.service = service  # type: ignore[attr-defined]
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+        print(f"\n[OK] 服务已启动: http://{args.host}:{args.port}")
+        print("[提示] 另开终端执行: python scrape_1688_http_paste_links_open.py --daemon")
+        print("按 Ctrl+C 或 POST /shutdown 停止。")
+        try:
+            await service.stopped.wait()
+        finally:
+            httpd.shutdown()
+            await context.close()
+    print("已停止。")
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="1688 抓取常驻浏览器服务")
+    ap.add_argument("--host", default=DEFAULT_HOST)
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--tabs", type=int, default=scraper.DEFAULT_TABS, help="并发标签页数量（上限）")
+    ap.add_argument(
+        "--pace", type=float, default=scraper.DOMAIN_MIN_INTERVAL, help="同域名导航最小间隔（秒）"
+    )
+    ap.add_argument(
+        "--block-profile",
+        choices=sorted(scraper.BLOCK_PROFILES),
+        default=scraper.DEFAULT_BLOCK_PROFILE,
+        help="默认资源拦截配置（请求中可单独指定）",
+    )
+    args = ap.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\n已停止。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
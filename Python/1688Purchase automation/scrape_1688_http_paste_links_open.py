@@ -3,16 +3,104 @@ import re
 import json
 import time
 import sys
+import gzip
+import random
+import asyncio
+import argparse
+from collections import deque
 from pathlib import Path
 from datetime import datetime
+from urllib.parse import urlparse
 
 import pandas as pd
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-
-from config import SCRAPE_FOLDER
-
-
-SCRIPT_VERSION = "scrape_1688_browser_login v2026-04-13-01"
+import requests
+from requests.adapters import HTTPAdapter
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+from config import SCRAPE_FOLDER, MAPPING_PATH
+from sku_scrape_cache import SkuScrapeCache
+
+try:
+    import zstandard  # 可选：有则用 zstd 压缩调试 HTML，否则用 gzip
+except ImportError:
+    zstandard = None
+
+
+SCRIPT_VERSION = "scrape_1688_browser_login v2026-10-19-07"
+
+# 并发标签页数量（同一个持久化浏览器上下文中）
+DEFAULT_TABS = 3
+
+# 调试 HTML 存档（debug_html/）：
+#   off      不保存
+#   failures 只保存失败（被拦截 / 解析不到 SKU）的页面
+#   sample   失败页面 + 按比例抽样的成功页面
+#   all      全部保存
+DEBUG_HTML_MODE = "failures"
+DEBUG_HTML_SAMPLE_RATE = 0.05
+# 轮转：超过天数的文件删除；总大小超过上限时从最旧的开始删除
+DEBUG_HTML_MAX_AGE_DAYS = 14
+DEBUG_HTML_MAX_MB = 300
+
+# SKU 缓存有效期（天）：在此期限内抓取过的 offer 直接从缓存返回
+SKU_CACHE_TTL_DAYS = 7
+
+# 同一域名相邻两次页面导航的最小间隔（秒，跨所有标签页）
+DOMAIN_MIN_INTERVAL = 2.0
+
+# AIMD 自适应节流（浏览器抓取）：
+#   成功一次间隔减少 AIMD_STEP_SEC（不低于 --pace），连续成功 AIMD_GROW_EVERY 次多开一个标签页；
+#   命中风控间隔翻倍（不超过 AIMD_MAX_INTERVAL），并发减半。
+#   最近 AIMD_WINDOW 个结果中被拦截达到 AIMD_PAUSE_BLOCKS 个时，暂停等待手动验证（每次运行一次）。
+AIMD_STEP_SEC = 0.25
+AIMD_GROW_EVERY = 5
+AIMD_MAX_INTERVAL = 30.0
+AIMD_WINDOW = 10
+AIMD_PAUSE_BLOCKS = 3
+
+# 批次结束后重试被拦截链接前的冷却时间（秒）
+BLOCKED_RETRY_COOLDOWN_SEC = 30
+
+# 页面就绪等待上限（秒）：skuModel 出现即就绪，命中验证页立即失败，否则超时
+READY_TIMEOUT_SEC = 20
+
+# HTTP-first 模式：requests 直连的超时（连接, 读取）
+HTTP_TIMEOUT = (10, 30)
+
+# 无界面模式的登录校验页：未登录时会跳转到 login.1688.com
+LOGIN_CHECK_URL = "https://work.1688.com/"
+
+# 命中风控时 scrape_one_product 返回的失败原因
+BLOCKED_ERROR = "命中风控验证页"
+
+# 页面 URL 中出现这些片段即视为风控/验证页
+BLOCK_URL_MARKERS = ("_____tmd_____/punish", "punish", "captcha", "x5secdata")
+
+# 资源拦截：抓取只需要页面内嵌的 JSON，图片/视频/字体/埋点请求直接 abort。
+# 注意不要拦截 g.alicdn.com 的普通脚本（滑块验证依赖它们）。
+ANALYTICS_URL_MARKERS = (
+    "log.mmstat.com",
+    "gm.mmstat.com",
+    "wgo.mmstat.com",
+    "aplus",
+    "arms-retcode",
+    "/alilog/",
+    "ynuf.aliapp.org",
+    "hm.baidu.com",
+    "cnzz.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+)
+
+BLOCK_PROFILES = {
+    "off": {"types": frozenset(), "url_markers": ()},
+    "media": {"types": frozenset({"image", "media", "font"}), "url_markers": ()},
+    "full": {
+        "types": frozenset({"image", "media", "font"}),
+        "url_markers": ANALYTICS_URL_MARKERS,
+    },
+}
+DEFAULT_BLOCK_PROFILE = "full"
 
 
 # ======================================================================
@@ -27,6 +115,15 @@ DEBUG_DIR.mkdir(parents=True, exist_ok=True)
 PROFILE_DIR = BASE_DIR / "playwright_1688_profile"
 PROFILE_DIR.mkdir(parents=True, exist_ok=True)
 
+# 每次浏览器会话结束时从持久化上下文导出的 Cookie + UA（HTTP-first 模式使用）
+COOKIE_EXPORT_PATH = BASE_DIR / "cookies_1688.json"
+
+# 登录一次后保存的 Playwright storage state（Cookie + localStorage），供无界面抓取使用
+STORAGE_STATE_PATH = BASE_DIR / "storage_state_1688.json"
+
+# 抓取检查点：每个链接一得到结果就追加一行，中断后可用 --resume 继续
+CHECKPOINT_PATH = BASE_DIR / "scrape_checkpoint.jsonl"
+
 
 # ======================================================================
 # Utilities
@@ -44,13 +141,103 @@ def extract_offer_id(url: str) -> str:
     return ""
 
 
-def save_debug_html(offer_id: str, html: str) -> None:
-    target = DEBUG_DIR / f"{offer_id or 'unknown'}.html"
-    target.write_text(html, encoding="utf-8")
+DEBUG_HTML_SUFFIXES = (".html", ".html.gz", ".html.zst")
+
+
+def debug_capture_wanted(failed: bool) -> bool:
+    """按 DEBUG_HTML_MODE 决定本页面是否需要保存调试 HTML。"""
+    if DEBUG_HTML_MODE == "all":
+        return True
+    if DEBUG_HTML_MODE == "failures":
+        return failed
+    if DEBUG_HTML_MODE == "sample":
+        return failed or random.random() < DEBUG_HTML_SAMPLE_RATE
+    return False
+
+
+def save_debug_html(offer_id: str, html: str, failed: bool = True) -> None:
+    """压缩保存调试 HTML（zstd 优先，其次 gzip）；同一 offer 只保留最新一份。"""
+    if not debug_capture_wanted(failed):
+        return
+
+    name = offer_id or "unknown"
+    raw = html.encode("utf-8")
+    if zstandard is not None:
+        target = DEBUG_DIR / f"{name}.html.zst"
+        data = zstandard.ZstdCompressor(level=6).compress(raw)
+    else:
+        target = DEBUG_DIR / f"{name}.html.gz"
+        data = gzip.compress(raw, compresslevel=6)
+
+    for suffix in DEBUG_HTML_SUFFIXES:
+        old = DEBUG_DIR / f"{name}{suffix}"
+        if old != target and old.exists():
+            old.unlink()
+    target.write_bytes(data)
+
+
+def read_debug_html(path: Path) -> str:
+    """读取 debug_html 中的单个文件（兼容旧的未压缩 .html）。"""
+    raw = path.read_bytes()
+    if path.name.endswith(".gz"):
+        raw = gzip.decompress(raw)
+    elif path.name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("读取 .zst 需要安装 zstandard")
+        raw = zstandard.ZstdDecompressor().decompress(raw)
+    return raw.decode("utf-8", errors="ignore")
+
+
+def iter_debug_html_files(folder: Path = None) -> list[Path]:
+    folder = folder or DEBUG_DIR
+    return sorted(
+        p for p in folder.iterdir()
+        if p.is_file() and p.name.endswith(DEBUG_HTML_SUFFIXES)
+    )
+
+
+def prune_debug_html() -> None:
+    """按时间和总大小轮转 debug_html。"""
+    files = []
+    now = time.time()
+    removed = 0
+    for p in iter_debug_html_files():
+        st = p.stat()
+        if now - st.st_mtime > DEBUG_HTML_MAX_AGE_DAYS * 86400:
+            p.unlink()
+            removed += 1
+        else:
+            files.append((st.st_mtime, st.st_size, p))
+
+    budget = DEBUG_HTML_MAX_MB * 1024 * 1024
+    total = sum(size for _, size, _ in files)
+    files.sort()
+    for _, size, p in files:
+        if total <= budget:
+            break
+        p.unlink()
+        total -= size
+        removed += 1
+
+    if removed:
+        print(f"[INFO] debug_html 轮转：删除 {removed} 个旧文件，当前 {total / 1024 / 1024:.1f} MB")
+
+
+URL_PATTERN = re.compile(r"https?://[^\s\"'<>，、]+")
+OFFER_ID_PATTERN = re.compile(r"^\d{8,15}$")
+
+# add_to_cart (done) 表中未映射行的 商品链接 标记
+NO_MAPPING_MARK = "NO MAPPING SKU"
+# 预筛跳过（已在 Mapping_Data 中）的 offer 在检查点里的标记；不算失败
+MAPPED_SKIP_NOTE = "已在 Mapping_Data 中（未联网抓取）"
+
+
+def offer_url(offer_id: str) -> str:
+    return f"https://detail.1688.com/offer/{offer_id}.html"
 
 
 def read_links_from_stdin() -> list[str]:
-    print("\n请粘贴 1688 商品链接（每行一个）。")
+    print("\n请粘贴 1688 商品链接（每行一个，也可以直接粘贴 offerId）。")
     print("粘贴完成后，请再输入一个空行并回车结束。\n")
 
     urls: list[str] = []
@@ -69,6 +256,8 @@ def read_links_from_stdin() -> list[str]:
             u = p.strip().strip('"').strip("'")
             if not u:
                 continue
+            if OFFER_ID_PATTERN.match(u):
+                u = offer_url(u)
             if not (u.startswith("http://") or u.startswith("https://")):
                 continue
             if u not in seen:
@@ -78,6 +267,102 @@ def read_links_from_stdin() -> list[str]:
     return urls
 
 
+def links_in_text(text: str) -> list[str]:
+    """文本中所有能解析出 offerId 的链接；单独一行的纯数字视为 offerId。"""
+    out = [u for u in URL_PATTERN.findall(text) if extract_offer_id(u)]
+    for line in text.splitlines():
+        token = line.strip().strip('"').strip("'")
+        if OFFER_ID_PATTERN.match(token):
+            out.append(offer_url(token))
+    return out
+
+
+def read_links_from_workbook(
+    path: Path, columns: list[str] | None = None, no_mapping_only: bool = False
+) -> list[str]:
+    """\
+    从工作簿读取链接：
+      - columns 为空时扫描所有列；商品ID 列里的纯数字按 offerId 处理
+      - no_mapping_only: 只取 商品链接 == NO MAPPING SKU 的行（add_to_cart 的 (done) 表），
+        链接从同一行的其他列（如 采购链接 / 备注）里找
+    """
+    df = pd.read_excel(path, dtype=str).fillna("")
+    df.columns = [str(c).strip() for c in df.columns]
+
+    if no_mapping_only:
+        if "商品链接" not in df.columns:
+            print(f"[WARN] {path.name} 没有 商品链接 列，无法筛选 {NO_MAPPING_MARK} 行")
+            return []
+        df = df[df["商品链接"].str.strip() == NO_MAPPING_MARK]
+
+    cols = columns or list(df.columns)
+    missing = [c for c in cols if c not in df.columns]
+    if missing:
+        print(f"[WARN] {path.name} 中没有这些列，已忽略: {missing}")
+    cols = [c for c in cols if c in df.columns]
+
+    urls: list[str] = []
+    no_link_skus: list[str] = []
+    for row in df[cols].itertuples(index=False, name=None):
+        found: list[str] = []
+        for col, value in zip(cols, row):
+            value = value.strip()
+            if not value:
+                continue
+            if col == "商品ID" and OFFER_ID_PATTERN.match(value):
+                found.append(offer_url(value))
+            else:
+                found.extend(u for u in URL_PATTERN.findall(value) if extract_offer_id(u))
+        urls.extend(found)
+        if not found and no_mapping_only:
+            no_link_skus.append(dict(zip(cols, row)).get("SKU", "") or "?")
+
+    print(f"[INFO] {path.name}: {len(df)} 行，找到 {len(urls)} 个链接")
+    if no_link_skus:
+        print(
+            f"[WARN] {len(no_link_skus)} 行 {NO_MAPPING_MARK} 没有任何 1688 链接，需要手动查找: "
+            + ", ".join(no_link_skus[:20])
+            + (" ..." if len(no_link_skus) > 20 else "")
+        )
+    return urls
+
+
+def read_links_from_sources(
+    paths: list[str], columns: list[str] | None = None, no_mapping_only: bool = False
+) -> list[str]:
+    """批量读取链接来源：.xlsx 工作簿按列读取，其他文件按文本扫描。"""
+    urls: list[str] = []
+    for raw in paths:
+        path = Path(raw)
+        if not path.is_file():
+            print(f"[WARN] 文件不存在，已跳过: {path}")
+            continue
+        if path.suffix.lower() in (".xlsx", ".xlsm"):
+            urls.extend(read_links_from_workbook(path, columns, no_mapping_only))
+        else:
+            found = links_in_text(path.read_text(encoding="utf-8-sig", errors="ignore"))
+            print(f"[INFO] {path.name}: 找到 {len(found)} 个链接")
+            urls.extend(found)
+    return urls
+
+
+def dedupe_by_offer_id(urls: list[str]) -> list[str]:
+    """\
+    按 offerId 去重（同一商品不同参数的链接只保留第一个），保持原顺序；
+    解析不出 offerId 的链接按原字符串去重。
+    """
+    out: list[str] = []
+    seen: set[str] = set()
+    for url in urls:
+        key = extract_offer_id(url) or url
+        if key not in seen:
+            seen.add(key)
+            out.append(url)
+    if len(out) < len(urls):
+        print(f"[INFO] 按 offerId 去重：{len(urls)} -> {len(out)} 个链接")
+    return out
+
+
 def build_output_path() -> Path:
     ts = datetime.now().strftime("%Y%m%d-%H%M%S")
     return BASE_DIR / f"pasted_links_{ts}(done).xlsx"
@@ -89,18 +374,178 @@ def normalize_text(x) -> str:
     return str(x).strip()
 
 
+def build_rows(url: str, offer_id: str, sku_records: list[dict], shop_name: str) -> list[dict]:
+    """把解析出的 SKU 记录展开为输出行。"""
+    return [
+        {
+            "商品链接": url,
+            "商品ID": offer_id,
+            "属性SKU": rec.get("属性SKU", ""),
+            "SKU ID": rec.get("SKU ID", ""),
+            "Spec ID": rec.get("Spec ID", ""),
+            "店铺名称": shop_name,
+        }
+        for rec in sku_records
+    ]
+
+
+def load_mapped_specs(mapping_path: str = MAPPING_PATH) -> dict[str, set[str]]:
+    """\
+    读取 Mapping_Data 中已映射的 offer：offerId → 已映射的 Spec ID 集合
+    （主 / 副供应商；商品ID 为空时从 商品链接 取 offerId）。
+    """
+    if not os.path.exists(mapping_path):
+        print(f"[WARN] 未找到 Mapping_Data，跳过已映射预筛: {mapping_path}")
+        return {}
+
+    wanted = {"商品ID", "商品ID.1", "商品链接", "商品链接.1", "Spec ID", "Spec ID.1"}
+    try:
+        df = pd.read_excel(mapping_path, dtype=str, usecols=lambda c: str(c).strip() in wanted)
+    except Exception as e:
+        print(f"[WARN] 读取 Mapping_Data 失败，跳过已映射预筛: {e}")
+        return {}
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df.fillna("")
+
+    mapped: dict[str, set[str]] = {}
+    for suffix in ("", ".1"):
+        pid_col, url_col, spec_col = f"商品ID{suffix}", f"商品链接{suffix}", f"Spec ID{suffix}"
+        pids = df[pid_col].str.strip() if pid_col in df.columns else pd.Series("", index=df.index)
+        if url_col in df.columns:
+            pids = pids.where(pids != "", df[url_col].map(extract_offer_id))
+        specs = df[spec_col].str.strip() if spec_col in df.columns else pd.Series("", index=df.index)
+        for pid, spec in zip(pids, specs):
+            if pid and pid.isdigit():
+                spec_set = mapped.setdefault(pid, set())
+                if spec:
+                    spec_set.add(spec)
+    return mapped
+
+
+def has_unmapped_specs(cache: SkuScrapeCache, offer_id: str, mapped: set[str]) -> bool:
+    """SKU 缓存（不论新旧）里有 Mapping_Data 尚未映射的 Spec ID 时返回 True，需要重新抓取。"""
+    hit = cache.get(offer_id)
+    if hit is None:
+        return False
+    return any(rec["Spec ID"] and rec["Spec ID"] not in mapped for rec in hit[0])
+
+
+# ======================================================================
+# Checkpoint
+# ======================================================================
+class ScrapeCheckpoint:
+    """\
+    追加写入的 JSONL 检查点。
+    第一行记录本批次的全部链接，之后每个链接一行结果（同一下标以最后一行为准）:
+        {"type": "batch", "urls": [...], "started_at": ...}
+        {"type": "result", "i": 0, "offer_id": "...", "url": "...", "rows": [...], "error": ""}
+    """
+
+    def __init__(self, path: Path = CHECKPOINT_PATH):
+        self.path = path
+        self._fh = None
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def start(self, urls: list[str]) -> None:
+        """开始新批次；旧检查点改名为 .bak 保留一份。"""
+        if self.path.exists():
+            backup = self.path.with_suffix(".jsonl.bak")
+            os.replace(self.path, backup)
+            print(f"[WARN] 上次的检查点未完成，已另存为 {backup.name}")
+        self._fh = open(self.path, "a", encoding="utf-8")
+        self._write({"type": "batch", "urls": urls, "started_at": time.time()})
+
+    def _read(self) -> tuple[list[str], dict[int, dict]]:
+        urls: list[str] = []
+        entries: dict[int, dict] = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue  # 中断时写了一半的最后一行
+                if item.get("type") == "batch":
+                    urls = item["urls"]
+                elif item.get("type") == "result":
+                    entries[item["i"]] = item
+        return urls, entries
+
+    def resume(self) -> tuple[list[str], dict[int, tuple[str, list[dict], str]]]:
+        """\
+        读取检查点并继续追加，返回 (urls, done)。
+        done 为已成功的下标 → (url, rows, error)；offerId 已成功抓取过的其他下标也算完成。
+        """
+        urls, entries = self._read()
+        by_offer: dict[str, list[dict]] = {}
+        for item in entries.values():
+            if item["rows"]:
+                by_offer[item["offer_id"]] = item["rows"]
+
+        self._fh = open(self.path, "a", encoding="utf-8")
+        done = {}
+        for i, url in enumerate(urls):
+            item = entries.get(i)
+            if item and item["rows"]:
+                done[i] = (url, item["rows"], "")
+                continue
+            rows = by_offer.get(extract_offer_id(url))
+            if rows:
+                rows = [{**r, "商品链接": url} for r in rows]
+                self.append(i, (url, rows, ""))
+                done[i] = (url, rows, "")
+        return urls, done
+
+    def _write(self, item: dict) -> None:
+        self._fh.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self._fh.flush()
+
+    def append(self, i: int, result: tuple[str, list[dict], str]) -> None:
+        url, rows, error = result
+        self._write(
+            {
+                "type": "result",
+                "i": i,
+                "offer_id": extract_offer_id(url),
+                "url": url,
+                "rows": rows,
+                "error": error,
+            }
+        )
+
+    def results(self) -> list[tuple[str, list[dict], str]]:
+        """按输入顺序返回全部结果（没有结果的链接记为未完成）。"""
+        urls, entries = self._read()
+        out = []
+        for i, url in enumerate(urls):
+            item = entries.get(i)
+            if item is None:
+                out.append((url, [], "未完成（检查点中无结果）"))
+            else:
+                out.append((url, item["rows"], item["error"]))
+        return out
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def finish(self) -> None:
+        """输出工作簿写完后删除检查点。"""
+        self.close()
+        if self.path.exists():
+            self.path.unlink()
+
+
 # ======================================================================
 # Page parsing
 # ======================================================================
-def extract_json_object_from_text(text: str, key: str) -> str | None:
-    idx = text.find(key)
-    if idx == -1:
-        return None
+_JSON_DECODER = json.JSONDecoder()
 
-    start = text.find("{", idx)
-    if start == -1:
-        return None
 
+def _scan_json_object(text: str, start: int) -> str | None:
+    """逐字符括号匹配（兜底实现）：text[start] 必须是 "{"。"""
     brace_level = 0
     in_str = False
     esc = False
@@ -126,15 +571,42 @@ def extract_json_object_from_text(text: str, key: str) -> str | None:
     return None
 
 
-def parse_sku_data_from_html(html: str) -> tuple[list[dict], str]:
-    json_str = extract_json_object_from_text(html, "skuModel")
-    if not json_str:
-        return [], ""
+def _locate_json_object(text: str, key: str) -> int:
+    idx = text.find(key)
+    if idx == -1:
+        return -1
+    return text.find("{", idx)
+
 
+def extract_json_value_from_text(text: str, key: str):
+    """在 key 之后的第一个 "{" 处直接解码 JSON 对象（C 实现的 raw_decode），失败返回 None。"""
+    start = _locate_json_object(text, key)
+    if start == -1:
+        return None
     try:
-        data = json.loads(json_str)
-    except Exception:
-        return [], ""
+        value, _ = _JSON_DECODER.raw_decode(text, start)
+    except ValueError:
+        return None
+    return value
+
+
+def extract_json_object_from_text(text: str, key: str) -> str | None:
+    start = _locate_json_object(text, key)
+    if start == -1:
+        return None
+
+    try:
+        _, end = _JSON_DECODER.raw_decode(text, start)
+        return text[start:end]
+    except ValueError:
+        # 不是严格 JSON（例如 JS 对象字面量）：退回逐字符匹配，结果与旧实现一致
+        return _scan_json_object(text, start)
+
+
+def parse_sku_model(data) -> list[dict]:
+    """把已解码的 skuModel 对象转换为 SKU 记录列表。"""
+    if not isinstance(data, dict):
+        return []
 
     sku_map = data.get("skuInfoMap") or {}
     records: list[dict] = []
@@ -158,6 +630,29 @@ def parse_sku_data_from_html(html: str) -> tuple[list[dict], str]:
             }
         )
 
+    return records
+
+
+def parse_sku_model_json(json_str: str) -> list[dict]:
+    """把 skuModel 的 JSON 文本解析为 SKU 记录列表；无法解析时返回空列表。"""
+    if not json_str:
+        return []
+
+    try:
+        data = json.loads(json_str)
+    except Exception:
+        return []
+
+    return parse_sku_model(data)
+
+
+def parse_sku_data_from_html(html: str) -> tuple[list[dict], str]:
+    data = extract_json_value_from_text(html, "skuModel")
+    if data is None:
+        return [], ""
+
+    records = parse_sku_model(data)
+
     shop_name = ""
     m = re.search(r'"companyName"\s*:\s*"([^"\\]+)"', html)
     if m:
@@ -166,6 +661,46 @@ def parse_sku_data_from_html(html: str) -> tuple[list[dict], str]:
     return records, shop_name
 
 
+def bench_json_extraction(folder: Path = None, rounds: int = 3) -> None:
+    """\
+    用 debug_html 中保存的页面对比 skuModel 提取：旧的逐字符扫描 vs raw_decode，
+    同时校验两者结果一致。
+    """
+    folder = folder or DEBUG_DIR
+    files = iter_debug_html_files(folder)
+    if not files:
+        print(f"[WARN] {folder} 中没有可用的 HTML 样本。")
+        return
+
+    docs = [read_debug_html(f) for f in files]
+    total_mb = sum(len(d) for d in docs) / 1024 / 1024
+    print(f"=== skuModel 提取压测: {len(docs)} 个页面, {total_mb:.1f} MB 文本 ===")
+
+    def legacy(text):
+        start = _locate_json_object(text, "skuModel")
+        return None if start == -1 else _scan_json_object(text, start)
+
+    mismatches = 0
+    for doc, f in zip(docs, files):
+        if legacy(doc) != extract_json_object_from_text(doc, "skuModel"):
+            mismatches += 1
+            print(f"   [FAIL] 结果不一致: {f.name}")
+
+    for label, fn in (("逐字符扫描", legacy), ("raw_decode", lambda d: extract_json_object_from_text(d, "skuModel"))):
+        best = float("inf")
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            for doc in docs:
+                fn(doc)
+            best = min(best, time.perf_counter() - t0)
+        print(f"  {label:<12} 合计 {best * 1000:9.1f} ms  平均 {best * 1000 / len(docs):7.2f} ms/页")
+
+    if mismatches:
+        print(f"[FAIL] 有 {mismatches} 个页面结果不一致")
+    else:
+        print("[OK] 两种实现结果完全一致")
+
+
 def detect_blocked_page(html: str) -> bool:
     signals = [
         "_____tmd_____/punish",
@@ -180,36 +715,336 @@ def detect_blocked_page(html: str) -> bool:
 # ======================================================================
 # Browser helpers
 # ======================================================================
-def wait_for_manual_login(page) -> None:
+async def wait_for_manual_login(page) -> None:
     print("\n=== 浏览器已打开 ===")
     print("请在浏览器里手动登录 1688。")
     print("登录完成并确认能正常打开商品页后，回到终端按回车继续...\n")
-    input()
+    await asyncio.to_thread(input)
 
 
-def ensure_home_ready(page) -> None:
+async def ensure_home_ready(page) -> None:
     print("[INFO] 打开 1688 首页...")
-    page.goto("https://www.1688.com/", wait_until="domcontentloaded", timeout=120000)
-    time.sleep(3)
+    await page.goto("https://www.1688.com/", wait_until="domcontentloaded", timeout=120000)
+    await asyncio.sleep(3)
+
+
+async def is_logged_in(context) -> bool:
+    """根据 1688 的登录 Cookie（__cn_logon__=true）判断当前会话是否仍然有效。"""
+    try:
+        cookies = await context.cookies("https://www.1688.com/")
+    except Exception:
+        return False
+    return any(c["name"] == "__cn_logon__" and c["value"] == "true" for c in cookies)
+
+
+async def launch_browser_context(p):
+    """用持久化用户目录启动 Chrome（有界面）。"""
+    return await p.chromium.launch_persistent_context(
+        user_data_dir=str(PROFILE_DIR),
+        headless=False,
+        channel="chrome",
+        args=[
+            "--start-maximized",
+            "--disable-blink-features=AutomationControlled",
+        ],
+        viewport={"width": 1440, "height": 900},
+    )
+
+
+def saved_user_agent() -> str | None:
+    """上次有界面会话导出的 User-Agent（避免无界面模式暴露 HeadlessChrome）。"""
+    try:
+        return json.loads(COOKIE_EXPORT_PATH.read_text(encoding="utf-8")).get("user_agent")
+    except (OSError, ValueError):
+        return None
+
+
+async def save_storage_state(context) -> None:
+    try:
+        await context.storage_state(path=str(STORAGE_STATE_PATH))
+        print(f"[INFO] 登录状态已保存: {STORAGE_STATE_PATH}")
+    except Exception as e:
+        print(f"[WARN] 保存登录状态失败: {e}")
+
+
+async def launch_headless_context(p):
+    """\
+    用保存的 storage state 启动无界面浏览器，并在线校验登录是否有效。
+    返回 (context, page)；没有保存的状态或登录已失效时返回 None。
+    """
+    if not STORAGE_STATE_PATH.exists():
+        print("[INFO] 尚未保存登录状态（可先运行 --login），无法无界面运行。")
+        return None
+
+    browser = await p.chromium.launch(
+        headless=True,
+        channel="chrome",
+        args=["--disable-blink-features=AutomationControlled"],
+    )
+    context = await browser.new_context(
+        storage_state=str(STORAGE_STATE_PATH),
+        viewport={"width": 1440, "height": 900},
+        user_agent=saved_user_agent(),
+    )
+    page = await context.new_page()
+    try:
+        await page.goto(LOGIN_CHECK_URL, wait_until="domcontentloaded", timeout=60000)
+        logged_in = "login" not in urlparse(page.url).netloc.lower()
+    except Exception as e:
+        print(f"[WARN] 登录校验失败: {e}")
+        logged_in = False
 
+    if not logged_in:
+        print("[WARN] 保存的登录状态已失效，无法无界面运行。")
+        await browser.close()
+        return None
+
+    print("[INFO] 登录状态有效，使用无界面模式抓取。")
+    return context, page
+
+
+async def open_logged_in_page(context):
+    """打开首页；只有登录已失效时才等待手动登录。返回首页标签页。"""
+    page = context.pages[0] if context.pages else await context.new_page()
+    await ensure_home_ready(page)
+    if await is_logged_in(context):
+        print("[INFO] 登录状态有效，跳过手动登录确认。")
+    else:
+        await wait_for_manual_login(page)
+    return page
+
+
+# 在页面内轮询的就绪判断：返回 "blocked" / "ready"，都不满足时返回 false 继续等待
+READY_STATE_JS = """
+(markers) => {
+    const href = location.href.toLowerCase();
+    if (markers.some((m) => href.includes(m))) return "blocked";
+    for (const s of document.scripts) {
+        const t = s.text;
+        if (t && t.indexOf("skuModel") !== -1) return "ready";
+    }
+    if (document.querySelector("#nocaptcha, .nc_wrapper, iframe[src*='punish'], iframe[src*='captcha']")) {
+        return "blocked";
+    }
+    return false;
+}
+"""
+
+
+# 在页面 JS 上下文中直接截取 skuModel 的 JSON 文本与店铺名，
+# 只把需要的这一小段字符串传回 Python（不再序列化整页 DOM）。
+EXTRACT_SKU_JS = r"""
+() => {
+    const out = { sku: null, company: "" };
+    const companyRe = /"companyName"\s*:\s*"([^"\\]+)"/;
+    for (const s of document.scripts) {
+        const t = s.text;
+        if (!t) continue;
+        if (!out.company) {
+            const m = companyRe.exec(t);
+            if (m) out.company = m[1];
+        }
+        if (out.sku === null) {
+            const idx = t.indexOf("skuModel");
+            const start = idx === -1 ? -1 : t.indexOf("{", idx);
+            if (start !== -1) {
+                let level = 0, inStr = false, esc = false;
+                for (let i = start; i < t.length; i++) {
+                    const ch = t[i];
+                    if (inStr) {
+                        if (esc) esc = false;
+                        else if (ch === "\\") esc = true;
+                        else if (ch === '"') inStr = false;
+                    } else if (ch === '"') {
+                        inStr = true;
+                    } else if (ch === "{") {
+                        level++;
+                    } else if (ch === "}") {
+                        level--;
+                        if (level === 0) {
+                            out.sku = t.slice(start, i + 1);
+                            break;
+                        }
+                    }
+                }
+            }
+        }
+        if (out.sku !== null && out.company) break;
+    }
+    return out;
+}
+"""
 
-def try_pass_challenge(page, wait_seconds: int = 20) -> None:
-    print(f"[INFO] 等待页面验证/跳转，最多 {wait_seconds} 秒...")
-    end_time = time.time() + wait_seconds
-    last_url = ""
 
-    while time.time() < end_time:
+async def extract_sku_from_page(page) -> tuple[list[dict], str]:
+    """从页面 JS 上下文提取 skuModel，返回 (records, shop_name)；失败返回 ([], "")。"""
+    try:
+        payload = await page.evaluate(EXTRACT_SKU_JS)
+    except Exception as e:
+        print(f"   [WARN] 页面内提取 skuModel 失败: {e}")
+        return [], ""
+    if not payload or not payload.get("sku"):
+        return [], ""
+    return parse_sku_model_json(payload["sku"]), payload.get("company") or ""
+
+
+async def wait_for_page_ready(page, timeout: float = READY_TIMEOUT_SEC) -> tuple[str, float]:
+    """\
+    由具体信号驱动的页面就绪等待，返回 (state, 等待秒数)：
+      - "ready"   : 页面脚本中已出现 skuModel
+      - "blocked" : URL / DOM 显示为风控、验证码页
+      - "timeout" : 超时仍无结论
+    """
+    t0 = time.perf_counter()
+    deadline = t0 + timeout
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return "timeout", time.perf_counter() - t0
         try:
-            current = page.url
-            if current != last_url:
-                print(f"       当前页面: {current}")
-                last_url = current
+            handle = await page.wait_for_function(
+                READY_STATE_JS,
+                arg=list(BLOCK_URL_MARKERS),
+                polling=100,
+                timeout=remaining * 1000,
+            )
+            return await handle.json_value(), time.perf_counter() - t0
+        except PlaywrightTimeoutError:
+            return "timeout", time.perf_counter() - t0
         except Exception:
-            pass
-        time.sleep(1)
+            # 验证通过后的重定向会销毁执行上下文，稍等后在新文档上继续判断
+            await asyncio.sleep(0.2)
+
+
+async def apply_block_profile(page, profile_name: str) -> dict:
+    """\
+    在标签页上安装资源拦截路由，返回计数 dict（aborted / continued）。
+    profile_name 取 BLOCK_PROFILES 的键；"off" 时不安装路由。
+    """
+    profile = BLOCK_PROFILES[profile_name]
+    stats = {"aborted": 0, "continued": 0}
+    if not profile["types"] and not profile["url_markers"]:
+        return stats
+
+    types = profile["types"]
+    markers = profile["url_markers"]
+
+    async def handle(route):
+        req = route.request
+        url = req.url.lower()
+        if req.resource_type in types or any(m in url for m in markers):
+            stats["aborted"] += 1
+            await route.abort()
+        else:
+            stats["continued"] += 1
+            await route.continue_()
+
+    await page.route("**/*", handle)
+    return stats
+
+
+class DomainPacer:
+    """按域名节流：同一 host 的相邻两次导航至少间隔 min_interval 秒（所有标签页共享）。"""
+
+    def __init__(self, min_interval: float = DOMAIN_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._next_slot: dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url: str) -> None:
+        host = urlparse(url).netloc.lower()
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def gate(self, tab_no: int, queue: asyncio.Queue) -> bool:
+        """标签页取下一个链接前调用，返回 False 表示可以退出；固定节流时直接放行。"""
+        return True
+
+    async def report(self, blocked: bool) -> None:
+        """每个链接抓取完成后调用；固定节流时不做任何调整。"""
+
+
+class AdaptivePacer(DomainPacer):
+    """\
+    AIMD 自适应节流：按最近的风控命中情况调整导航间隔和并发标签页数量。
+    并发减少时，编号大于当前并发数的标签页在 gate() 中等待（不占用链接）。
+    """
+
+    def __init__(
+        self,
+        min_interval: float = DOMAIN_MIN_INTERVAL,
+        max_tabs: int = DEFAULT_TABS,
+        interactive: bool = True,
+    ):
+        super().__init__(min_interval)
+        self.interactive = interactive
+        self.floor = min_interval
+        self.max_tabs = max(1, max_tabs)
+        self.tabs = self.max_tabs
+        self.recent: deque[bool] = deque(maxlen=AIMD_WINDOW)
+        self.paused_once = False
+        self._streak = 0
+        self._running = asyncio.Event()
+        self._running.set()
+
+    @property
+    def block_rate(self) -> float:
+        return sum(self.recent) / len(self.recent) if self.recent else 0.0
+
+    async def gate(self, tab_no: int, queue: asyncio.Queue) -> bool:
+        while True:
+            await self._running.wait()
+            if queue.empty():
+                return False
+            if tab_no <= self.tabs:
+                return True
+            await asyncio.sleep(1.0)
+
+    async def report(self, blocked: bool) -> None:
+        self.recent.append(blocked)
+        if not blocked:
+            self._streak += 1
+            self.min_interval = max(self.floor, self.min_interval - AIMD_STEP_SEC)
+            if self._streak >= AIMD_GROW_EVERY and self.tabs < self.max_tabs:
+                self._streak = 0
+                self.tabs += 1
+                print(f"   [PACE] 连续成功：并发 -> {self.tabs}，间隔 {self.min_interval:.2f}s")
+            return
+
+        self._streak = 0
+        self.min_interval = min(AIMD_MAX_INTERVAL, max(self.min_interval, 0.5) * 2)
+        self.tabs = max(1, self.tabs // 2)
+        print(
+            f"   [PACE] 命中风控：间隔 -> {self.min_interval:.1f}s，并发 -> {self.tabs}"
+            f"（最近拦截率 {self.block_rate:.0%}）"
+        )
+        if not self.paused_once and sum(self.recent) >= AIMD_PAUSE_BLOCKS:
+            await self.pause_for_verification()
+
+    async def pause_for_verification(self) -> None:
+        """暂停所有标签页，等待在浏览器里手动完成验证（每次运行只暂停一次）。"""
+        if self.paused_once:
+            return
+        self.paused_once = True
+        self._running.clear()
+        print("\n=== 风控拦截过多，已暂停所有标签页 ===")
+        if self.interactive:
+            print("请在浏览器任一标签页中手动完成滑块/验证（或重新登录），完成后回到终端按回车继续...\n")
+            await asyncio.to_thread(input)
+        else:
+            print(f"[WARN] 无界面模式无法手动验证，冷却 {BLOCKED_RETRY_COOLDOWN_SEC}s 后继续。")
+            await asyncio.sleep(BLOCKED_RETRY_COOLDOWN_SEC)
+        self.recent.clear()
+        self._running.set()
 
 
-def scrape_one_product(page, url: str) -> tuple[list[dict], str]:
+async def scrape_one_product(page, url: str) -> tuple[list[dict], str]:
     url = normalize_text(url)
     if not url:
         return [], "空链接"
@@ -221,93 +1056,760 @@ def scrape_one_product(page, url: str) -> tuple[list[dict], str]:
     print(f"\n-> Scraping {url}")
     print(f"   offerId={offer_id}")
 
+    t_start = time.perf_counter()
     try:
-        page.goto(url, wait_until="domcontentloaded", timeout=120000)
+        await page.goto(url, wait_until="domcontentloaded", timeout=120000)
     except PlaywrightTimeoutError:
-        print("   [WARN] 首次打开页面超时，继续尝试读取当前页面内容")
+        print(f"   [WARN] [{offer_id}] 首次打开页面超时，继续尝试读取当前页面内容")
     except Exception as e:
         return [], f"打开页面失败: {e}"
+    t_nav = time.perf_counter() - t_start
+
+    state, t_ready = await wait_for_page_ready(page)
+
+    sku_records: list[dict] = []
+    shop_name = ""
+    source = "page"
+    t_parse0 = time.perf_counter()
+    if state == "ready":
+        sku_records, shop_name = await extract_sku_from_page(page)
+
+    if not sku_records:
+        # 兜底：仅在页面内提取失败（或被拦截 / 超时）时才序列化整页 HTML
+        source = "html"
+        try:
+            html = await page.content()
+        except Exception as e:
+            return [], f"读取页面 HTML 失败: {e}"
+
+        if state == "blocked" or detect_blocked_page(html):
+            save_debug_html(offer_id, html, failed=True)
+            print(
+                f"   [TIMING] [{offer_id}] 导航 {t_nav:.2f}s | 就绪=blocked {t_ready:.2f}s"
+            )
+            print(f"   [WARN] [{offer_id}] 页面仍然是风控/验证页")
+            print("   [INFO] 请查看浏览器是否需要手动点击验证或重新登录")
+            return [], BLOCKED_ERROR
+
+        sku_records, shop_name = parse_sku_data_from_html(html)
+        save_debug_html(offer_id, html, failed=not sku_records)
+    elif debug_capture_wanted(failed=False):
+        # sample / all 模式：成功页面按需额外抓取 HTML 存档（不在默认热路径上）
+        try:
+            save_debug_html(offer_id, await page.content(), failed=False)
+        except Exception:
+            pass
+    t_parse = time.perf_counter() - t_parse0
+
+    print(
+        f"   [TIMING] [{offer_id}] 导航 {t_nav:.2f}s | 就绪={state} {t_ready:.2f}s | "
+        f"提取({source}) {t_parse:.2f}s | 合计 {time.perf_counter() - t_start:.2f}s"
+    )
+    print(f"   [DEBUG] [{offer_id}] 解析到 SKU 数量: {len(sku_records)}")
+
+    if not sku_records:
+        return [], "未从页面 HTML 中解析到 skuModel"
+
+    return build_rows(url, offer_id, sku_records, shop_name), ""
+
+
+async def tab_worker(
+    tab_no: int,
+    page,
+    queue: asyncio.Queue,
+    pacer: DomainPacer,
+    results: list,
+    total: int,
+    on_result=None,
+) -> None:
+    """单个标签页：从共享队列取链接，结果按输入序号写回 results（并立即回调 on_result）。"""
+    while True:
+        if not await pacer.gate(tab_no, queue):
+            return
+        try:
+            i, url = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+
+        await pacer.wait(url)
+        print(f"\n===== [tab {tab_no}] 进度 {i + 1}/{total} =====")
+        try:
+            rows, error = await scrape_one_product(page, url)
+        except Exception as e:
+            rows, error = [], f"抓取异常: {e}"
+        if not rows:
+            print(f"   [WARN] 失败原因: {error}")
+        if rows or error == BLOCKED_ERROR:
+            await pacer.report(blocked=not rows)
+        results[i] = (url, rows, error)
+        if on_result is not None:
+            on_result(i, results[i])
+
+
+async def scrape_links(
+    context,
+    urls: list[str],
+    tabs: int,
+    pacer: DomainPacer,
+    block_profile: str = DEFAULT_BLOCK_PROFILE,
+    on_result=None,
+) -> list[tuple[str, list[dict], str]]:
+    """\
+    用 N 个标签页并发抓取，返回与 urls 顺序一致的 (url, rows, error) 列表。
+    on_result(i, result) 在每个链接完成时立即调用（用于写检查点 / 缓存）。
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for i, url in enumerate(urls):
+        queue.put_nowait((i, url))
+
+    results: list = [None] * len(urls)
+    n_tabs = max(1, min(tabs, len(urls)))
+    pages = [context.pages[0] if context.pages else await context.new_page()]
+    while len(pages) < n_tabs:
+        pages.append(await context.new_page())
+    for pg in pages:
+        await apply_block_profile(pg, block_profile)
+
+    print(f"[INFO] 使用 {n_tabs} 个标签页并发抓取，同域名导航间隔 {pacer.min_interval:.1f}s")
+    print(f"[INFO] 资源拦截配置: {block_profile}")
+    await asyncio.gather(
+        *(
+            tab_worker(no, pg, queue, pacer, results, len(urls), on_result)
+            for no, pg in enumerate(pages, start=1)
+        )
+    )
+
+    # 关闭本轮新开的标签页，避免再次调用（如重试被拦截链接）时标签页和路由叠加
+    for pg in pages[1:]:
+        await pg.close()
+    await pages[0].unroute("**/*")
+    return results
+
+
+async def scrape_links_with_retry(
+    context,
+    urls: list[str],
+    tabs: int,
+    pacer: DomainPacer,
+    block_profile: str = DEFAULT_BLOCK_PROFILE,
+    on_result=None,
+    retry_blocked: bool = True,
+) -> list[tuple[str, list[dict], str]]:
+    """\
+    scrape_links + 批次结束后重试被拦截的链接：
+    先确保已手动验证过一次（自适应节流时），冷却后整体重试一轮。
+    """
+    t0 = time.perf_counter()
+    results = await scrape_links(context, urls, tabs, pacer, block_profile, on_result)
+    elapsed = time.perf_counter() - t0
+    print(
+        f"\n[INFO] 抓取 {len(urls)} 个链接耗时 {elapsed:.1f}s"
+        f"（平均 {elapsed / max(1, len(urls)):.1f}s/个）"
+    )
+
+    blocked = [j for j, res in enumerate(results) if res[2] == BLOCKED_ERROR]
+    if not blocked or not retry_blocked:
+        return results
+
+    print(f"\n[INFO] {len(blocked)} 个链接命中风控，准备重试。")
+    if isinstance(pacer, AdaptivePacer):
+        await pacer.pause_for_verification()
+    print(f"[INFO] 冷却 {BLOCKED_RETRY_COOLDOWN_SEC}s 后重试...")
+    await asyncio.sleep(BLOCKED_RETRY_COOLDOWN_SEC)
+
+    def on_retry(k: int, res: tuple[str, list[dict], str]) -> None:
+        results[blocked[k]] = res
+        if on_result is not None:
+            on_result(blocked[k], res)
+
+    retried = await scrape_links(
+        context, [urls[j] for j in blocked], tabs, pacer, block_profile, on_retry
+    )
+    still = sum(1 for res in retried if res[2] == BLOCKED_ERROR)
+    print(f"[INFO] 重试完成：{len(blocked) - still} 个成功恢复，{still} 个仍被拦截")
+    return results
+
+
+async def _load_and_measure(page, url: str) -> tuple[int, float, str, int]:
+    """打开一次页面，返回 (传输字节数, 耗时秒, 就绪状态, SKU 数)。"""
+    sizes_tasks = []
+
+    def on_finished(req):
+        sizes_tasks.append(asyncio.ensure_future(req.sizes()))
+
+    page.on("requestfinished", on_finished)
+    t0 = time.perf_counter()
+    try:
+        await page.goto(url, wait_until="domcontentloaded", timeout=120000)
+    except PlaywrightTimeoutError:
+        pass
+    state, _ = await wait_for_page_ready(page)
+    records: list[dict] = []
+    if state == "ready":
+        records, _ = await extract_sku_from_page(page)
+    elapsed = time.perf_counter() - t0
+    # 页面就绪后仍会继续加载图片等资源，等网络空闲再统计字节
+    try:
+        await page.wait_for_load_state("networkidle", timeout=15000)
+    except PlaywrightTimeoutError:
+        pass
+    page.remove_listener("requestfinished", on_finished)
+
+    total = 0
+    for res in await asyncio.gather(*sizes_tasks, return_exceptions=True):
+        if isinstance(res, dict):
+            total += res.get("responseBodySize", 0) + res.get("responseHeadersSize", 0)
+    return total, elapsed, state, len(records)
+
+
+async def measure_block_profile(context, urls: list[str], profile_name: str) -> None:
+    """\
+    资源拦截收益测量：每个 offer 分别在"不拦截"与 profile_name 两个标签页中加载一次，
+    统计传输字节与到提取完成的耗时（已禁用浏览器缓存，避免第二次加载占便宜）。
+    """
+    plain = await context.new_page()
+    blocked = await context.new_page()
+    await apply_block_profile(blocked, profile_name)
+    for pg in (plain, blocked):
+        try:
+            cdp = await context.new_cdp_session(pg)
+            await cdp.send("Network.setCacheDisabled", {"cacheDisabled": True})
+        except Exception as e:
+            print(f"[WARN] 无法禁用缓存，测量结果可能偏小: {e}")
+
+    print(f"\n=== 资源拦截测量: off vs {profile_name} ===")
+    print(f"{'offerId':<16}{'off KB':>10}{'on KB':>10}{'省 KB':>10}{'off s':>8}{'on s':>8}{'省 s':>8}")
+    saved_bytes = saved_secs = 0.0
+    n = 0
+    for url in urls:
+        offer_id = extract_offer_id(url) or url[:15]
+        b0, t0, st0, k0 = await _load_and_measure(plain, url)
+        b1, t1, st1, k1 = await _load_and_measure(blocked, url)
+        if (st0, k0) != (st1, k1):
+            print(f"   [WARN] [{offer_id}] 两次结果不一致: off={st0}/{k0} SKU, on={st1}/{k1} SKU")
+        print(
+            f"{offer_id:<16}{b0 / 1024:>10.0f}{b1 / 1024:>10.0f}{(b0 - b1) / 1024:>10.0f}"
+            f"{t0:>8.2f}{t1:>8.2f}{t0 - t1:>8.2f}"
+        )
+        saved_bytes += b0 - b1
+        saved_secs += t0 - t1
+        n += 1
+
+    if n:
+        print(
+            f"\n[INFO] 平均每个 offer 节省 {saved_bytes / n / 1024:.0f} KB、{saved_secs / n:.2f} s"
+        )
+    await plain.close()
+    await blocked.close()
 
-    time.sleep(3)
-    try_pass_challenge(page, wait_seconds=15)
 
+# ======================================================================
+# HTTP-first（连接池直连，命中风控再交给浏览器）
+# ======================================================================
+async def export_browser_cookies(context, page) -> None:
+    """把持久化浏览器上下文的 Cookie 和 User-Agent 导出到 cookies_1688.json。"""
     try:
-        html = page.content()
+        cookies = await context.cookies()
+        user_agent = await page.evaluate("navigator.userAgent")
     except Exception as e:
-        return [], f"读取页面 HTML 失败: {e}"
+        print(f"[WARN] 导出浏览器 Cookie 失败: {e}")
+        return
+    user_agent = user_agent.replace("HeadlessChrome", "Chrome")
 
-    save_debug_html(offer_id, html)
+    data = {"saved_at": time.time(), "user_agent": user_agent, "cookies": cookies}
+    tmp = COOKIE_EXPORT_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, COOKIE_EXPORT_PATH)
+    print(f"[INFO] 已导出 {len(cookies)} 个浏览器 Cookie: {COOKIE_EXPORT_PATH}")
 
-    if detect_blocked_page(html):
-        print("   [WARN] 页面仍然是风控/验证页")
-        print("   [INFO] 请查看浏览器是否需要手动点击验证或重新登录")
-        return [], "命中风控验证页"
 
-    sku_records, shop_name = parse_sku_data_from_html(html)
-    print(f"   [DEBUG] 解析到 SKU 数量: {len(sku_records)}")
+def build_http_session(pool_size: int) -> requests.Session | None:
+    """用导出的浏览器 Cookie 构建带连接池的 requests.Session；没有导出文件时返回 None。"""
+    if not COOKIE_EXPORT_PATH.exists():
+        return None
+    try:
+        data = json.loads(COOKIE_EXPORT_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        print(f"[WARN] 读取 {COOKIE_EXPORT_PATH.name} 失败: {e}")
+        return None
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(
+        {
+            "User-Agent": data.get("user_agent") or "Mozilla/5.0",
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "zh-CN,zh;q=0.9",
+            "Referer": "https://www.1688.com/",
+        }
+    )
+    for c in data.get("cookies", []):
+        session.cookies.set(
+            c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/")
+        )
+
+    age_h = (time.time() - float(data.get("saved_at", 0))) / 3600
+    print(f"[INFO] HTTP 模式使用 {len(session.cookies)} 个 Cookie（{age_h:.1f} 小时前导出）")
+    return session
+
+
+def fetch_offer_http(session: requests.Session, url: str) -> tuple[list[dict], str, bool]:
+    """\
+    直接 GET 商品页并解析 skuModel。
+    返回 (rows, error, escalate)；escalate=True 表示被拦截/请求失败，需要交给浏览器重试。
+    """
+    url = normalize_text(url)
+    if not url:
+        return [], "空链接", False
+    offer_id = extract_offer_id(url)
+    if not offer_id:
+        return [], f"无法解析 offerId: {url}", False
+
+    t0 = time.perf_counter()
+    try:
+        resp = session.get(url, timeout=HTTP_TIMEOUT)
+    except requests.RequestException as e:
+        print(f"   [WARN] [{offer_id}] HTTP 请求失败，转浏览器: {e}")
+        return [], f"HTTP 请求失败: {e}", True
+    t_get = time.perf_counter() - t0
+
+    final_url = resp.url.lower()
+    html = resp.text
+    if (
+        resp.status_code != 200
+        or "login" in urlparse(final_url).netloc
+        or any(m in final_url for m in BLOCK_URL_MARKERS)
+        or detect_blocked_page(html)
+    ):
+        print(f"   [WARN] [{offer_id}] HTTP 命中风控/登录页 (status={resp.status_code})，转浏览器")
+        return [], "HTTP 命中风控验证页", True
 
+    sku_records, shop_name = parse_sku_data_from_html(html)
+    save_debug_html(offer_id, html, failed=not sku_records)
+    print(
+        f"   [TIMING] [{offer_id}] HTTP {t_get:.2f}s | {len(resp.content) / 1024:.0f} KB | "
+        f"SKU {len(sku_records)}"
+    )
     if not sku_records:
-        return [], "未从页面 HTML 中解析到 skuModel"
+        return [], "未从页面 HTML 中解析到 skuModel", False
+    return build_rows(url, offer_id, sku_records, shop_name), "", False
+
+
+async def scrape_links_http(
+    session: requests.Session,
+    urls: list[str],
+    concurrency: int,
+    pacer: DomainPacer,
+    on_result=None,
+) -> tuple[list[tuple[str, list[dict], str]], list[int]]:
+    """\
+    HTTP 并发抓取（线程池 + 共享连接池），结果与 urls 顺序一致。
+    返回 (results, escalate)，escalate 为需要交给浏览器重试的下标；
+    on_result 只对不需要转浏览器的链接调用。
+    """
+    results: list = [None] * len(urls)
+    escalate: list[int] = []
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(i: int, url: str) -> None:
+        async with sem:
+            await pacer.wait(url)
+            print(f"-> [HTTP] {i + 1}/{len(urls)} {url}")
+            rows, error, need_browser = await asyncio.to_thread(fetch_offer_http, session, url)
+        results[i] = (url, rows, error)
+        if need_browser:
+            escalate.append(i)
+        elif on_result is not None:
+            on_result(i, results[i])
+
+    await asyncio.gather(*(one(i, url) for i, url in enumerate(urls)))
+    return results, sorted(escalate)
+
+
+# ======================================================================
+# 常驻浏览器服务客户端（scrape_1688_browser_daemon.py）
+# ======================================================================
+DEFAULT_DAEMON_URL = "http://127.0.0.1:8766"
+
+# 每次提交给常驻服务的链接数：越小检查点越及时
+DAEMON_CHUNK_SIZE = 10
 
-    rows: list[dict] = []
-    for rec in sku_records:
-        rows.append(
-            {
-                "商品链接": url,
-                "商品ID": offer_id,
-                "属性SKU": rec.get("属性SKU", ""),
-                "SKU ID": rec.get("SKU ID", ""),
-                "Spec ID": rec.get("Spec ID", ""),
-                "店铺名称": shop_name,
-            }
-        )
 
-    return rows, ""
+def daemon_available(base_url: str) -> bool:
+    try:
+        resp = requests.get(f"{base_url}/status", timeout=3)
+        status = resp.json()
+    except (requests.RequestException, ValueError):
+        return False
+    print(
+        f"[INFO] 已连接常驻浏览器服务 {base_url}（已处理 {status.get('urls_done', 0)} 个链接，"
+        f"登录={'有效' if status.get('logged_in') else '失效'}）"
+    )
+    return True
+
+
+def post_daemon_chunk(
+    base_url: str, urls: list[str], block_profile: str
+) -> list[tuple[str, list[dict], str]]:
+    try:
+        resp = requests.post(
+            f"{base_url}/scrape",
+            json={"urls": urls, "block_profile": block_profile},
+            timeout=None,
+        )
+        resp.raise_for_status()
+        return [(it["url"], it["rows"], it["error"]) for it in resp.json()["results"]]
+    except (requests.RequestException, ValueError, KeyError) as e:
+        return [(u, [], f"常驻服务请求失败: {e}") for u in urls]
+
+
+async def scrape_via_daemon(
+    base_url: str, urls: list[str], block_profile: str, on_result=None
+) -> list[tuple[str, list[dict], str]]:
+    """分块提交给常驻服务；每块返回后立即回调 on_result（在事件循环线程中）。"""
+    results: list = []
+    for start in range(0, len(urls), DAEMON_CHUNK_SIZE):
+        chunk = urls[start:start + DAEMON_CHUNK_SIZE]
+        print(f"-> [daemon] 提交 {start + 1}-{start + len(chunk)}/{len(urls)}")
+        items = await asyncio.to_thread(post_daemon_chunk, base_url, chunk, block_profile)
+        for k, res in enumerate(items):
+            results.append(res)
+            if on_result is not None:
+                on_result(start + k, res)
+    return results
 
 
 # ======================================================================
 # Main
 # ======================================================================
-def main() -> None:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="1688 Browser ID Scrape")
+    ap.add_argument("--tabs", type=int, default=DEFAULT_TABS, help="并发标签页数量")
+    ap.add_argument(
+        "--pace",
+        type=float,
+        default=DOMAIN_MIN_INTERVAL,
+        help="同一域名相邻两次导航的最小间隔（秒）",
+    )
+    ap.add_argument(
+        "--login",
+        action="store_true",
+        help="只登录：打开有界面浏览器完成登录并保存登录状态，供之后无界面抓取使用",
+    )
+    ap.add_argument(
+        "--headed",
+        action="store_true",
+        help="始终使用有界面的持久化浏览器（默认有保存的登录状态时无界面运行）",
+    )
+    ap.add_argument(
+        "--unattended",
+        action="store_true",
+        help="无人值守：不打开有界面浏览器、不等待终端输入；登录失效时需要浏览器的链接留待下次",
+    )
+    ap.add_argument(
+        "--daemon",
+        nargs="?",
+        const=DEFAULT_DAEMON_URL,
+        metavar="URL",
+        help=f"把需要浏览器的链接交给常驻浏览器服务（默认 {DEFAULT_DAEMON_URL}），不可用时本地启动浏览器",
+    )
+    ap.add_argument(
+        "--fixed-pace",
+        action="store_true",
+        help="关闭自适应节流：始终使用 --tabs / --pace，不因风控自动降速",
+    )
+    ap.add_argument(
+        "--no-retry-blocked",
+        action="store_true",
+        help="批次结束后不自动重试被风控拦截的链接",
+    )
+    ap.add_argument(
+        "--block-profile",
+        choices=sorted(BLOCK_PROFILES),
+        default=DEFAULT_BLOCK_PROFILE,
+        help="资源拦截配置：off 不拦截；media 拦截图片/视频/字体；full 另拦截埋点统计",
+    )
+    ap.add_argument(
+        "--measure-blocking",
+        action="store_true",
+        help="只测量：逐个链接对比不拦截与 --block-profile 的流量和耗时，不输出工作簿",
+    )
+    ap.add_argument(
+        "--bench-json",
+        action="store_true",
+        help="用 debug_html 中的页面压测 skuModel 提取速度后退出",
+    )
+    ap.add_argument(
+        "--refresh",
+        action="store_true",
+        help="忽略 SKU 缓存，所有链接都重新抓取（结果仍写回缓存）",
+    )
+    ap.add_argument(
+        "--include-mapped",
+        action="store_true",
+        help="Mapping_Data 中已存在的 offer 也联网抓取（默认只标记、不抓取）",
+    )
+    ap.add_argument(
+        "--cache-ttl-days",
+        type=float,
+        default=SKU_CACHE_TTL_DAYS,
+        help="SKU 缓存有效期（天）",
+    )
+    ap.add_argument(
+        "--debug-html",
+        choices=["off", "failures", "sample", "all"],
+        default=DEBUG_HTML_MODE,
+        help="调试 HTML 存档：off / failures 仅失败页 / sample 失败页+抽样 / all 全部",
+    )
+    ap.add_argument(
+        "--from",
+        dest="sources",
+        nargs="+",
+        metavar="FILE",
+        help="从文件读取链接（.xlsx 按列读取，.txt/.csv 等按文本扫描），不再从终端粘贴",
+    )
+    ap.add_argument(
+        "--column",
+        action="append",
+        help="只读取工作簿中的这些列（可重复；默认扫描所有列）",
+    )
+    ap.add_argument(
+        "--no-mapping-only",
+        action="store_true",
+        help=f"只读取 商品链接 为 {NO_MAPPING_MARK} 的行（add_to_cart 的 (done) 表）",
+    )
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help="从上次中断的检查点继续：不再粘贴链接，已成功的 offerId 直接跳过",
+    )
+    ap.add_argument(
+        "--http-first",
+        action="store_true",
+        help="先用 HTTP（导出的浏览器 Cookie）直接抓取，只有被拦截的链接才打开浏览器",
+    )
+    return ap.parse_args(argv)
+
+
+async def fetch_links(args: argparse.Namespace, urls: list[str], on_result) -> None:
+    """\
+    联网抓取 urls（不经过缓存 / Mapping_Data 预筛）：
+    --http-first 时先走 HTTP，被拦截的再交给 --daemon 常驻服务或本地浏览器。
+    on_result(j, (url, rows, error)) 在每个链接出结果时调用，j 为 urls 中的下标；
+    --unattended 且无法无界面登录时，需要浏览器的链接不会回调。
+    args 使用 parse_args() 的字段，其他脚本可用 parse_args([...]) 构造。
+    """
+    pending = list(range(len(urls)))
+
+    # HTTP-first：能直接拿到 skuModel 的不再打开浏览器
+    if pending and args.http_first:
+        session = build_http_session(args.tabs)
+        if session is None:
+            print(f"[WARN] 未找到 {COOKIE_EXPORT_PATH.name}，本次全部使用浏览器（结束后会自动导出 Cookie）")
+        else:
+            t0 = time.perf_counter()
+            http_idx = pending
+            _, escalate = await scrape_links_http(
+                session,
+                [urls[j] for j in http_idx],
+                args.tabs,
+                DomainPacer(args.pace),
+                on_result=lambda k, res: on_result(http_idx[k], res),
+            )
+            session.close()
+            print(
+                f"\n[INFO] HTTP 抓取 {len(http_idx)} 个链接耗时 {time.perf_counter() - t0:.1f}s，"
+                f"{len(escalate)} 个需转浏览器"
+            )
+            pending = [http_idx[k] for k in escalate]
+
+    # 浏览器：优先交给常驻浏览器服务，否则本地启动
+    if pending and args.daemon:
+        if await asyncio.to_thread(daemon_available, args.daemon):
+            daemon_idx = pending
+            await scrape_via_daemon(
+                args.daemon,
+                [urls[j] for j in daemon_idx],
+                args.block_profile,
+                lambda k, res: on_result(daemon_idx[k], res),
+            )
+            return
+        print(f"[WARN] 常驻浏览器服务不可用（{args.daemon}），改为本地启动浏览器。")
+
+    if not pending:
+        return
+
+    async with async_playwright() as p:
+        opened = None if args.headed and not args.unattended else await launch_headless_context(p)
+        headless = opened is not None
+        if headless:
+            context, page = opened
+        elif args.unattended:
+            # 有界面登录需要人工操作；这些链接不回调结果，由调用方留到下一轮
+            print(
+                f"[WARN] 无人值守模式下没有有效的登录状态，{len(pending)} 个需要浏览器的链接本次跳过"
+                "（运行 --login 重新登录后恢复）。"
+            )
+            return
+        else:
+            context = await launch_browser_context(p)
+            page = await open_logged_in_page(context)
+
+        if args.fixed_pace:
+            pacer = DomainPacer(args.pace)
+        else:
+            pacer = AdaptivePacer(args.pace, args.tabs, interactive=not headless)
+        browser_idx = pending
+        await scrape_links_with_retry(
+            context,
+            [urls[j] for j in browser_idx],
+            args.tabs,
+            pacer,
+            args.block_profile,
+            on_result=lambda k, res: on_result(browser_idx[k], res),
+            retry_blocked=not args.no_retry_blocked,
+        )
+
+        # 刷新保存的登录状态和 Cookie，延长无界面 / HTTP 模式的可用时间
+        await save_storage_state(context)
+        await export_browser_cookies(context, page)
+        await context.close()
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    global DEBUG_HTML_MODE
+    DEBUG_HTML_MODE = args.debug_html
+
     print("=== 1688 Browser ID Scrape ===")
     print("版本:", SCRIPT_VERSION)
     print("工作目录:", BASE_DIR)
     print("浏览器用户目录:", PROFILE_DIR)
 
-    urls = read_links_from_stdin()
-    if not urls:
-        print("[WARN] 未提供任何有效商品链接。")
+    if args.bench_json:
+        bench_json_extraction()
         return
 
+    if args.login:
+        async with async_playwright() as p:
+            context = await launch_browser_context(p)
+            page = await open_logged_in_page(context)
+            await save_storage_state(context)
+            await export_browser_cookies(context, page)
+            await context.close()
+        print("[OK] 登录完成，之后的抓取会自动使用无界面模式。")
+        return
+
+    prune_debug_html()
+
+    checkpoint = ScrapeCheckpoint()
+    done: dict[int, tuple] = {}
+    if args.resume and checkpoint.exists():
+        urls, done = checkpoint.resume()
+        print(f"[INFO] 从检查点继续：共 {len(urls)} 个链接，已完成 {len(done)} 个")
+    else:
+        if args.resume:
+            print("[WARN] 没有找到检查点，按新批次处理。")
+        if args.sources:
+            urls = read_links_from_sources(args.sources, args.column, args.no_mapping_only)
+        else:
+            urls = read_links_from_stdin()
+        urls = dedupe_by_offer_id(urls)
+        if not urls:
+            print("[WARN] 未提供任何有效商品链接。")
+            return
+        if not args.measure_blocking:
+            checkpoint.start(urls)
+
     all_rows: list[dict] = []
     failed: list[dict] = []
 
-    with sync_playwright() as p:
-        context = p.chromium.launch_persistent_context(
-            user_data_dir=str(PROFILE_DIR),
-            headless=False,
-            channel="chrome",
-            args=[
-                "--start-maximized",
-                "--disable-blink-features=AutomationControlled",
-            ],
-            viewport={"width": 1440, "height": 900},
-        )
-
-        page = context.new_page()
-        ensure_home_ready(page)
-        wait_for_manual_login(page)
+    # 1) 缓存 / Mapping_Data 预筛：只有真正的新链接才联网
+    results: list = [None] * len(urls)
+    to_fetch: list[int] = []
+    # --no-mapping-only 的来源本身就是“缺映射”的行，不按 offer 预筛
+    skip_mapped = not (args.include_mapped or args.no_mapping_only or args.refresh or args.measure_blocking)
+    mapped_specs = load_mapped_specs() if skip_mapped else {}
+    max_age = args.cache_ttl_days * 86400
+    n_cached = 0
+    skipped: list[str] = []
+
+    cache = SkuScrapeCache()
+
+    def on_result(i: int, res: tuple[str, list[dict], str]) -> None:
+        """每个链接一出结果就写检查点，成功的同时写入 SKU 缓存。"""
+        results[i] = res
+        checkpoint.append(i, res)
+        url, rows, _ = res
+        if rows:
+            records = [{k: r[k] for k in ("SKU ID", "Spec ID", "属性SKU")} for r in rows]
+            cache.put(rows[0]["商品ID"], url, records, rows[0]["店铺名称"])
+
+    for i, url in enumerate(urls):
+        if i in done:
+            results[i] = done[i]
+            continue
+        offer_id = extract_offer_id(url)
+        hit = None
+        if offer_id and not args.refresh and not args.measure_blocking:
+            hit = cache.get(offer_id, max_age_sec=max_age)
+        if hit is not None and hit[0]:
+            records, shop_name = hit
+            results[i] = (url, build_rows(url, offer_id, records, shop_name), "")
+            checkpoint.append(i, results[i])
+            n_cached += 1
+        elif offer_id in mapped_specs and not has_unmapped_specs(cache, offer_id, mapped_specs[offer_id]):
+            results[i] = (url, [], MAPPED_SKIP_NOTE)
+            checkpoint.append(i, results[i])
+            skipped.append(url)
+        else:
+            to_fetch.append(i)
+
+    print(
+        f"[INFO] 共 {len(urls)} 个链接：已完成 {len(done)}，缓存命中 {n_cached}，"
+        f"Mapping_Data 已存在（跳过）{len(skipped)}，需要联网抓取 {len(to_fetch)}"
+    )
+
+    # 2) 联网抓取（HTTP-first → 常驻服务 / 本地浏览器），每个结果立即回调
+    if to_fetch and args.measure_blocking:
+        async with async_playwright() as p:
+            opened = None if args.headed else await launch_headless_context(p)
+            context = opened[0] if opened else await launch_browser_context(p)
+            if opened is None:
+                await open_logged_in_page(context)
+            await measure_block_profile(context, [urls[i] for i in to_fetch], args.block_profile)
+            await context.close()
+        cache.close()
+        return
 
-        for i, url in enumerate(urls, start=1):
-            print(f"\n===== 进度 {i}/{len(urls)} =====")
-            rows, error = scrape_one_product(page, url)
-            if rows:
-                all_rows.extend(rows)
-            else:
-                failed.append({"商品链接": url, "失败原因": error})
-                print(f"   [WARN] 失败原因: {error}")
+    if to_fetch:
+        fetch_idx = to_fetch
+        await fetch_links(
+            args, [urls[i] for i in fetch_idx], lambda j, res: on_result(fetch_idx[j], res)
+        )
+    cache.close()
+
+    # 3) 最终结果以检查点为准（按输入顺序）
+    checkpoint.close()
+    skipped = []
+    for url, rows, error in checkpoint.results():
+        if rows:
+            all_rows.extend(rows)
+        elif error == MAPPED_SKIP_NOTE:
+            skipped.append(url)
+        else:
+            failed.append({"商品链接": url, "失败原因": error})
 
-        context.close()
+    if skipped:
+        print(
+            f"\n[INFO] {len(skipped)} 个 offer 已在 Mapping_Data 中且没有未映射的规格，未联网抓取"
+            "（需要时用 --include-mapped 强制抓取）:"
+        )
+        for url in skipped[:10]:
+            print(f"  - {url}")
+        if len(skipped) > 10:
+            print(f"  ... 以及另外 {len(skipped) - 10} 个")
 
     if not all_rows:
         print("\n[WARN] 未获得任何 SKU 数据，不输出文件。")
@@ -317,11 +1819,13 @@ def main() -> None:
                 print(f"  - {item['商品链接']} | {item['失败原因']}")
             if len(failed) > 20:
                 print(f"  ... 以及另外 {len(failed) - 20} 条")
+        checkpoint.finish()
         return
 
     out_df = pd.DataFrame(all_rows)
     out_path = build_output_path()
     out_df.to_excel(out_path, index=False)
+    checkpoint.finish()
 
     print(f"\n全部处理完成。输出文件：{out_path}")
 
@@ -336,5 +1840,16 @@ def main() -> None:
     print("3. 如再次遇到验证页，请在浏览器里先手动完成验证，再继续运行。")
 
 
+def main(argv: list[str] | None = None) -> None:
+    try:
+        asyncio.run(main_async(parse_args(argv)))
+    except KeyboardInterrupt:
+        if CHECKPOINT_PATH.exists():
+            print(f"\n[WARN] 已中断。已完成的结果保存在 {CHECKPOINT_PATH}")
+            print("[INFO] 重新运行并加上 --resume 即可从中断处继续。")
+        else:
+            print("\n[WARN] 已中断。")
+
+
 if __name__ == "__main__":
     main()
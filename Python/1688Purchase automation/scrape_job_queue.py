@@ -0,0 +1,648 @@
+"""\
+1688 抓取任务队列（SQLite）+ 分布式抓取 worker。
+
+多个 worker 进程（各自使用自己的 playwright_1688_profile）从同一个队列领取
+offer，结果写回同一个队列。队列文件必须在本机磁盘上（SQLite 的文件锁在
+SMB / NFS 共享目录上不可靠）；多台电脑时由一台运行 serve 持有队列文件，
+其他电脑的 worker 用 --server 通过 HTTP 领取 / 续租 / 交回。
+
+  - 每个 offer 一行（按 offerId 去重），批次只记录成员关系，同一个 offer
+    可以属于多个批次；领取时加租约（lease），worker 抓取期间定时续租，
+    worker 崩溃 / 断网后租约到期，其他 worker 会重新领取
+  - 被风控拦截或异常的 offer 自动放回队列，超过 MAX_ATTEMPTS 次标记为 failed
+  - export 按批次导出与粘贴模式相同的 (done) 工作簿，可直接交给 Update_mapping_from_scrape.py
+
+用法：
+  python scrape_job_queue.py enqueue --from catalogue.xlsx --batch cat-2026-10
+  python scrape_job_queue.py worker --name w1 --profile D:\\profiles\\w1
+  python scrape_job_queue.py status
+  python scrape_job_queue.py export --batch cat-2026-10
+
+多台电脑：
+  python scrape_job_queue.py serve --host 0.0.0.0                       # 持有队列文件的电脑
+  python scrape_job_queue.py --server http://192.168.1.10:8767 worker --name w2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pandas as pd
+import requests
+from playwright.async_api import async_playwright
+
+import scrape_1688_http_paste_links_open as scraper
+from config import SCRAPE_QUEUE_PATH
+from sku_scrape_cache import SkuScrapeCache
+
+
+# ================== CONFIG ==================
+
+# 租约时长（秒）：超过这个时间没有交回结果，offer 会被其他 worker 重新领取
+LEASE_SEC = 600
+# 每个 offer 最多尝试次数（含被拦截 / 异常 / worker 崩溃）
+MAX_ATTEMPTS = 3
+# 队列为空时 worker 的轮询间隔（秒）
+IDLE_POLL_SEC = 30
+# 抓取期间的续租间隔（秒）
+RENEW_EVERY_SEC = LEASE_SEC / 3
+# 可以放回队列重试的错误（被拦截 / 页面打开失败 / 抓取异常）
+RETRYABLE_ERROR_PREFIXES = (scraper.BLOCKED_ERROR, "打开页面失败", "抓取异常")
+
+# 队列服务（serve）默认地址；远程 worker 需要 --host 0.0.0.0，只在内网使用（没有鉴权）
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8767
+# 远程调用队列服务的超时（秒）
+SERVER_TIMEOUT_SEC = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+    offer_id    TEXT NOT NULL UNIQUE,
+    url         TEXT NOT NULL,
+    batch       TEXT NOT NULL DEFAULT '',
+    status      TEXT NOT NULL DEFAULT 'pending',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    worker      TEXT NOT NULL DEFAULT '',
+    lease_until REAL NOT NULL DEFAULT 0,
+    rows_json   TEXT NOT NULL DEFAULT '[]',
+    error       TEXT NOT NULL DEFAULT '',
+    updated_at  REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, lease_until);
+CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch);
+
+-- 批次成员（jobs.batch 只是首次入队的批次）；rowid 即批次内的入队顺序
+CREATE TABLE IF NOT EXISTS batch_jobs (
+    batch    TEXT NOT NULL,
+    offer_id TEXT NOT NULL,
+    PRIMARY KEY (batch, offer_id)
+);
+"""
+
+# PRAGMA user_version 记录已执行的迁移
+SCHEMA_VERSION = 1
+
+
+# ================== Queue ==================
+
+
+class ScrapeJobQueue:
+    """offerId 粒度的任务队列；所有写操作都在 BEGIN IMMEDIATE 事务内完成。"""
+
+    def __init__(self, path: str = SCRAPE_QUEUE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # worker 在线程中（asyncio.to_thread）调用，调用方负责串行化
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._migrate()
+
+    def _migrate(self) -> None:
+        """旧队列文件（没有 batch_jobs 时创建的）：按首次入队的批次补齐成员关系，只执行一次。"""
+        conn = self._tx()
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO batch_jobs (batch, offer_id) SELECT batch, offer_id FROM jobs ORDER BY seq"
+            )
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _tx(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def enqueue(self, urls: list[str], batch: str) -> tuple[int, int]:
+        """\
+        按 offerId 去重入队，并把这些 offer 都记入 batch。
+        返回 (新入队数, 已在队列中的数量)；已在队列中的 offer 不重复抓取，结果也算入本批次。
+        """
+        now = time.time()
+        jobs = [(scraper.extract_offer_id(u), u) for u in urls]
+        jobs = [(o, u) for o, u in jobs if o]
+        conn = self._tx()
+        try:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (offer_id, url, batch, updated_at) VALUES (?, ?, ?, ?)",
+                [(o, u, batch, now) for o, u in jobs],
+            )
+            added = conn.total_changes - before
+            conn.executemany(
+                "INSERT OR IGNORE INTO batch_jobs (batch, offer_id) VALUES (?, ?)",
+                [(batch, o) for o, _ in jobs],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return added, len(jobs) - added
+
+    def lease(self, worker: str, n: int, lease_sec: float = LEASE_SEC) -> list[tuple[str, str]]:
+        """领取最多 n 个 offer：pending 的，或租约已过期的 leased。返回 [(offer_id, url)]。"""
+        now = time.time()
+        conn = self._tx()
+        try:
+            rows = conn.execute(
+                "SELECT offer_id, url FROM jobs "
+                "WHERE (status = 'pending' OR (status = 'leased' AND lease_until < ?)) "
+                "AND attempts < ? ORDER BY seq LIMIT ?",
+                (now, MAX_ATTEMPTS, n),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE offer_id = ?",
+                [(worker, now + lease_sec, now, offer_id) for offer_id, _ in rows],
+            )
+            # 租约过期且次数已用完的 offer（worker 反复崩溃）直接标记失败
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'worker 多次未交回结果' "
+                "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, MAX_ATTEMPTS),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def renew(self, worker: str, offer_ids: list[str], lease_sec: float = LEASE_SEC) -> None:
+        """延长本 worker 仍持有的租约（抓取期间定时调用；已交回的 offer 不受影响）。"""
+        conn = self._tx()
+        try:
+            conn.executemany(
+                "UPDATE jobs SET lease_until = ? WHERE offer_id = ? AND worker = ? AND status = 'leased'",
+                [(time.time() + lease_sec, o, worker) for o in offer_ids],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def complete(self, offer_id: str, worker: str, rows: list[dict], error: str) -> str:
+        """\
+        交回结果，返回新状态：成功 done；被拦截 / 异常且还有次数时放回 pending；否则 failed。
+        租约已被其他 worker 接手时忽略本次结果（返回 "stale"）。
+        """
+        conn = self._tx()
+        try:
+            cur = conn.execute(
+                "SELECT attempts FROM jobs WHERE offer_id = ? AND worker = ? AND status = 'leased'",
+                (offer_id, worker),
+            ).fetchone()
+            if cur is None:
+                conn.execute("COMMIT")
+                return "stale"
+            if rows:
+                status = "done"
+            elif cur[0] < MAX_ATTEMPTS and error.startswith(RETRYABLE_ERROR_PREFIXES):
+                status = "pending"
+            else:
+                status = "failed"
+            conn.execute(
+                "UPDATE jobs SET status = ?, rows_json = ?, error = ?, lease_until = 0, updated_at = ? "
+                "WHERE offer_id = ?",
+                (status, json.dumps(rows, ensure_ascii=False), error, time.time(), offer_id),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return status
+
+    def requeue_failed(self, batch: str | None = None) -> int:
+        sql = "UPDATE jobs SET status = 'pending', attempts = 0, error = '' WHERE status = 'failed'"
+        params: tuple = ()
+        if batch:
+            sql += " AND offer_id IN (SELECT offer_id FROM batch_jobs WHERE batch = ?)"
+            params = (batch,)
+        conn = self._tx()
+        try:
+            n = conn.execute(sql, params).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return n
+
+    def stats(self, batch: str | None = None) -> pd.DataFrame:
+        sql = "SELECT b.batch, j.status, j.worker, COUNT(*) AS n FROM batch_jobs b JOIN jobs j USING (offer_id)"
+        params: tuple = ()
+        if batch:
+            sql += " WHERE b.batch = ?"
+            params = (batch,)
+        sql += " GROUP BY b.batch, j.status, j.worker ORDER BY b.batch, j.status, j.worker"
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def results(self, batch: str) -> list[tuple[str, list[dict], str, str]]:
+        """按批次内的入队顺序返回 (url, rows, error, status)。"""
+        return [
+            (url, json.loads(rows_json), error, status)
+            for url, rows_json, error, status in self.conn.execute(
+                "SELECT j.url, j.rows_json, j.error, j.status FROM batch_jobs b JOIN jobs j USING (offer_id) "
+                "WHERE b.batch = ? ORDER BY b.rowid",
+                (batch,),
+            )
+        ]
+
+
+class RemoteJobQueue:
+    """通过 HTTP 访问其他电脑上的队列服务（serve），接口与 ScrapeJobQueue 相同。"""
+
+    def __init__(self, base_url: str):
+        self.path = base_url.rstrip("/")
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _post(self, endpoint: str, payload: dict) -> dict:
+        resp = requests.post(f"{self.path}{endpoint}", json=payload, timeout=SERVER_TIMEOUT_SEC)
+        resp.raise_for_status()
+        return resp.json()
+
+    def enqueue(self, urls: list[str], batch: str) -> tuple[int, int]:
+        out = self._post("/enqueue", {"urls": urls, "batch": batch})
+        return out["added"], out["existing"]
+
+    def lease(self, worker: str, n: int, lease_sec: float = LEASE_SEC) -> list[tuple[str, str]]:
+        out = self._post("/lease", {"worker": worker, "n": n, "lease_sec": lease_sec})
+        return [(offer_id, url) for offer_id, url in out["jobs"]]
+
+    def renew(self, worker: str, offer_ids: list[str], lease_sec: float = LEASE_SEC) -> None:
+        self._post("/renew", {"worker": worker, "offer_ids": offer_ids, "lease_sec": lease_sec})
+
+    def complete(self, offer_id: str, worker: str, rows: list[dict], error: str) -> str:
+        out = self._post("/complete", {"offer_id": offer_id, "worker": worker, "rows": rows, "error": error})
+        return out["status"]
+
+    def requeue_failed(self, batch: str | None = None) -> int:
+        return self._post("/requeue-failed", {"batch": batch})["n"]
+
+    def stats(self, batch: str | None = None) -> pd.DataFrame:
+        return pd.DataFrame(self._post("/stats", {"batch": batch})["stats"], columns=["batch", "status", "worker", "n"])
+
+    def results(self, batch: str) -> list[tuple[str, list[dict], str, str]]:
+        return [tuple(r) for r in self._post("/results", {"batch": batch})["results"]]
+
+
+def open_queue(args: argparse.Namespace) -> ScrapeJobQueue | RemoteJobQueue:
+    return RemoteJobQueue(args.server) if args.server else ScrapeJobQueue(args.queue)
+
+
+# ================== Server ==================
+
+
+class QueueHandler(BaseHTTPRequestHandler):
+    """把 ScrapeJobQueue 的方法暴露给远程 worker；所有调用在 server.lock 下串行执行。"""
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, obj: dict, status: int = 200) -> None:
+        raw = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _call(self, fn, *args):
+        with self.server.lock:  # type: ignore[attr-defined]
+            return fn(*args)
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path == "/status":
+            self._send_json({"ok": True, "queue": self.server.queue.path})  # type: ignore[attr-defined]
+        else:
+            self._send_json({"ok": False, "msg": f"unknown path {path}"}, status=404)
+
+    def do_POST(self):
+        path = urllib.parse.urlparse(self.path).path
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._send_json({"ok": False, "msg": "请求体不是 JSON"}, status=400)
+            return
+
+        queue: ScrapeJobQueue = self.server.queue  # type: ignore[attr-defined]
+        lease_sec = float(body.get("lease_sec") or LEASE_SEC)
+        try:
+            if path == "/enqueue":
+                added, existing = self._call(queue.enqueue, body["urls"], body["batch"])
+                print(f"[INFO] 批次 {body['batch']}：新入队 {added} 个，已在队列中 {existing} 个")
+                out = {"added": added, "existing": existing}
+            elif path == "/lease":
+                jobs = self._call(queue.lease, body["worker"], int(body["n"]), lease_sec)
+                if jobs:
+                    print(f"[INFO] {body['worker']} 领取 {len(jobs)} 个 offer")
+                out = {"jobs": jobs}
+            elif path == "/renew":
+                self._call(queue.renew, body["worker"], body["offer_ids"], lease_sec)
+                out = {}
+            elif path == "/complete":
+                status = self._call(queue.complete, body["offer_id"], body["worker"], body["rows"], body["error"])
+                out = {"status": status}
+            elif path == "/requeue-failed":
+                out = {"n": self._call(queue.requeue_failed, body.get("batch"))}
+            elif path == "/stats":
+                df = self._call(queue.stats, body.get("batch"))
+                out = {"stats": df.values.tolist()}
+            elif path == "/results":
+                out = {"results": self._call(queue.results, body["batch"])}
+            else:
+                self._send_json({"ok": False, "msg": f"unknown path {path}"}, status=404)
+                return
+        except KeyError as e:
+            self._send_json({"ok": False, "msg": f"缺少字段: {e}"}, status=400)
+            return
+        except Exception as e:
+            print(f"[ERROR] {path} 失败: {e}")
+            self._send_json({"ok": False, "msg": str(e)}, status=500)
+            return
+        self._send_json({"ok": True, **out})
+
+
+def serve_queue(args: argparse.Namespace) -> None:
+    print("=== 1688 抓取队列服务 ===")
+    print("队列:", args.queue)
+    httpd = ThreadingHTTPServer((args.host, args.port), QueueHandler)
+    httpd.daemon_threads = True
+    httpd.queue = ScrapeJobQueue(args.queue)  # type: ignore[attr-defined]
+    httpd.lock = threading.Lock()  # type: ignore[attr-defined]
+    print(f"\n[OK] 服务已启动: http://{args.host}:{args.port}")
+    print(f"[提示] 其他电脑执行: python scrape_job_queue.py --server http://<本机IP>:{args.port} worker --name ...")
+    print("按 Ctrl+C 停止。")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n已停止。")
+    finally:
+        httpd.server_close()
+        httpd.queue.close()  # type: ignore[attr-defined]
+
+
+# ================== Worker ==================
+
+
+class QueueCalls:
+    """worker 对队列的调用：放到线程中执行（不阻塞抓取的事件循环），并按提交顺序串行。"""
+
+    def __init__(self, queue: ScrapeJobQueue | RemoteJobQueue):
+        self.queue = queue
+        self.lock = asyncio.Lock()
+
+    async def __call__(self, method: str, *args):
+        async with self.lock:
+            return await asyncio.to_thread(getattr(self.queue, method), *args)
+
+
+async def keep_leases(calls: QueueCalls, worker: str, offer_ids: list[str]) -> None:
+    """抓取期间（包括等待手动验证时）定时续租，避免长批次被其他 worker 重复领取。"""
+    while True:
+        await asyncio.sleep(RENEW_EVERY_SEC)
+        try:
+            await calls("renew", worker, offer_ids)
+        except (sqlite3.Error, requests.RequestException) as e:
+            print(f"[WARN] 续租失败（下次再试）: {e}")
+
+
+def use_profile(profile_dir: str) -> None:
+    """让本 worker 使用独立的浏览器用户目录（登录状态 / 导出 Cookie 也随之独立）。"""
+    profile = Path(profile_dir).resolve()
+    profile.mkdir(parents=True, exist_ok=True)
+    scraper.PROFILE_DIR = profile
+    scraper.STORAGE_STATE_PATH = profile.with_name(f"{profile.name}_storage_state.json")
+    scraper.COOKIE_EXPORT_PATH = profile.with_name(f"{profile.name}_cookies.json")
+
+
+async def run_worker(args: argparse.Namespace) -> None:
+    if args.profile:
+        use_profile(args.profile)
+    worker = args.name or f"{socket.gethostname()}-{os.getpid()}"
+    print(f"=== 抓取 worker: {worker} ===")
+    print("队列:", args.server or args.queue)
+    print("浏览器用户目录:", scraper.PROFILE_DIR)
+
+    queue = open_queue(args)
+    calls = QueueCalls(queue)
+    chunk = max(1, args.tabs * 2)
+    n_done = n_failed = 0
+    try:
+        async with async_playwright() as p:
+            opened = None if args.headed else await scraper.launch_headless_context(p)
+            headless = opened is not None
+            if headless:
+                context, page = opened
+            else:
+                context = await scraper.launch_browser_context(p)
+                page = await scraper.open_logged_in_page(context)
+            pacer = scraper.AdaptivePacer(args.pace, args.tabs, interactive=not headless)
+
+            while True:
+                try:
+                    leased = await calls("lease", worker, chunk)
+                except requests.RequestException as e:
+                    print(f"[WARN] 连接队列服务失败，{IDLE_POLL_SEC}s 后重试: {e}")
+                    await asyncio.sleep(IDLE_POLL_SEC)
+                    continue
+                if not leased:
+                    if args.exit_when_empty:
+                        break
+                    print(f"[INFO] 队列为空，{IDLE_POLL_SEC}s 后再看...")
+                    await asyncio.sleep(IDLE_POLL_SEC)
+                    continue
+
+                print(f"\n[INFO] 领取 {len(leased)} 个 offer")
+                offer_ids = [o for o, _ in leased]
+
+                submitted: list[asyncio.Task] = []
+
+                async def submit(offer_id: str, rows: list[dict], error: str) -> None:
+                    nonlocal n_done, n_failed
+                    try:
+                        status = await calls("complete", offer_id, worker, rows, error)
+                    except (sqlite3.Error, requests.RequestException) as e:
+                        print(f"[WARN] 交回 {offer_id} 失败，租约到期后会被重新领取: {e}")
+                        return
+                    if status == "done":
+                        n_done += 1
+                    elif status == "failed":
+                        n_failed += 1
+
+                def on_result(j: int, res: tuple[str, list[dict], str]) -> None:
+                    _, rows, error = res
+                    submitted.append(asyncio.create_task(submit(offer_ids[j], rows, error)))
+
+                # 被拦截的 offer 交回队列，由之后的领取（可能是其他 worker）重试
+                renewer = asyncio.create_task(keep_leases(calls, worker, offer_ids))
+                try:
+                    await scraper.scrape_links_with_retry(
+                        context,
+                        [url for _, url in leased],
+                        args.tabs,
+                        pacer,
+                        args.block_profile,
+                        on_result=on_result,
+                        retry_blocked=False,
+                    )
+                finally:
+                    renewer.cancel()
+                    await asyncio.gather(*submitted)
+                print(f"[INFO] 累计完成 {n_done}，失败 {n_failed}")
+
+            await scraper.save_storage_state(context)
+            await scraper.export_browser_cookies(context, page)
+            await context.close()
+    finally:
+        queue.close()
+    print(f"[OK] worker 结束：完成 {n_done}，失败 {n_failed}")
+
+
+# ================== Export ==================
+
+
+def export_batch(queue: ScrapeJobQueue | RemoteJobQueue, batch: str) -> Path | None:
+    """把批次结果写成 (done) 工作簿（与粘贴模式格式相同），并写入本机 SKU 缓存。"""
+    all_rows: list[dict] = []
+    failed: list[dict] = []
+    unfinished = 0
+    with SkuScrapeCache() as cache:
+        for url, rows, error, status in queue.results(batch):
+            if status == "done" and rows:
+                all_rows.extend(rows)
+                records = [{k: r[k] for k in ("SKU ID", "Spec ID", "属性SKU")} for r in rows]
+                cache.put(rows[0]["商品ID"], url, records, rows[0]["店铺名称"])
+            elif status == "failed":
+                failed.append({"商品链接": url, "失败原因": error})
+            else:
+                unfinished += 1
+
+    if unfinished:
+        print(f"[WARN] 批次 {batch} 还有 {unfinished} 个 offer 未完成，本次只导出已完成部分。")
+    if not all_rows:
+        print("[WARN] 没有已完成的结果，不输出文件。")
+        return None
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    out_path = scraper.BASE_DIR / f"queue_{batch}_{stamp}(done).xlsx"
+    pd.DataFrame(all_rows).to_excel(out_path, index=False)
+    print(f"[OK] 已导出 {len(all_rows)} 行: {out_path}")
+    if failed:
+        fail_path = scraper.BASE_DIR / f"failed_links_{stamp}.xlsx"
+        pd.DataFrame(failed).to_excel(fail_path, index=False)
+        print(f"[WARN] {len(failed)} 个 offer 失败，清单: {fail_path}")
+    return out_path
+
+
+# ================== CLI ==================
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="1688 抓取任务队列 / 分布式 worker")
+    ap.add_argument("--queue", default=SCRAPE_QUEUE_PATH, help="队列文件（须在本机磁盘上，不要放在网络共享目录）")
+    ap.add_argument("--server", metavar="URL", help="使用其他电脑上的队列服务（serve），代替本机队列文件")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p_enq = sub.add_parser("enqueue", help="入队（按 offerId 去重）")
+    p_enq.add_argument("--from", dest="sources", nargs="+", metavar="FILE", help="链接来源文件（默认从终端粘贴）")
+    p_enq.add_argument("--column", action="append", help="只读取工作簿中的这些列")
+    p_enq.add_argument("--no-mapping-only", action="store_true", help="只取 NO MAPPING SKU 行")
+    p_enq.add_argument("--batch", default=datetime.now().strftime("%Y%m%d-%H%M%S"), help="批次名")
+
+    p_worker = sub.add_parser("worker", help="运行 worker")
+    p_worker.add_argument("--name", help="worker 名称（默认 主机名-进程号）")
+    p_worker.add_argument("--profile", help="本 worker 的浏览器用户目录（默认 ID_Scrape/playwright_1688_profile）")
+    p_worker.add_argument("--tabs", type=int, default=scraper.DEFAULT_TABS)
+    p_worker.add_argument("--pace", type=float, default=scraper.DOMAIN_MIN_INTERVAL)
+    p_worker.add_argument(
+        "--block-profile", choices=sorted(scraper.BLOCK_PROFILES), default=scraper.DEFAULT_BLOCK_PROFILE
+    )
+    p_worker.add_argument("--headed", action="store_true", help="始终使用有界面浏览器")
+    p_worker.add_argument("--exit-when-empty", action="store_true", help="队列为空时退出（默认继续等待）")
+
+    p_status = sub.add_parser("status", help="查看队列状态")
+    p_status.add_argument("--batch")
+
+    p_export = sub.add_parser("export", help="导出批次为 (done) 工作簿")
+    p_export.add_argument("--batch", required=True)
+
+    p_requeue = sub.add_parser("requeue-failed", help="把 failed 的 offer 放回队列")
+    p_requeue.add_argument("--batch")
+
+    p_serve = sub.add_parser("serve", help="持有本机队列文件，供其他电脑的 worker 通过 HTTP 使用")
+    p_serve.add_argument("--host", default=DEFAULT_HOST, help="监听地址（其他电脑访问时用 0.0.0.0，仅限内网）")
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    args = ap.parse_args(argv)
+
+    if args.command == "serve":
+        serve_queue(args)
+        return 0
+
+    if args.command == "worker":
+        try:
+            asyncio.run(run_worker(args))
+        except KeyboardInterrupt:
+            print("\n[WARN] worker 已中断，未交回的 offer 会在租约到期后被重新领取。")
+        return 0
+
+    with open_queue(args) as queue:
+        if args.command == "enqueue":
+            if args.sources:
+                urls = scraper.read_links_from_sources(args.sources, args.column, args.no_mapping_only)
+            else:
+                urls = scraper.read_links_from_stdin()
+            urls = scraper.dedupe_by_offer_id(urls)
+            added, existing = queue.enqueue(urls, args.batch)
+            print(f"[OK] 批次 {args.batch}：新入队 {added} 个")
+            if existing:
+                print(f"[INFO] {existing} 个 offer 已在队列中，不重复抓取，沿用已有状态并计入本批次")
+            invalid = len(urls) - added - existing
+            if invalid:
+                print(f"[WARN] {invalid} 个链接无法识别 offerId，已跳过")
+        elif args.command == "status":
+            df = queue.stats(args.batch)
+            print(df.to_string(index=False) if not df.empty else "[INFO] 队列为空")
+        elif args.command == "export":
+            export_batch(queue, args.batch)
+        elif args.command == "requeue-failed":
+            print(f"[OK] 已放回 {queue.requeue_failed(args.batch)} 个 offer")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
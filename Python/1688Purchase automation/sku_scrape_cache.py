@@ -0,0 +1,102 @@
+"""\
+1688 SKU 抓取结果缓存（SQLite，按 offerId）。
+
+每个 offer 保存一次解析结果（SKU ID / Spec ID / 属性SKU / 店铺名称）及抓取时间，
+同一 offer 在 TTL 内再次粘贴时直接从缓存返回，不再打开浏览器。
+"""
+
+import os
+import sqlite3
+import time
+
+from config import SKU_CACHE_PATH
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS offers (
+    offer_id   TEXT PRIMARY KEY,
+    url        TEXT NOT NULL DEFAULT '',
+    shop_name  TEXT NOT NULL DEFAULT '',
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS skus (
+    offer_id TEXT NOT NULL,
+    seq      INTEGER NOT NULL,
+    sku_id   TEXT NOT NULL DEFAULT '',
+    spec_id  TEXT NOT NULL DEFAULT '',
+    attr     TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (offer_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_skus_spec_id ON skus (spec_id);
+"""
+
+
+class SkuScrapeCache:
+    """offerId → SKU 记录 的持久化缓存。"""
+
+    def __init__(self, path: str = SKU_CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fetched_at(self, offer_id: str) -> float | None:
+        row = self.conn.execute(
+            "SELECT fetched_at FROM offers WHERE offer_id = ?", (offer_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get(self, offer_id: str, max_age_sec: float | None = None) -> tuple[list[dict], str] | None:
+        """\
+        返回 (records, shop_name)；不存在或已超过 max_age_sec 时返回 None。
+        records 的键与 parse_sku_model_json 一致: SKU ID / Spec ID / 属性SKU
+        """
+        row = self.conn.execute(
+            "SELECT shop_name, fetched_at FROM offers WHERE offer_id = ?", (offer_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        shop_name, fetched_at = row
+        if max_age_sec is not None and time.time() - fetched_at > max_age_sec:
+            return None
+
+        records = [
+            {"SKU ID": sku_id, "Spec ID": spec_id, "属性SKU": attr}
+            for sku_id, spec_id, attr in self.conn.execute(
+                "SELECT sku_id, spec_id, attr FROM skus WHERE offer_id = ? ORDER BY seq",
+                (offer_id,),
+            )
+        ]
+        return records, shop_name
+
+    def put(self, offer_id: str, url: str, records: list[dict], shop_name: str) -> None:
+        """写入 / 覆盖一个 offer 的解析结果。"""
+        with self.conn:
+            self.conn.execute("DELETE FROM skus WHERE offer_id = ?", (offer_id,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO offers (offer_id, url, shop_name, fetched_at) "
+                "VALUES (?, ?, ?, ?)",
+                (offer_id, url or "", shop_name or "", time.time()),
+            )
+            self.conn.executemany(
+                "INSERT INTO skus (offer_id, seq, sku_id, spec_id, attr) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        offer_id,
+                        seq,
+                        str(rec.get("SKU ID", "")),
+                        str(rec.get("Spec ID", "")),
+                        str(rec.get("属性SKU", "")),
+                    )
+                    for seq, rec in enumerate(records)
+                ],
+            )